@@ -1,11 +1,27 @@
-import requests
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Union, Any, AsyncIterator, Tuple
+from collections import OrderedDict
+import asyncio
+import hashlib
 import os
-from serpapi import GoogleSearch
-from dotenv import load_dotenv
+import time
+
+from chunking import estimate_tokens, chunk_text, pack
+from passage_index import PassageIndex
+
+SERPAPI_ENDPOINT = "https://serpapi.com/search.json"
+DEFAULT_MODEL = "openai/gpt-3.5-turbo"
+
+MAP_PROMPT = ("Summarize the following text. Keep every fact, figure, name and date "
+              "that could matter for later analysis:")
+REDUCE_PROMPT = ("Combine these partial summaries into one summary. Remove repetition "
+                 "but keep every distinct fact:")
+# Chunk summaries kept in memory, keyed by content hash
+SUMMARY_CACHE_SIZE = 1024
 
 class AIAgent:
     def __init__(self):
+        # Heavy dependencies are imported on first use to keep CLI startup fast
+        from dotenv import load_dotenv
         load_dotenv()
         self.openrouter_key = os.getenv('OPENROUTER_API_KEY')
         self.serpapi_key = os.getenv('SEARCH_API_KEY')
@@ -18,15 +34,29 @@ class AIAgent:
         Your task is to provide accurate and relevant information by combining web search results
         with your analytical capabilities. When analyzing content, focus on extracting key insights
         and maintaining factual accuracy."""
+        # Content longer than this is summarized chunk by chunk before analysis
+        self.chunk_tokens = int(os.getenv('SUMMARY_CHUNK_TOKENS', 1500))
+        self.summary_concurrency = int(os.getenv('SUMMARY_CONCURRENCY', 4))
+        # Keep chunk summaries short enough that several fit in one reduce step
+        self.summary_max_tokens = min(400, self.chunk_tokens // 3)
+        self._summary_cache: "OrderedDict[str, str]" = OrderedDict()
+        # Crawled pages are reduced to the passages most relevant to the query
+        self.passage_tokens = int(os.getenv('PASSAGE_TOKENS', 120))
+        self.passage_top_k = int(os.getenv('PASSAGE_TOP_K', 8))
+        # Upper bound for any single search, crawl or completion request (seconds)
+        self.request_timeout = float(os.getenv('REQUEST_TIMEOUT', 60))
 
     def search(self, query: str, num_results: int = 5) -> List[Dict[str, str]]:
         """Perform web search using SerpApi"""
         try:
+            from serpapi import GoogleSearch
+
             search = GoogleSearch({
                 "q": query,
                 "api_key": self.serpapi_key,
                 "num": num_results
             })
+            search.timeout = self.request_timeout
             results = search.get_dict()
             
             # Extract organic search results
@@ -45,39 +75,61 @@ class AIAgent:
 
     def analyze(self, content: List[Dict[str, str]], custom_prompt: Optional[str] = None) -> str:
         """Analyze content using OpenRouter API"""
-        if custom_prompt:
-            analysis_prompt = custom_prompt
-        else:
-            analysis_prompt = "Analyze and summarize the following content, highlighting key points and insights:"
-
-        formatted_content = "\n\n".join(
-            f"Title: {item.get('title', '')}\nSnippet: {item.get('snippet', '')}\nURL: {item.get('link', '')}"
-            for item in content
-        )
-        
         try:
-            payload = {
-                "model": "openai/gpt-3.5-turbo",  # Can be configured via env var
-                "messages": [
-                    {"role": "system", "content": self.system_prompt},
-                    {"role": "user", "content": f"{analysis_prompt}\n\n{formatted_content}"}
-                ],
-                "temperature": 0.7,
-                "max_tokens": 2000
-            }
-            
+            if self.needs_map_reduce(content):
+                return asyncio.run(self._with_session(self.analyze_async, content, custom_prompt))
+
+            import requests
+
             response = requests.post(
                 f"{self.base_url}/chat/completions",
                 headers=self.headers,
-                json=payload
+                json=self._build_payload(content, custom_prompt),
+                timeout=self.request_timeout
             )
             response.raise_for_status()
             return response.json()['choices'][0]['message']['content']
         except Exception as e:
             return f"Analysis failed: {str(e)}"
 
-    def search_and_analyze(self, query: str, num_results: int = 5, custom_prompt: Optional[str] = None) -> Dict[str, any]:
-        """Combined search and analysis function"""
+    def _format_content(self, content: List[Dict[str, str]]) -> str:
+        """Format search results (and crawled page text under "content", if present) for a prompt"""
+        return "\n\n".join(
+            f"Title: {item.get('title', '')}\nSnippet: {item.get('snippet', '')}\nURL: {item.get('link', '')}"
+            + (f"\nContent: {item['content']}" if item.get('content') else "")
+            for item in content
+        )
+
+    def _build_payload(self, content: List[Dict[str, str]], custom_prompt: Optional[str] = None,
+                       formatted_content: Optional[str] = None) -> Dict[str, Any]:
+        """Build the chat completion request for a list of search results"""
+        if custom_prompt:
+            analysis_prompt = custom_prompt
+        else:
+            analysis_prompt = "Analyze and summarize the following content, highlighting key points and insights:"
+
+        if formatted_content is None:
+            formatted_content = self._format_content(content)
+        return self._chat_payload(f"{analysis_prompt}\n\n{formatted_content}", max_tokens=2000)
+
+    def _chat_payload(self, user_message: str, max_tokens: int, temperature: float = 0.7) -> Dict[str, Any]:
+        return {
+            "model": DEFAULT_MODEL,  # Can be configured via env var
+            "messages": [
+                {"role": "system", "content": self.system_prompt},
+                {"role": "user", "content": user_message}
+            ],
+            "temperature": temperature,
+            "max_tokens": max_tokens
+        }
+
+    def needs_map_reduce(self, content: List[Dict[str, str]]) -> bool:
+        """Whether the formatted content is too long for a single analysis prompt"""
+        return estimate_tokens(self._format_content(content)) > self.chunk_tokens
+
+    def search_and_analyze(self, query: str, num_results: int = 5, custom_prompt: Optional[str] = None,
+                           crawl: bool = False) -> Dict[str, any]:
+        """Combined search and analysis function (optionally over the crawled result pages)"""
         search_results = self.search(query, num_results)
         if not search_results:
             return {
@@ -87,9 +139,229 @@ class AIAgent:
                 "analysis": None
             }
 
-        analysis = self.analyze(search_results, custom_prompt)
-        return {
+        content, selection = search_results, None
+        if crawl:
+            content, selection = self.select_passages(query, self.crawl_results(search_results))
+
+        analysis = self.analyze(content, custom_prompt)
+        result = {
             "success": True,
             "search_results": search_results,
             "analysis": analysis
         }
+        if selection:
+            result["passage_selection"] = selection
+        return result
+
+    def crawl_results(self, search_results: List[Dict[str, str]]) -> List[Dict[str, str]]:
+        """Copies of the search results with the crawled page text under the "content" key"""
+        from web_crawler import WebCrawler
+
+        crawler = WebCrawler(timeout=self.request_timeout)
+        return [{**result, "content": crawler.crawl_page(result["link"])} for result in search_results]
+
+    def select_passages(self, query: str, content: List[Dict[str, str]],
+                        top_k: Optional[int] = None) -> Tuple[List[Dict[str, str]], Dict[str, Any]]:
+        """
+        Keep only the crawled passages most relevant to the query
+
+        Every item's "content" is split into passages and indexed with BM25. Each item
+        keeps its top-ranked passages in page order. Returns the reduced content and
+        statistics on indexing time and the prompt-token reduction.
+        """
+        top_k = top_k or self.passage_top_k
+        started = time.perf_counter()
+        index = PassageIndex(passage_tokens=self.passage_tokens)
+        for position, item in enumerate(content):
+            if item.get("content"):
+                index.add_document(item["content"], source=position)
+        indexed = time.perf_counter()
+        hits = index.search(query, k=top_k)
+        searched = time.perf_counter()
+
+        selected: Dict[int, List[int]] = {}
+        for hit in hits:
+            selected.setdefault(hit["source"], []).append(hit["id"])
+        reduced = []
+        for position, item in enumerate(content):
+            item = {key: value for key, value in item.items() if key != "content"}
+            if position in selected:
+                item["content"] = "\n...\n".join(index.passages[i] for i in sorted(selected[position]))
+            reduced.append(item)
+
+        original_tokens = estimate_tokens(self._format_content(content))
+        prompt_tokens = estimate_tokens(self._format_content(reduced))
+        return reduced, {
+            "passages_indexed": len(index),
+            "passages_selected": len(hits),
+            "original_tokens": original_tokens,
+            "prompt_tokens": prompt_tokens,
+            "token_reduction_pct": round(100 * (1 - prompt_tokens / original_tokens), 1) if original_tokens else 0.0,
+            "index_ms": round((indexed - started) * 1000, 2),
+            "search_ms": round((searched - indexed) * 1000, 2)
+        }
+
+    async def search_async(self, session, query: str, num_results: int = 5) -> List[Dict[str, str]]:
+        """Perform web search using the SerpApi JSON endpoint on an aiohttp session"""
+        params = {"engine": "google", "q": query, "api_key": self.serpapi_key, "num": num_results}
+        async with session.get(SERPAPI_ENDPOINT, params=params) as response:
+            response.raise_for_status()
+            results = await response.json()
+
+        return [{
+            "title": result.get("title", ""),
+            "snippet": result.get("snippet", ""),
+            "link": result.get("link", "")
+        } for result in results.get("organic_results", [])[:num_results]]
+
+    async def analyze_async(self, session, content: List[Dict[str, str]], custom_prompt: Optional[str] = None) -> str:
+        """Analyze content using OpenRouter API on an aiohttp session (map-reduce for long content)"""
+        formatted_content = None
+        if self.needs_map_reduce(content):
+            formatted_content = await self.summarize(session, self._format_content(content))
+        return await self._complete(session, self._build_payload(content, custom_prompt, formatted_content))
+
+    async def _complete(self, session, payload: Dict[str, Any]) -> str:
+        async with session.post(
+            f"{self.base_url}/chat/completions",
+            headers=self.headers,
+            json=payload
+        ) as response:
+            response.raise_for_status()
+            data = await response.json()
+        return data['choices'][0]['message']['content']
+
+    async def _with_session(self, func, *args):
+        """Run an async method on a short-lived aiohttp session (for the synchronous API)"""
+        import aiohttp
+
+        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=300)) as session:
+            return await func(session, *args)
+
+    async def summarize(self, session, text: str) -> str:
+        """
+        Map-reduce summary of text longer than one prompt
+
+        The text is split into chunks of at most ``chunk_tokens`` (map). The chunk summaries
+        are then grouped into prompts of the same size and summarized again (reduce), until
+        the summaries fit in one prompt. At most ``summary_concurrency`` requests run at once.
+        """
+        semaphore = asyncio.Semaphore(self.summary_concurrency)
+        summaries = await self._summarize_all(session, chunk_text(text, self.chunk_tokens), MAP_PROMPT, semaphore)
+        while len(summaries) > 1 and estimate_tokens("\n\n".join(summaries)) > self.chunk_tokens:
+            groups = pack(summaries, self.chunk_tokens, separator="\n\n")
+            if len(groups) == len(summaries):
+                # Every summary already fills a prompt on its own; further rounds cannot shrink them
+                break
+            summaries = await self._summarize_all(session, groups, REDUCE_PROMPT, semaphore)
+        return "\n\n".join(summaries)
+
+    async def _summarize_all(self, session, texts: List[str], prompt: str, semaphore: asyncio.Semaphore) -> List[str]:
+        """Summarize texts concurrently, reusing cached summaries and sending each distinct text once"""
+        keys = [self._summary_key(prompt, text) for text in texts]
+        results = {}
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key in self._summary_cache:
+                self._summary_cache.move_to_end(key)
+                results[key] = self._summary_cache[key]
+            else:
+                missing[key] = text
+
+        async def summarize_one(key: str, text: str) -> None:
+            async with semaphore:
+                summary = await self._complete(
+                    session,
+                    self._chat_payload(f"{prompt}\n\n{text}", max_tokens=self.summary_max_tokens, temperature=0.3)
+                )
+            results[key] = self._summary_cache[key] = summary
+            if len(self._summary_cache) > SUMMARY_CACHE_SIZE:
+                self._summary_cache.popitem(last=False)
+
+        await asyncio.gather(*(summarize_one(key, text) for key, text in missing.items()))
+
+        return [results[key] for key in keys]
+
+    @staticmethod
+    def _summary_key(prompt: str, text: str) -> str:
+        return hashlib.sha256(f"{DEFAULT_MODEL}\0{prompt}\0{text}".encode("utf-8")).hexdigest()
+
+    async def search_and_analyze_async(self, session, query: str, num_results: int = 5,
+                                       custom_prompt: Optional[str] = None, crawl: bool = False) -> Dict[str, Any]:
+        """Async counterpart of search_and_analyze; failures are reported in the result"""
+        try:
+            search_results = await self.search_async(session, query, num_results)
+        except Exception as e:
+            return {"success": False, "error": f"Search failed: {str(e)}", "search_results": [], "analysis": None}
+        if not search_results:
+            return {"success": False, "error": "No search results found", "search_results": [], "analysis": None}
+
+        content, selection = search_results, None
+        if crawl:
+            content, selection = self.select_passages(query, await asyncio.to_thread(self.crawl_results, search_results))
+
+        try:
+            analysis = await self.analyze_async(session, content, custom_prompt)
+        except Exception as e:
+            return {"success": False, "error": f"Analysis failed: {str(e)}",
+                    "search_results": search_results, "analysis": None}
+        result = {"success": True, "search_results": search_results, "analysis": analysis}
+        if selection:
+            result["passage_selection"] = selection
+        return result
+
+    async def iter_search_and_analyze(
+        self,
+        queries: List[Union[str, Dict[str, Any]]],
+        concurrency: int = 5,
+        num_results: int = 5,
+        custom_prompt: Optional[str] = None,
+        crawl: bool = False
+    ) -> AsyncIterator[Tuple[int, Dict[str, Any]]]:
+        """
+        Run many queries concurrently, yielding (index, result) as each one completes
+
+        A query is either a string or a dict with "query" and optional "num_results",
+        "custom_prompt" and "crawl" overrides. At most ``concurrency`` queries are in flight, sharing
+        one connection pool.
+        """
+        import aiohttp
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def run(index: int, item: Union[str, Dict[str, Any]], session) -> Tuple[int, Dict[str, Any]]:
+            spec = {"query": item} if isinstance(item, str) else item
+            async with semaphore:
+                result = await self.search_and_analyze_async(
+                    session,
+                    spec["query"],
+                    spec.get("num_results", num_results),
+                    spec.get("custom_prompt", custom_prompt),
+                    spec.get("crawl", crawl)
+                )
+            return index, result
+
+        connector = aiohttp.TCPConnector(limit=concurrency * 2)
+        timeout = aiohttp.ClientTimeout(total=120)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            tasks = [asyncio.ensure_future(run(i, item, session)) for i, item in enumerate(queries)]
+            try:
+                for completed in asyncio.as_completed(tasks):
+                    yield await completed
+            finally:
+                for task in tasks:
+                    task.cancel()
+
+    async def search_and_analyze_many(
+        self,
+        queries: List[Union[str, Dict[str, Any]]],
+        concurrency: int = 5,
+        num_results: int = 5,
+        custom_prompt: Optional[str] = None,
+        crawl: bool = False
+    ) -> List[Dict[str, Any]]:
+        """Search and analyze many queries concurrently; results are returned in input order"""
+        results: List[Optional[Dict[str, Any]]] = [None] * len(queries)
+        async for index, result in self.iter_search_and_analyze(queries, concurrency, num_results, custom_prompt, crawl):
+            results[index] = result
+        return results
@@ -0,0 +1,54 @@
+from typing import List
+import re
+
+# Rough characters-per-token ratio for English text with OpenAI-style tokenizers
+CHARS_PER_TOKEN = 4
+
+_PARAGRAPH_SPLIT = re.compile(r"\n\s*\n|\n")
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+")
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count without loading a tokenizer"""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _split_oversized(piece: str, max_tokens: int) -> List[str]:
+    """Split a paragraph that exceeds max_tokens by sentences, then by words"""
+    parts = _SENTENCE_SPLIT.split(piece)
+    if len(parts) == 1:
+        parts = piece.split()
+    if len(parts) == 1:
+        width = max_tokens * CHARS_PER_TOKEN
+        return [piece[i:i + width] for i in range(0, len(piece), width)]
+    return pack(parts, max_tokens, separator=" ")
+
+
+def pack(pieces: List[str], max_tokens: int, separator: str = "\n") -> List[str]:
+    """Greedily join consecutive pieces into chunks of at most max_tokens"""
+    chunks, current, current_tokens = [], [], 0
+    separator_tokens = estimate_tokens(separator)
+    for piece in pieces:
+        piece = piece.strip()
+        if not piece:
+            continue
+        tokens = estimate_tokens(piece)
+        if tokens > max_tokens:
+            if current:
+                chunks.append(separator.join(current))
+                current, current_tokens = [], 0
+            chunks.extend(_split_oversized(piece, max_tokens))
+            continue
+        if current and current_tokens + separator_tokens + tokens > max_tokens:
+            chunks.append(separator.join(current))
+            current, current_tokens = [], 0
+        current.append(piece)
+        current_tokens += tokens + (separator_tokens if len(current) > 1 else 0)
+    if current:
+        chunks.append(separator.join(current))
+    return chunks
+
+
+def chunk_text(text: str, max_tokens: int) -> List[str]:
+    """Split text on paragraph boundaries into chunks of at most max_tokens"""
+    return pack(_PARAGRAPH_SPLIT.split(text), max_tokens)
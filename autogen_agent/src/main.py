@@ -1,6 +1,6 @@
+import argparse
+import asyncio
 import os
-from dotenv import load_dotenv
-from ai_agent import AIAgent
 import json
 
 def format_results(results: dict) -> str:
@@ -14,11 +14,94 @@ def format_results(results: dict) -> str:
         output += f"   URL: {result['link']}\n"
         output += f"   Summary: {result['snippet'][:200]}...\n\n"
 
+    selection = results.get("passage_selection")
+    if selection:
+        output += (f"Passages: {selection['passages_selected']} of {selection['passages_indexed']} sent to the model, "
+                   f"~{selection['original_tokens']} -> ~{selection['prompt_tokens']} tokens "
+                   f"({selection['token_reduction_pct']}% fewer, indexed in {selection['index_ms']} ms)\n")
+
     output += "\n=== AI Analysis ===\n\n"
     output += results["analysis"]
     return output
 
+def read_queries(path: str) -> list:
+    """Read batch queries from a JSONL file; each line is a string or an object with a "query" key"""
+    queries = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            item = json.loads(line)
+            if isinstance(item, str):
+                item = {"query": item}
+            item.setdefault("id", str(line_number))
+            queries.append(item)
+    return queries
+
+def load_checkpoint(path: str) -> dict:
+    """Latest result per query id from an existing output file (a torn last line is truncated away)"""
+    completed = {}
+    if not os.path.exists(path):
+        return completed
+    with open(path, 'rb+') as f:
+        data = f.read()
+        end = data.rfind(b"\n") + 1
+        if end < len(data):
+            # An interrupted write left a partial line; drop it so the next append starts a fresh line
+            f.truncate(end)
+    for line in data[:end].decode('utf-8').splitlines():
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        completed[record["id"]] = record
+    return completed
+
+async def run_batch(agent, input_path: str, output_path: str, concurrency: int = 5,
+                    num_results: int = 5, custom_prompt: str = None, retry_failed: bool = False,
+                    crawl: bool = False) -> None:
+    """Run every query in a JSONL file, appending one result line per query as it completes"""
+    queries = read_queries(input_path)
+    completed = load_checkpoint(output_path)
+    pending = [
+        q for q in queries
+        if q["id"] not in completed or (retry_failed and not completed[q["id"]]["success"])
+    ]
+    print(f"{len(queries)} queries, {len(queries) - len(pending)} already done, {len(pending)} to run")
+
+    failures = 0
+    with open(output_path, 'a', encoding='utf-8') as out:
+        async for index, result in agent.iter_search_and_analyze(
+            pending, concurrency=concurrency, num_results=num_results, custom_prompt=custom_prompt, crawl=crawl
+        ):
+            query = pending[index]
+            out.write(json.dumps({"id": query["id"], "query": query["query"], **result}, ensure_ascii=False) + "\n")
+            # Flushed per line so the output doubles as the resume checkpoint
+            out.flush()
+            os.fsync(out.fileno())
+            failures += not result["success"]
+            print(f"[{'ok' if result['success'] else 'failed'}] {query['id']}: {query['query']}")
+
+    print(f"Done: {len(pending) - failures} succeeded, {failures} failed. Results in {output_path}")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Search the web and analyze the results with an LLM")
+    parser.add_argument("--batch", metavar="QUERIES_JSONL", help="Run queries from a JSONL file instead of prompting")
+    parser.add_argument("--output", default="results.jsonl", help="JSONL results file, also used to resume (default: results.jsonl)")
+    parser.add_argument("--concurrency", type=int, default=5, help="Queries in flight at once (default: 5)")
+    parser.add_argument("--num-results", type=int, default=5, help="Search results analyzed per query (default: 5)")
+    parser.add_argument("--prompt", default=None, help="Custom analysis prompt for queries that do not set one")
+    parser.add_argument("--retry-failed", action="store_true", help="Re-run queries whose last result failed")
+    parser.add_argument("--crawl", action="store_true", help="Crawl result pages and send only the most relevant passages")
+    return parser.parse_args()
+
 def main():
+    from dotenv import load_dotenv
+    from ai_agent import AIAgent
+
+    args = parse_args()
+
     # Ensure environment variables are loaded
     load_dotenv()
     
@@ -31,6 +114,19 @@ def main():
     # Initialize the AI agent
     agent = AIAgent()
 
+    if args.batch:
+        asyncio.run(run_batch(
+            agent,
+            args.batch,
+            args.output,
+            concurrency=max(1, args.concurrency),
+            num_results=max(1, min(10, args.num_results)),
+            custom_prompt=args.prompt,
+            retry_failed=args.retry_failed,
+            crawl=args.crawl
+        ))
+        return
+
     while True:
         try:
             # Get user input
@@ -50,6 +146,8 @@ def main():
             num_results = max(1, min(10, num_results))  # Ensure between 1 and 10
             
             custom_prompt = input("Custom analysis prompt (press Enter to skip): ").strip() or None
+            
+            crawl = input("Crawl result pages for relevant passages? (y/N): ").strip().lower() in ['y', 'yes']
 
             print("\nSearching and analyzing... Please wait.\n")
 
@@ -57,7 +155,8 @@ def main():
             results = agent.search_and_analyze(
                 query=query,
                 num_results=num_results,
-                custom_prompt=custom_prompt
+                custom_prompt=custom_prompt,
+                crawl=crawl
             )
 
             # Display formatted results
@@ -0,0 +1,89 @@
+from typing import List, Dict, Any, Tuple
+from array import array
+from collections import Counter
+import heapq
+import math
+import re
+
+from chunking import chunk_text
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset("""
+a an and are as at be been but by can do does for from had has have he her his how i if in into is it its
+just more most not of on or our she so than that the their them then there these they this to was we were
+what when where which who will with would you your
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens without stopwords"""
+    return [token for token in _TOKEN.findall(text.lower()) if token not in STOPWORDS]
+
+
+class PassageIndex:
+    """
+    In-memory BM25 index over passages of crawled pages
+
+    Postings are stored per term as two parallel packed arrays (passage ids as
+    unsigned ints, term frequencies as unsigned shorts), so an index over dozens of
+    pages stays small and builds in milliseconds.
+    """
+
+    def __init__(self, passage_tokens: int = 120, k1: float = 1.5, b: float = 0.75):
+        self.passage_tokens = passage_tokens
+        self.k1 = k1
+        self.b = b
+        self.passages: List[str] = []
+        self.sources: List[Any] = []
+        self.lengths = array("I")
+        self.postings: Dict[str, Tuple[array, array]] = {}
+        self._total_length = 0
+
+    def add_document(self, text: str, source: Any = None) -> int:
+        """Split a page into passages and index them; returns the number of passages added"""
+        passages = chunk_text(text, self.passage_tokens)
+        for passage in passages:
+            self.add_passage(passage, source)
+        return len(passages)
+
+    def add_passage(self, text: str, source: Any = None) -> int:
+        passage_id = len(self.passages)
+        terms = tokenize(text)
+        self.passages.append(text)
+        self.sources.append(source)
+        self.lengths.append(len(terms))
+        self._total_length += len(terms)
+        index = self.postings
+        for term, frequency in Counter(terms).items():
+            postings = index.get(term)
+            if postings is None:
+                postings = index[term] = (array("I"), array("H"))
+            postings[0].append(passage_id)
+            postings[1].append(frequency if frequency < 0xFFFF else 0xFFFF)
+        return passage_id
+
+    def search(self, query: str, k: int = 5) -> List[Dict[str, Any]]:
+        """Top-k passages for a query by BM25 score, best first"""
+        count = len(self.passages)
+        if not count:
+            return []
+        average_length = self._total_length / count or 1.0
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if postings is None:
+                continue
+            ids, frequencies = postings
+            idf = math.log(1 + (count - len(ids) + 0.5) / (len(ids) + 0.5))
+            for passage_id, frequency in zip(ids, frequencies):
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[passage_id] / average_length)
+                scores[passage_id] = scores.get(passage_id, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + norm)
+
+        best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+        return [
+            {"id": passage_id, "text": self.passages[passage_id], "source": self.sources[passage_id], "score": score}
+            for passage_id, score in best
+        ]
+
+    def __len__(self) -> int:
+        return len(self.passages)
@@ -1,11 +1,10 @@
-from serpapi import GoogleSearch
-from bs4 import BeautifulSoup
-from typing import List, Dict
+from typing import List, Dict, Optional
 import os
 
 class WebCrawler:
-    def __init__(self):
+    def __init__(self, timeout: Optional[float] = None):
         self.search_api_key = os.getenv('SEARCH_API_KEY')
+        self.timeout = timeout or float(os.getenv('REQUEST_TIMEOUT', 60))
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3'
         }
@@ -13,10 +12,13 @@ class WebCrawler:
     def search_web(self, query: str) -> List[Dict[str, str]]:
         """Perform web search using SerpAPI"""
         try:
+            from serpapi import GoogleSearch
+
             search = GoogleSearch({
                 "q": query,
                 "api_key": self.search_api_key
             })
+            search.timeout = self.timeout
             results = search.get_dict().get('organic_results', [])
             return [{
                 'title': r.get('title'),
@@ -29,7 +31,10 @@ class WebCrawler:
     def crawl_page(self, url: str) -> str:
         """Crawl a web page and extract main content"""
         try:
-            response = requests.get(url, headers=self.headers)
+            import requests
+            from bs4 import BeautifulSoup
+
+            response = requests.get(url, headers=self.headers, timeout=self.timeout)
             response.raise_for_status()
             soup = BeautifulSoup(response.text, 'html.parser')
             
@@ -0,0 +1,96 @@
+"""
+Memory and copy cost of per-article dicts versus ArticleBatch through the news pipeline.
+
+Simulates the stages an article goes through (fetch -> agent merge -> sentiment ->
+report integration). The dict pipeline re-wraps and copies the list at every stage,
+as the services and agents did before; the batch pipeline hands one ArticleBatch
+along by reference and only materializes dicts at the end for a bounded LLM payload.
+
+    python benchmarks/article_batch_bench.py --articles 5000
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from services.article_batch import ArticleBatch  # noqa: E402
+
+
+def raw_results(count):
+    return [
+        {
+            "title": f"Company {i % 50} reports quarterly results beat estimates {i}",
+            "source": f"Publisher {i % 20}",
+            "date": f"{i % 24} hours ago",
+            "snippet": f"Shares moved after the company said revenue grew {i % 30} percent in the quarter {i}",
+            "link": f"https://news.example.com/articles/{i}"
+        }
+        for i in range(count)
+    ]
+
+
+def dict_pipeline(results):
+    # NewsService: one dict per article
+    articles = [{
+        "title": r.get("title"),
+        "source": r.get("source"),
+        "published": r.get("date"),
+        "snippet": r.get("snippet"),
+        "link": r.get("link"),
+        "sentiment_score": (i % 7 - 3) / 10
+    } for i, r in enumerate(results)]
+    # Agent merge with previously known articles: new list of new dicts
+    merged = [dict(article) for article in articles]
+    # Sentiment stage: list of scores
+    scores = [article["sentiment_score"] for article in merged]
+    # Report integration: another copy of the news payload
+    integrated = [dict(article) for article in merged]
+    return integrated, sum(scores) / len(scores)
+
+
+def batch_pipeline(results, llm_limit):
+    articles = ArticleBatch()
+    for i, r in enumerate(results):
+        articles.append(
+            title=r.get("title"),
+            source=r.get("source"),
+            published=r.get("date"),
+            snippet=r.get("snippet"),
+            link=r.get("link"),
+            sentiment_score=(i % 7 - 3) / 10
+        )
+    merged = articles                       # passed by reference
+    scores = merged.scored()
+    payload = merged.to_dicts(limit=llm_limit)  # JSON/LLM boundary only
+    return merged, payload, sum(scores) / len(scores)
+
+
+def measure(label, func, *args):
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - started
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<16} retained {current / 1024:9.1f} KiB   peak {peak / 1024:9.1f} KiB   {elapsed * 1000:8.2f} ms")
+    return result, current, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--articles", type=int, default=5000)
+    parser.add_argument("--llm-limit", type=int, default=50, help="Rows materialized as dicts for the LLM")
+    args = parser.parse_args()
+
+    results = raw_results(args.articles)
+    print(f"{args.articles} articles, {args.llm_limit} materialized at the LLM boundary\n")
+    _, dict_current, dict_peak = measure("list of dicts", dict_pipeline, results)
+    _, batch_current, batch_peak = measure("ArticleBatch", batch_pipeline, results, args.llm_limit)
+    print(f"\nretained memory reduced {dict_current / batch_current:.1f}x, peak reduced {dict_peak / batch_peak:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
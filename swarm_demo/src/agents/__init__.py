@@ -1,18 +1,36 @@
 """
 Agent package initialization.
+
+Agent classes pull in autogen, yfinance, serpapi and textblob, so the
+submodules are imported on first attribute access rather than at package
+import time.
 """
-from .base_agent import BaseAgent
-from .yahoo_agent import YahooFinanceAgent
-from .google_agent import GoogleNewsAgent
-from .report_agent import ReportWriterAgent
-from .agent_factory import create_swarm_network, get_default_manager_config, create_analysis_agents
+import importlib
+
+_LAZY_ATTRIBUTES = {
+    'BaseAgent': '.base_agent',
+    'YahooFinanceAgent': '.yahoo_agent',
+    'GoogleNewsAgent': '.google_agent',
+    'ReportWriterAgent': '.report_agent',
+    'create_swarm_network': '.agent_factory',
+    'get_default_manager_config': '.agent_factory',
+    'create_analysis_agents': '.agent_factory',
+    'SpeakerGraph': '.speaker_graph',
+    'WORKFLOWS': '.speaker_graph',
+    'TerminationMonitor': '.termination'
+}
+
+__all__ = list(_LAZY_ATTRIBUTES)
+
+
+def __getattr__(name):
+    module_name = _LAZY_ATTRIBUTES.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
+
 
-__all__ = [
-    'BaseAgent',
-    'YahooFinanceAgent',
-    'GoogleNewsAgent',
-    'ReportWriterAgent',
-    'create_swarm_network',
-    'get_default_manager_config',
-    'create_analysis_agents'
-]
\ No newline at end of file
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -1,45 +1,71 @@
 """
 Agent creation utilities.
 """
-import os
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from autogen import GroupChat, GroupChatManager
 import logging
+from config import Config
 from .yahoo_agent import YahooFinanceAgent
 from .google_agent import GoogleNewsAgent
 from .report_agent import ReportWriterAgent
+from .speaker_graph import SpeakerGraph
+from .termination import TerminationMonitor
+from .model_client import register_model_clients, instrument_llm_calls
 
 logger = logging.getLogger(__name__)
 
 def create_swarm_network(
     manager_config: Dict[str, Any],
-    agents: List[Any]
+    agents: List[Any],
+    workflow: Any = "default",
+    llm_selection: bool = True,
+    termination_config: Optional[Dict[str, Any]] = None
 ) -> Dict[str, Any]:
     """创建GroupChat实例"""
     try:
+        # Agent通过工具获取数据，对话中只传递结果句柄和摘要
+        for agent in agents:
+            if hasattr(agent, "register_tools"):
+                agent.register_tools()
+        
+        # 按工作流转移图选择发言者，只有存在多个选择时才调用Manager的LLM
+        speaker_graph = SpeakerGraph(workflow, llm_selection=llm_selection)
+        
         # 创建GroupChat
         group_chat = GroupChat(
             agents=agents,
             messages=[],
-            max_round=50
+            max_round=50,
+            speaker_selection_method=speaker_graph,
+            allowed_or_disallowed_speaker_transitions=speaker_graph.allowed_transitions(agents),
+            speaker_transitions_type="allowed"
         )
         
+        # 报告完成、对话停滞或预算耗尽时立即结束对话
+        termination_monitor = TerminationMonitor(**(termination_config or {}))
+        
         # 创建GroupChatManager
         manager = GroupChatManager(
             groupchat=group_chat,
-            llm_config=manager_config["llm_config"]
+            llm_config=manager_config["llm_config"],
+            is_termination_msg=termination_monitor
         )
+        manager.termination_monitor = termination_monitor
+        register_model_clients(manager)
+        instrument_llm_calls(manager, "manager")
         
         return {
             "group_chat": group_chat,
-            "manager": manager
+            "manager": manager,
+            "speaker_graph": speaker_graph,
+            "termination_monitor": termination_monitor
         }
     except Exception as e:
         logger.error(f"Error creating swarm: {str(e)}")
         raise
 
-def get_default_manager_config() -> Dict[str, Any]:
-    """获取默认的Manager配置"""
+def get_default_manager_config(model_routing: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """获取默认的Manager配置（model_routing为本次运行按角色覆盖的模型设置）"""
     return {
         "name": "Research_Manager",
         "system_message": """你是一个专业的研究项目经理，负责：
@@ -47,15 +73,7 @@ def get_default_manager_config() -> Dict[str, Any]:
 2. 管理工作流程
 3. 确保任务完成
 4. 处理异常情况""",
-        "llm_config": {
-            "config_list": [{
-                "model": os.getenv("LLM_MODEL", "anthropic/claude-3-sonnet"),
-                "api_key": os.getenv("OPENROUTER_API_KEY"),
-                "base_url": os.getenv("OPENROUTER_BASE_URL"),
-                "api_type": "openrouter"
-            }],
-            "temperature": float(os.getenv("TEMPERATURE", 0.7))
-        }
+        "llm_config": Config.get_llm_config("manager", (model_routing or {}).get("manager"))
     }
 
 def create_analysis_agents(config: Dict[str, Any]) -> List[Any]:
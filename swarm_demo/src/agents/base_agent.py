@@ -1,13 +1,26 @@
 """
 Base agent class with common functionality.
 """
+import json
 import logging
-from typing import Dict, Any, Optional
-from autogen import AssistantAgent as Agent
+from typing import Dict, Any, Optional, Callable, Awaitable, Tuple, Annotated
+from autogen import AssistantAgent as Agent, register_function
 from datetime import datetime
+from config import Config
+from services import deadline
+from services.news_archive import NewsArchive
+from .model_client import register_model_clients, instrument_llm_calls
 
 logger = logging.getLogger(__name__)
 
+# Appended to the system message of agents with registered tools
+TOOL_GUIDANCE = """
+工具调用返回结果句柄（例如 yahoo_market_analysis#1）和简短摘要，完整数据保存在分析上下文中。
+在消息中通过句柄引用结果，不要粘贴完整数据；只有需要具体细节时才调用inspect_result(handle, path)。"""
+
+# Upper bound on the size of an inspect_result response
+MAX_INSPECT_CHARS = 2000
+
 class BaseAgent(Agent):
     """Base agent class with common functionality"""
     
@@ -19,6 +32,82 @@ class BaseAgent(Agent):
             llm_config=kwargs.get('llm_config', {})
         )
         self._system_message = system_message
+        self.role = kwargs.get('role', name.lower())
+        register_model_clients(self)
+        instrument_llm_calls(self, self.role)
+        self.analysis_context: Optional['AnalysisContext'] = None
+    
+    def bind_context(self, context: Optional['AnalysisContext']) -> None:
+        """Set the analysis context used by this agent's tools for the current run"""
+        self.analysis_context = context
+    
+    def tools(self) -> Dict[str, Tuple[Callable[..., Awaitable[str]], str]]:
+        """Tools exposed to the LLM, by name: (coroutine function, description)"""
+        return {
+            "inspect_result": (
+                self.inspect_result,
+                "Read part of a stored tool result by handle. path is dot-separated keys or list indices, "
+                "e.g. 'data.market_data' or 'data.events.0'; leave it empty for the top-level keys."
+            )
+        }
+    
+    def register_tools(self) -> None:
+        """Register the tools for LLM calls; the agent executes its own tool calls"""
+        if not self.llm_config:
+            logger.warning(f"{self.name} has no LLM config, skipping tool registration")
+            return
+        for name, (function, description) in self.tools().items():
+            register_function(function, caller=self, executor=self, name=name, description=description)
+        self.update_system_message(self._system_message + TOOL_GUIDANCE)
+    
+    async def _run_tool(self, tool: str, args: Dict[str, Any], run: Callable[[], Awaitable[Any]],
+                        digest: Callable[[Any], str]) -> str:
+        """Run a tool at most once per analysis and answer with its result handle and a digest"""
+        context = self.analysis_context
+        if context is None:
+            raise RuntimeError(f"{self.name} has no analysis context for tool {tool}")
+        handle, cached = await deadline.within(context.memoize(tool, args, run))
+        self._log_context(context, "tool_call", {"tool": tool, "args": args, "handle": handle, "cached": cached})
+        return json.dumps({
+            "handle": handle,
+            "cached": cached,
+            "digest": digest(context.get_result(handle))
+        }, ensure_ascii=False)
+    
+    async def inspect_result(
+        self,
+        handle: Annotated[str, "Result handle returned by a tool, e.g. 'google_news_analysis#2'"],
+        path: Annotated[str, "Dot-separated keys or list indices inside the result"] = ""
+    ) -> str:
+        """Bounded JSON view of part of a stored tool result"""
+        if self.analysis_context is None:
+            raise RuntimeError(f"{self.name} has no analysis context")
+        value = self.analysis_context.get_result(handle)
+        for part in filter(None, path.split(".")):
+            if isinstance(value, dict) or hasattr(value, "keys"):
+                value = value[part]
+            else:
+                value = value[int(part)]
+        
+        if isinstance(value, dict) or hasattr(value, "keys"):
+            if not path:
+                return json.dumps({"keys": list(value.keys())}, ensure_ascii=False)
+            value = {key: value[key] for key in value.keys()}
+        text = json.dumps(value, ensure_ascii=False, default=self._jsonable)
+        if len(text) > MAX_INSPECT_CHARS:
+            text = text[:MAX_INSPECT_CHARS] + f"... [truncated, {len(text)} chars; narrow the path]"
+        return text
+    
+    @staticmethod
+    def _jsonable(value: Any) -> Any:
+        """JSON fallback for article batches, numpy scalars and timestamps"""
+        if hasattr(value, "to_dicts"):
+            return value.to_dicts(limit=10)
+        if hasattr(value, "to_dict"):
+            return value.to_dict()
+        if hasattr(value, "item"):
+            return value.item()
+        return str(value)
     
     def _log_context(self, context: Optional['AnalysisContext'], 
                     action: str, details: Dict[str, Any]) -> None:
@@ -45,6 +134,24 @@ class BaseAgent(Agent):
         if context:
             context.update_context(self.name, result)
     
+    def _open_archive(self) -> Optional[NewsArchive]:
+        """Open the local news archive; analysis continues without it if it is unavailable"""
+        try:
+            return NewsArchive(Config.get_system_config()["news_archive_db"])
+        except Exception as e:
+            logger.warning(f"News archive unavailable: {str(e)}")
+            return None
+    
+    def _archive_articles(self, archive: Optional[NewsArchive], articles, origin: str,
+                          ticker: Optional[str] = None, query: Optional[str] = None) -> None:
+        """Store fetched articles in the local news archive"""
+        if archive is None:
+            return
+        try:
+            archive.ingest(articles, origin=origin, ticker=ticker, query=query)
+        except Exception as e:
+            logger.warning(f"Failed to archive {origin} articles: {str(e)}")
+    
     async def execute_task(self, task: Dict[str, Any]) -> Dict[str, Any]:
         """Execute a task within the agent network"""
         try:
@@ -1,10 +1,13 @@
 """
 Google News analysis agent.
 """
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Annotated
 from datetime import datetime
 from .base_agent import BaseAgent
+from config import Config
 from services.news_service import NewsService
+from services.article_batch import ArticleBatch
+from utils import resolve_ticker
 import logging
 
 logger = logging.getLogger(__name__)
@@ -50,6 +53,39 @@ class GoogleNewsAgent(BaseAgent):
         else:
             raise ValueError(f"Unknown action: {action}")
 
+    def tools(self) -> Dict[str, Any]:
+        """注册给LLM的工具"""
+        tools = super().tools()
+        tools["google_news_analysis"] = (
+            self.google_news_analysis,
+            "Fetch Google News articles for a query and analyze their sentiment, events and main topics. "
+            "Returns a result handle and a short digest."
+        )
+        return tools
+    
+    async def google_news_analysis(
+        self,
+        query: Annotated[str, "News search query, e.g. 'Tesla earnings'"]
+    ) -> str:
+        """工具：获取并分析新闻（同一查询在一次分析中只获取一次）"""
+        return await self._run_tool(
+            "google_news_analysis",
+            {"query": " ".join(query.split()).casefold()},
+            lambda: self.analyze_news(query, self.analysis_context),
+            self._digest
+        )
+    
+    def _digest(self, result: Dict[str, Any]) -> str:
+        """新闻分析结果的简短摘要"""
+        data = result["data"]
+        overall = data["sentiment_analysis"]["overall_sentiment"]
+        events = "; ".join(event["title"] for event in data["events"][:3] if event.get("title"))
+        topics = ", ".join(topic["topic"] for topic in data["summary"]["main_topics"][:5])
+        return (
+            f"{len(data['news_articles'])} articles; sentiment {overall['overall_sentiment']} "
+            f"({overall['average_score']:+.2f}); events: {events or 'none'}; topics: {topics or 'none'}"
+        )
+
     async def analyze_news(self, query: str, context: Optional['AnalysisContext'] = None) -> Dict[str, Any]:
         """分析Google新闻数据"""
         logger.info(f"Analyzing Google news for query: {query}")
@@ -59,8 +95,41 @@ class GoogleNewsAgent(BaseAgent):
                 "description": "Starting Google News analysis"
             })
             
-            # 使用NewsService获取新闻
-            news_data = NewsService.get_google_news(query)
+            # 增量分析：复用上一次运行的文章与情感评分，只获取上次运行之后的新闻
+            topic_state = context.topic_state if context else None
+            known_articles = topic_state["articles"] if topic_state else {}
+            since = (
+                datetime.fromisoformat(topic_state["last_run"])
+                if topic_state and topic_state.get("last_run") else None
+            )
+            
+            # 最近已抓取过同一查询时直接使用本地归档，否则使用NewsService并发分页获取新闻
+            news_config = Config.get_news_config()
+            archive = self._open_archive()
+            if archive is not None and archive.is_fresh("google", query, news_config["archive_max_age_minutes"]):
+                news_data = self._news_from_archive(archive, query, known_articles, news_config["max_articles"])
+                logger.info(f"Using {len(news_data['news_articles'])} archived Google News articles for '{query}'")
+            else:
+                news_data = await NewsService.fetch_google_news(
+                    query,
+                    max_articles=news_config["max_articles"],
+                    known_articles=known_articles,
+                    since=since,
+                    fan_out=news_config["fan_out"],
+                    date_window_days=news_config["date_window_days"]
+                )
+                self._archive_articles(archive, news_data["news_articles"], origin="google",
+                                       ticker=resolve_ticker(query), query=query)
+            
+            if topic_state is not None:
+                news_data["news_articles"] = self._merge_known_articles(news_data, known_articles)
+                new_links = set(news_data["new_links"])
+                for article in news_data["news_articles"]:
+                    topic_state["articles"][article["link"]] = article.to_dict()
+                context.record_change("new_articles", [
+                    article["title"] for article in news_data["news_articles"]
+                    if article["link"] in new_links
+                ])
             
             # 分析情感
             sentiment_analysis = await self.analyze_sentiment(news_data["news_articles"], context)
@@ -106,7 +175,7 @@ class GoogleNewsAgent(BaseAgent):
         except Exception as e:
             self._handle_error(e, "analyzing Google news")
     
-    async def analyze_sentiment(self, articles: List[Dict[str, Any]], context: Optional['AnalysisContext'] = None) -> Dict[str, Any]:
+    async def analyze_sentiment(self, articles: ArticleBatch, context: Optional['AnalysisContext'] = None) -> Dict[str, Any]:
         """分析新闻情感"""
         try:
             self._log_context(context, "analyze_sentiment", {
@@ -114,8 +183,8 @@ class GoogleNewsAgent(BaseAgent):
                 "article_count": len(articles)
             })
             
-            # 使用NewsService分析情感
-            sentiment_data = NewsService.analyze_sentiment(articles)
+            # 使用获取新闻时已计算的逐篇评分进行汇总，避免重复评分
+            sentiment_data = NewsService.aggregate_sentiment(articles)
             
             return {
                 "overall_sentiment": sentiment_data["overall"],
@@ -126,7 +195,7 @@ class GoogleNewsAgent(BaseAgent):
         except Exception as e:
             self._handle_error(e, "analyzing sentiment")
     
-    async def identify_events(self, articles: List[Dict[str, Any]], context: Optional['AnalysisContext'] = None) -> List[Dict[str, Any]]:
+    async def identify_events(self, articles: ArticleBatch, context: Optional['AnalysisContext'] = None) -> List[Dict[str, Any]]:
         """识别重要事件"""
         try:
             self._log_context(context, "identify_events", {
@@ -150,7 +219,10 @@ class GoogleNewsAgent(BaseAgent):
             })
             
             summary = {
-                "main_topics": NewsService.extract_main_topics(analysis_data["articles"]),
+                "main_topics": NewsService.extract_main_topics(
+                    analysis_data["articles"],
+                    corpus_path=Config.get_news_config()["topic_corpus_path"]
+                ),
                 "key_events": [event["title"] for event in analysis_data["events"][:3]],
                 "sentiment_overview": analysis_data["sentiment"]["overall_sentiment"],
                 "timestamp": datetime.utcnow().isoformat()
@@ -159,4 +231,23 @@ class GoogleNewsAgent(BaseAgent):
             return summary
             
         except Exception as e:
-            self._handle_error(e, "generating news summary")
\ No newline at end of file
+            self._handle_error(e, "generating news summary")
+    
+    def _merge_known_articles(self, news_data: Dict[str, Any],
+                              known_articles: Dict[str, Dict[str, Any]]) -> ArticleBatch:
+        """将上一次运行已知的文章追加到本次获取的批次中（按链接去重；本次获取的文章在前，已知文章保持原有顺序）"""
+        articles = news_data["news_articles"]
+        for link, article in known_articles.items():
+            if not articles.contains_link(link):
+                articles.append_dict(article)
+        return articles
+    
+    def _news_from_archive(self, archive: 'NewsArchive', query: str,
+                           known_articles: Dict[str, Dict[str, Any]], limit: int) -> Dict[str, Any]:
+        """从本地归档构造与fetch_google_news相同结构的结果"""
+        articles = archive.search(query=query, origin="google", limit=limit)
+        return {
+            "news_articles": articles,
+            "new_links": [link for link in articles.links if link not in known_articles],
+            "sentiment": NewsService.aggregate_sentiment(articles)["overall"]
+        }
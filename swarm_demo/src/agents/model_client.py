@@ -0,0 +1,405 @@
+"""
+Latency-aware model fallback, hedged requests and per-role usage for agent LLM calls.
+"""
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Dict, Any, List, Optional
+
+from services import deadline
+
+logger = logging.getLogger(__name__)
+
+# Chat completion parameters forwarded to the provider (autogen also passes its own config keys)
+_REQUEST_KEYS = (
+    "messages", "tools", "tool_choice", "functions", "function_call", "temperature", "top_p",
+    "max_tokens", "stop", "seed", "response_format", "frequency_penalty", "presence_penalty"
+)
+
+# 每个模型用于计算p95的最近样本数，以及计算p95前需要的最少样本数
+_SAMPLES = 200
+_MIN_SAMPLES = 20
+
+_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="llm")
+
+
+class HedgeCancelled(Exception):
+    """对冲请求中落败的一方被取消"""
+
+
+class LatencyTracker:
+    """
+    按模型统计延迟（进程内共享）
+
+    记录首个token时间（TTFT）与总耗时的EWMA、最近TTFT样本的p95、失败次数，
+    以及对冲请求的次数与胜出次数。
+    """
+
+    def __init__(self, alpha: float = 0.2, failure_cooldown: float = 30.0):
+        self.alpha = alpha
+        self.failure_cooldown = failure_cooldown
+        self.models: Dict[str, Dict[str, Any]] = {}
+        self.requests = 0
+        self.hedges = 0
+        self._lock = threading.Lock()
+
+    def _model(self, model: str) -> Dict[str, Any]:
+        if model not in self.models:
+            self.models[model] = {
+                "ewma_ttft": None, "ewma_total": None, "samples": deque(maxlen=_SAMPLES),
+                "requests": 0, "failures": 0, "last_failure": None, "hedge_wins": 0, "cancelled": 0
+            }
+        return self.models[model]
+
+    def _ewma(self, previous: Optional[float], value: float) -> float:
+        return value if previous is None else previous + self.alpha * (value - previous)
+
+    def record_success(self, model: str, ttft: float, total: float) -> None:
+        with self._lock:
+            stats = self._model(model)
+            stats["requests"] += 1
+            stats["ewma_ttft"] = self._ewma(stats["ewma_ttft"], ttft)
+            stats["ewma_total"] = self._ewma(stats["ewma_total"], total)
+            stats["samples"].append(ttft)
+
+    def record_failure(self, model: str) -> None:
+        with self._lock:
+            stats = self._model(model)
+            stats["requests"] += 1
+            stats["failures"] += 1
+            stats["last_failure"] = time.monotonic()
+
+    def record_cancelled(self, model: str) -> None:
+        with self._lock:
+            self._model(model)["cancelled"] += 1
+
+    def record_request(self, hedged: bool, winner: Optional[str] = None) -> None:
+        with self._lock:
+            self.requests += 1
+            if hedged:
+                self.hedges += 1
+                if winner is not None:
+                    self._model(winner)["hedge_wins"] += 1
+
+    def p95_ttft(self, model: str) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._model(model)["samples"])
+        if len(samples) < _MIN_SAMPLES:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+
+    def may_hedge(self, max_ratio: float) -> bool:
+        """对冲请求占比不超过max_ratio（限制额外成本）"""
+        with self._lock:
+            return self.hedges < max_ratio * (self.requests + 1)
+
+    def healthy(self, model: str) -> bool:
+        """模型最近没有失败（处于冷却期的模型排到备选列表末尾）"""
+        with self._lock:
+            last_failure = self._model(model)["last_failure"]
+        return last_failure is None or time.monotonic() - last_failure > self.failure_cooldown
+
+    def order(self, models: List[str], degraded_factor: float) -> List[str]:
+        """
+        调整模型尝试顺序：保持配置顺序，但将冷却期内的模型以及EWMA总耗时
+        超过后续最快健康模型degraded_factor倍的模型后移
+        """
+        healthy = [model for model in models if self.healthy(model)]
+        cooling = [model for model in models if model not in healthy]
+        with self._lock:
+            totals = {model: self._model(model)["ewma_total"] for model in healthy}
+        ordered = []
+        for i, model in enumerate(healthy):
+            alternatives = [totals[m] for m in healthy[i + 1:] if totals[m] is not None]
+            if totals[model] is not None and alternatives and totals[model] > degraded_factor * min(alternatives):
+                continue
+            ordered.append(model)
+        ordered += [model for model in healthy if model not in ordered]
+        return ordered + cooling
+
+    def snapshot(self) -> Dict[str, Any]:
+        """各模型延迟统计（用于报告）"""
+        with self._lock:
+            models = {
+                model: {
+                    "requests": stats["requests"],
+                    "failures": stats["failures"],
+                    "ewma_ttft_seconds": round(stats["ewma_ttft"], 3) if stats["ewma_ttft"] is not None else None,
+                    "ewma_total_seconds": round(stats["ewma_total"], 3) if stats["ewma_total"] is not None else None,
+                    "hedge_wins": stats["hedge_wins"],
+                    "cancelled": stats["cancelled"]
+                }
+                for model, stats in self.models.items()
+            }
+            requests, hedges = self.requests, self.hedges
+        for model in models:
+            p95 = self.p95_ttft(model)
+            models[model]["p95_ttft_seconds"] = round(p95, 3) if p95 is not None else None
+        return {"requests": requests, "hedged_requests": hedges, "models": models}
+
+
+_tracker: Optional[LatencyTracker] = None
+_tracker_lock = threading.Lock()
+
+
+def get_tracker() -> LatencyTracker:
+    """进程内共享的延迟统计"""
+    global _tracker
+    with _tracker_lock:
+        if _tracker is None:
+            from config import Config
+
+            router_config = Config.get_router_config()
+            _tracker = LatencyTracker(router_config["ewma_alpha"], router_config["failure_cooldown"])
+        return _tracker
+
+
+class RoutedModelClient:
+    """
+    autogen自定义模型客户端（config_list中 "model_client_cls": "RoutedModelClient"）
+
+    按延迟统计排序的模型列表依次尝试，失败时回退到下一个模型。启用对冲时，
+    主请求在主模型p95 TTFT（样本不足时为默认延迟）内仍未返回首个token，
+    就向下一个模型发出备份请求，先完成者胜出，另一方的流式连接被关闭。
+    """
+
+    def __init__(self, config: Dict[str, Any], **kwargs):
+        from openai import OpenAI
+        from config import Config
+
+        self.models: List[str] = config.get("models") or [config["model"]]
+        self.hedge = config.get("hedge", False)
+        self.router_config = Config.get_router_config()
+        self.client = OpenAI(api_key=config.get("api_key"), base_url=config.get("base_url"),
+                             timeout=self.router_config["request_timeout"])
+        self.tracker = get_tracker()
+
+    def create(self, params: Dict[str, Any]):
+        request = {key: params[key] for key in _REQUEST_KEYS if params.get(key) is not None}
+        # 单次请求的超时不超过分析截止时间；截止时间已过时不再发出请求
+        request["timeout"] = deadline.timeout(self.router_config["request_timeout"])
+        expires = deadline.expires_at()
+        pending = self.tracker.order(self.models, self.router_config["degraded_factor"])
+        running: Dict[Any, tuple] = {}
+        hedged = False
+        last_error: Optional[Exception] = None
+        started = time.monotonic()
+
+        def launch() -> None:
+            model = pending.pop(0)
+            cancel, first_token = threading.Event(), threading.Event()
+            future = _executor.submit(self._attempt, model, request, cancel, first_token)
+            running[future] = (model, cancel, first_token)
+
+        launch()
+        while running:
+            timeout = None
+            primary_model, _, primary_first = next(iter(running.values()))
+            if (self.hedge and not hedged and pending and not primary_first.is_set()
+                    and self.tracker.may_hedge(self.router_config["hedge_max_ratio"])):
+                delay = self._hedge_delay(primary_model)
+                timeout = max(0.0, delay - (time.monotonic() - started))
+
+            if expires is not None:
+                left = max(0.0, expires - time.monotonic())
+                timeout = left if timeout is None else min(timeout, left)
+            done, _ = wait(list(running), timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                if expires is not None and time.monotonic() >= expires:
+                    for _, cancel, _ in running.values():
+                        cancel.set()
+                    self.tracker.record_request(hedged)
+                    raise deadline.DeadlineExceeded("Analysis deadline exceeded during LLM request")
+                if not primary_first.is_set():
+                    hedged = True
+                    logger.info(f"Hedging {primary_model} with {pending[0]} after {time.monotonic() - started:.2f}s")
+                    launch()
+                continue
+
+            for future in done:
+                model, _, _ = running.pop(future)
+                try:
+                    response = future.result()
+                except HedgeCancelled:
+                    continue
+                except Exception as e:
+                    last_error = e
+                    self.tracker.record_failure(model)
+                    logger.warning(f"LLM request to {model} failed: {str(e)}")
+                    if not running and pending:
+                        launch()
+                    continue
+
+                for _, cancel, _ in running.values():
+                    cancel.set()
+                self.tracker.record_request(hedged, winner=model if hedged else None)
+                return response
+
+        self.tracker.record_request(hedged)
+        raise last_error or RuntimeError("No LLM model available")
+
+    def _hedge_delay(self, model: str) -> float:
+        """主请求等待多久仍无首个token时发出备份请求"""
+        p95 = self.tracker.p95_ttft(model)
+        delay = p95 if p95 is not None else self.router_config["hedge_default_delay"]
+        return max(self.router_config["hedge_min_delay"], delay)
+
+    def _attempt(self, model: str, request: Dict[str, Any],
+                 cancel: threading.Event, first_token: threading.Event):
+        """流式请求一个模型并组装完整响应；被取消时关闭连接"""
+        from openai.types.chat import ChatCompletion
+
+        started = time.monotonic()
+        ttft = None
+        content, tool_calls = [], {}
+        finish_reason, usage, response_id, created = None, None, None, int(time.time())
+        stream = self.client.chat.completions.create(
+            model=model, stream=True, stream_options={"include_usage": True}, **request
+        )
+        try:
+            for chunk in stream:
+                if cancel.is_set():
+                    self.tracker.record_cancelled(model)
+                    raise HedgeCancelled(model)
+                response_id, created = chunk.id or response_id, chunk.created or created
+                if chunk.usage is not None:
+                    usage = chunk.usage.model_dump()
+                if not chunk.choices:
+                    continue
+                choice = chunk.choices[0]
+                delta = choice.delta
+                if ttft is None and (delta.content or delta.tool_calls):
+                    ttft = time.monotonic() - started
+                    first_token.set()
+                if delta.content:
+                    content.append(delta.content)
+                for call in delta.tool_calls or []:
+                    entry = tool_calls.setdefault(call.index, {"id": None, "type": "function",
+                                                               "function": {"name": "", "arguments": ""}})
+                    entry["id"] = call.id or entry["id"]
+                    if call.function is not None:
+                        entry["function"]["name"] += call.function.name or ""
+                        entry["function"]["arguments"] += call.function.arguments or ""
+                finish_reason = choice.finish_reason or finish_reason
+        finally:
+            stream.close()
+
+        total = time.monotonic() - started
+        self.tracker.record_success(model, ttft if ttft is not None else total, total)
+        message = {"role": "assistant", "content": "".join(content) or None}
+        if tool_calls:
+            message["tool_calls"] = [tool_calls[index] for index in sorted(tool_calls)]
+        return ChatCompletion.model_validate({
+            "id": response_id or f"routed-{created}",
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "message": message,
+                         "finish_reason": finish_reason or ("tool_calls" if tool_calls else "stop")}],
+            "usage": usage
+        })
+
+    def message_retrieval(self, response) -> List[Any]:
+        return [
+            choice.message if choice.message.tool_calls or choice.message.function_call else choice.message.content
+            for choice in response.choices
+        ]
+
+    def cost(self, response) -> float:
+        return 0.0
+
+    @staticmethod
+    def get_usage(response) -> Dict[str, Any]:
+        usage = response.usage
+        return {
+            "prompt_tokens": usage.prompt_tokens if usage else 0,
+            "completion_tokens": usage.completion_tokens if usage else 0,
+            "total_tokens": usage.total_tokens if usage else 0,
+            "cost": 0.0,
+            "model": response.model
+        }
+
+
+def register_model_clients(agent: Any) -> None:
+    """为使用RoutedModelClient的Agent注册模型客户端（autogen要求在创建Agent后注册）"""
+    llm_config = getattr(agent, "llm_config", None) or {}
+    if any(entry.get("model_client_cls") == RoutedModelClient.__name__ for entry in llm_config.get("config_list", [])):
+        agent.register_model_client(model_client_cls=RoutedModelClient)
+
+
+class RoleUsage:
+    """
+    一个Agent角色在一次分析中的LLM调用统计（调用次数、失败次数、耗时和token数）
+    """
+
+    def __init__(self, role: str, model: str):
+        self.role = role
+        self.model = model
+        self.reset()
+
+    def reset(self) -> None:
+        self.calls = 0
+        self.failures = 0
+        self.seconds: List[float] = []
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.models: Dict[str, int] = {}
+
+    def record(self, seconds: float, response: Any) -> None:
+        self.calls += 1
+        self.seconds.append(seconds)
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            self.prompt_tokens += getattr(usage, "prompt_tokens", 0) or 0
+            self.completion_tokens += getattr(usage, "completion_tokens", 0) or 0
+        model = getattr(response, "model", None) or self.model
+        self.models[model] = self.models.get(model, 0) + 1
+
+    def report(self) -> Dict[str, Any]:
+        """本次分析的统计（用于按角色调整模型、max_tokens与temperature）"""
+        seconds = sorted(self.seconds)
+        return {
+            "model": self.model,
+            "models_used": dict(self.models),
+            "calls": self.calls,
+            "failures": self.failures,
+            "total_seconds": round(sum(seconds), 3),
+            "average_seconds": round(sum(seconds) / len(seconds), 3) if seconds else None,
+            "max_seconds": round(seconds[-1], 3) if seconds else None,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "total_tokens": self.prompt_tokens + self.completion_tokens
+        }
+
+
+def instrument_llm_calls(agent: Any, role: str) -> Optional[RoleUsage]:
+    """
+    包装agent.client.create：统计Agent的LLM调用（统计对象保存在agent.llm_usage），
+    并在调用线程中绑定本次分析的截止时间agent.llm_deadline
+    （autogen在线程池中发起LLM调用，截止时间不会随上下文自动传递）
+    """
+    client = getattr(agent, "client", None)
+    if client is None:
+        return None
+    config_list = (getattr(agent, "llm_config", None) or {}).get("config_list") or [{}]
+    usage = RoleUsage(role, config_list[0].get("model", "unknown"))
+    create = client.create
+
+    def timed_create(**params):
+        started = time.monotonic()
+        try:
+            with deadline.bind(getattr(agent, "llm_deadline", None)):
+                deadline.timeout()
+                response = create(**params)
+        except Exception:
+            usage.failures += 1
+            raise
+        usage.record(time.monotonic() - started, response)
+        return response
+
+    client.create = timed_create
+    agent.llm_usage = usage
+    agent.llm_deadline = None
+    return usage
@@ -1,9 +1,16 @@
 """
 Financial report writer agent.
 """
-from typing import Dict, Any, Optional, List
+import asyncio
+import numbers
+from typing import Dict, Any, Optional, List, Callable, Awaitable
 from datetime import datetime
 from .base_agent import BaseAgent
+from config import Config
+from services.charts import ChartRenderer
+from services.market_service import MarketService
+from services.news_service import NewsService
+from topic_state import stable_hash
 import logging
 
 logger = logging.getLogger(__name__)
@@ -32,6 +39,7 @@ class ReportWriterAgent(BaseAgent):
             "create_visualizations": "Create data visualizations",
             "integrate_analyses": "Integrate analyses from multiple sources"
         }
+        self._charts: Optional[ChartRenderer] = None
     
     async def execute_task(self, task: Dict[str, Any]) -> Dict[str, Any]:
         """Execute tasks within the SWARM network"""
@@ -52,6 +60,43 @@ class ReportWriterAgent(BaseAgent):
         else:
             raise ValueError(f"Unknown action: {action}")
 
+    def tools(self) -> Dict[str, Any]:
+        """注册给LLM的工具"""
+        tools = super().tools()
+        tools["write_report"] = (
+            self.write_report,
+            "Generate the final structured report from the market and news results collected in this analysis. "
+            "Returns a result handle and a short digest."
+        )
+        return tools
+    
+    async def write_report(self) -> str:
+        """工具：基于上下文中已有的分析结果生成报告（输入结果不变时不重复生成）"""
+        context = self.analysis_context
+        inputs = sorted(handle for handle in context.results if not handle.startswith("write_report#")) if context else []
+        return await self._run_tool(
+            "write_report", {"inputs": inputs},
+            lambda: self.generate_report_from_context(context),
+            self._digest
+        )
+    
+    async def generate_report_from_context(self, context: 'AnalysisContext') -> Dict[str, Any]:
+        """基于上下文存储中数据Agent的最新结果生成报告（上下文可以来自其他进程）"""
+        agents = context.get_context()["agents"]
+        return await self.generate_report({
+            "yahoo_data": agents.get("Yahoo_Analyst", {}).get("data", {}),
+            "google_data": agents.get("Google_Analyst", {}).get("data", {})
+        }, context)
+    
+    def _digest(self, result: Dict[str, Any]) -> str:
+        """报告结果的简短摘要"""
+        content = result["content"]
+        summary = " ".join(content["summary"].split())
+        return (
+            f"completeness {result['completeness']}; {len(content['recommendations'])} recommendations; "
+            f"sections: {', '.join(content)}; summary: {summary[:200]}"
+        )
+
     async def generate_report(self, analysis_results: Dict[str, Any], context: Optional['AnalysisContext'] = None) -> Dict[str, Any]:
         """生成最终报告"""
         logger.info("Generating final financial report")
@@ -65,32 +110,44 @@ class ReportWriterAgent(BaseAgent):
             })
 
             # 分析市场数据
-            market_analysis = await self.analyze_market_data(
-                analysis_results.get("yahoo_data", {}).get("data", {}),
-                context
+            market_data = analysis_results.get("yahoo_data", {}).get("data", {})
+            market_analysis = await self._build_section(
+                context, "market_analysis", market_data,
+                lambda: self.analyze_market_data(market_data, context)
             )
             
             # 整合多源分析
-            integrated_analysis = await self.integrate_analyses({
+            analyses = {
                 "market": market_analysis,
                 "yahoo_data": analysis_results.get("yahoo_data", {}),
                 "google_data": analysis_results.get("google_data", {})
-            }, context)
+            }
+            integrated_analysis = await self._build_section(
+                context, "integrated_analysis", analyses,
+                lambda: self.integrate_analyses(analyses, context)
+            )
             
             # 生成投资建议
-            recommendations = await self.generate_recommendations(
-                integrated_analysis.get("trends", []),
-                integrated_analysis.get("sentiment", {}),
-                context
+            trends = integrated_analysis.get("trends", [])
+            sentiment = integrated_analysis.get("sentiment", {})
+            recommendations = await self._build_section(
+                context, "recommendations", {"trends": trends, "sentiment": sentiment},
+                lambda: self.generate_recommendations(trends, sentiment, context)
             )
             
-            # 创建可视化
-            visualizations = await self.create_visualizations(integrated_analysis, context)
+            # 创建可视化（价格与均线、新闻情感分布）
+            chart_data = self._chart_data(analysis_results)
+            visualizations = await self._build_section(
+                context, "visualizations", chart_data,
+                lambda: self.create_visualizations(chart_data, context)
+            )
             
             # 准备最终报告
             result = {
                 "report_type": "Financial Analysis",
                 "timestamp": datetime.utcnow().isoformat(),
+                "completeness": integrated_analysis["completeness"],
+                "missing": integrated_analysis.get("missing", []),
                 "content": {
                     "summary": integrated_analysis["summary"].strip(),
                     "detailed_analysis": integrated_analysis["detailed"],
@@ -98,6 +155,9 @@ class ReportWriterAgent(BaseAgent):
                     "visualizations": visualizations
                 }
             }
+            
+            if context and context.topic_state is not None:
+                result["content"]["whats_new"] = self._describe_changes(context)
 
             if context:
                 self._log_context(context, "report_completion", {
@@ -159,7 +219,7 @@ class ReportWriterAgent(BaseAgent):
             
             # 基于情绪分析的建议
             sentiment_score = sentiment.get("average_score", 0)
-            if abs(sentiment_score) > 0.3:
+            if abs(sentiment_score) > NewsService.SIGNAL_THRESHOLD:
                 recommendations.append(
                     f"Market Sentiment: {sentiment.get('overall_sentiment')} with {sentiment.get('confidence'):.2f} confidence"
                 )
@@ -176,8 +236,35 @@ class ReportWriterAgent(BaseAgent):
                 "description": "Creating data visualizations"
             })
             
-            # 这里可以实现实际的可视化逻辑
+            # 在进程池中渲染SVG图表，相同输入的图表直接复用已生成的文件
+            if self._charts is None:
+                system_config = Config.get_system_config()
+                self._charts = ChartRenderer(system_config["chart_dir"], system_config["chart_workers"])
+            
+            pending = []
+            if len(data.get("close") or []) > 1:
+                pending.append(self._charts.render(
+                    "price_sma",
+                    {"dates": data["dates"], "close": data["close"]},
+                    {
+                        "title": f"{data.get('ticker') or 'Price'} close with SMA{MarketService.SMA_FAST}/SMA{MarketService.SMA_SLOW}",
+                        "sma": [MarketService.SMA_FAST, MarketService.SMA_SLOW]
+                    }
+                ))
+            if data.get("scores"):
+                pending.append(self._charts.render(
+                    "sentiment_histogram",
+                    {"scores": data["scores"]},
+                    {"title": "News sentiment distribution", "bins": 10}
+                ))
+            
             visualizations = []
+            for chart in await asyncio.gather(*pending, return_exceptions=True):
+                # 图表渲染失败不影响报告生成
+                if isinstance(chart, Exception):
+                    logger.warning(f"Chart rendering failed: {str(chart)}")
+                else:
+                    visualizations.append(chart)
             
             return visualizations
             
@@ -205,12 +292,18 @@ class ReportWriterAgent(BaseAgent):
             # 分析市场趋势
             trends = yahoo_data.get("data", {}).get("trends", [])
             
-            # 分析市场情绪
-            sentiment = google_data.get("data", {}).get("sentiment", {})
+            # 分析市场情绪（GoogleNewsAgent的结果键为sentiment_analysis）
+            sentiment = google_data.get("data", {}).get("sentiment_analysis", {}).get("overall_sentiment", {})
+            
+            # 缺失的输入（数据Agent未完成或未返回对应数据时报告为Partial）
+            missing = [
+                name for name, value in (("market_data", market_data), ("trends", trends), ("news_sentiment", sentiment))
+                if not value
+            ]
             
             # 生成摘要
             summary = self._generate_summary(
-                yahoo_data.get("query", "Unknown"),
+                yahoo_data.get("query") or google_data.get("query", "Unknown"),
                 market_data,
                 sentiment,
                 google_data
@@ -230,27 +323,90 @@ class ReportWriterAgent(BaseAgent):
                 },
                 "trends": trends,
                 "sentiment": sentiment,
-                "completeness": "Full" if all([market_data, trends, sentiment]) else "Partial",
+                "completeness": "Partial" if missing else "Full",
+                "missing": missing,
                 "timestamp": datetime.utcnow().isoformat()
             }
             
         except Exception as e:
             self._handle_error(e, "integrating analyses")
     
+    def _chart_data(self, analysis_results: Dict[str, Any]) -> Dict[str, Any]:
+        """图表的输入序列：价格历史与逐篇新闻的情感评分"""
+        yahoo = analysis_results.get("yahoo_data", {}).get("data", {})
+        google = analysis_results.get("google_data", {}).get("data", {})
+        history = yahoo.get("price_history") or {}
+        articles = google.get("news_articles", [])
+        if hasattr(articles, "scored"):
+            scores = articles.scored()
+        else:
+            scores = [a["sentiment_score"] for a in articles if a.get("sentiment_score") is not None]
+        return {
+            "ticker": yahoo.get("ticker"),
+            "dates": history.get("dates", []),
+            "close": history.get("close", []),
+            "scores": scores
+        }
+    
+    async def _build_section(self, context: Optional['AnalysisContext'], section: str, inputs: Any,
+                             builder: Callable[[], Awaitable[Any]]) -> Any:
+        """仅在输入变化时重新生成报告章节，否则复用上一次运行的结果"""
+        topic_state = context.topic_state if context else None
+        if topic_state is None:
+            return await builder()
+        
+        input_hash = stable_hash(inputs)
+        previous = topic_state["sections"].get(section)
+        if previous and previous["input_hash"] == input_hash:
+            context.changes.setdefault("reused_sections", []).append(section)
+            return previous["output"]
+        
+        output = await builder()
+        topic_state["sections"][section] = {"input_hash": input_hash, "output": output}
+        context.changes.setdefault("regenerated_sections", []).append(section)
+        return output
+    
+    def _describe_changes(self, context: 'AnalysisContext') -> Dict[str, Any]:
+        """总结相对上一次运行的新增内容"""
+        changes = context.changes
+        new_articles = changes.get("new_articles", [])
+        new_yahoo_news = changes.get("new_yahoo_news", [])
+        new_bars = changes.get("new_bars", {})
+        
+        return {
+            "previous_run": context.topic_state.get("last_run"),
+            "new_articles": len(new_articles),
+            "new_article_titles": new_articles[:10],
+            "new_yahoo_news": len(new_yahoo_news),
+            "new_bars": new_bars,
+            "regenerated_sections": changes.get("regenerated_sections", []),
+            "reused_sections": changes.get("reused_sections", []),
+            "summary": (
+                "First analysis of this topic" if not context.topic_state.get("last_run") else
+                f"{len(new_articles)} new article(s), {len(new_yahoo_news)} new Yahoo news item(s), "
+                f"{sum(new_bars.values())} new price bar(s) since {context.topic_state['last_run']}"
+            )
+        }
+    
     def _generate_summary(self, query: str, market_data: Dict[str, Any], 
                          sentiment: Dict[str, Any], google_data: Dict[str, Any]) -> str:
-        """生成报告摘要"""
+        """生成报告摘要（缺失的数值显示为N/A，数据Agent未完成时同样可以生成）"""
+        def number(value: Any, spec: str, prefix: str = "") -> str:
+            if isinstance(value, numbers.Real) and not isinstance(value, bool):
+                return f"{prefix}{value:{spec}}"
+            return "N/A"
+        
         return f"""
 Market Analysis Report for {query}
 
 Current Market Status:
-- Price: ${market_data.get('current_price', 'N/A'):,.2f}
-- Volume: {market_data.get('volume', 'N/A'):,.0f}
+- Price: {number(market_data.get('current_price'), ',.2f', '$')}
+- Volume: {number(market_data.get('volume'), ',.0f')}
 - P/E Ratio: {market_data.get('pe_ratio', 'N/A')}
-- Market Cap: ${market_data.get('market_cap', 'N/A'):,.2f}
+- Market Cap: {number(market_data.get('market_cap'), ',.2f', '$')}
 
-Market Sentiment: {sentiment.get('overall_sentiment')}
-Confidence Score: {sentiment.get('confidence', 0):.2f}
+Market Sentiment: {sentiment.get('overall_sentiment', 'N/A')}
+Confidence Score: {number(sentiment.get('confidence'), '.2f')}
 
 Key Events: {len(google_data.get('data', {}).get('events', []))} significant developments identified
 """
\ No newline at end of file
@@ -0,0 +1,149 @@
+"""
+Rule-based speaker transitions for the analysis GroupChat.
+"""
+import json
+import logging
+import os
+from typing import Dict, Any, List, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+# 工作流定义：每个Agent允许的下一位发言者（allowed），以及不使用LLM选择时的默认发言者（default）。
+# allowed为空表示对话在该Agent发言后结束。
+WORKFLOWS: Dict[str, Dict[str, Any]] = {
+    "default": {
+        "start": "Yahoo_Analyst",
+        "transitions": {
+            "Yahoo_Analyst": {"allowed": ["Google_Analyst"]},
+            "Google_Analyst": {"allowed": ["Report_Writer"]},
+            "Report_Writer": {"allowed": []}
+        }
+    },
+    # 报告撰写后可以要求任一分析师补充数据（依赖终止条件或max_round结束对话）
+    "review": {
+        "start": "Yahoo_Analyst",
+        "transitions": {
+            "Yahoo_Analyst": {"allowed": ["Google_Analyst"]},
+            "Google_Analyst": {"allowed": ["Report_Writer"]},
+            "Report_Writer": {"allowed": ["Yahoo_Analyst", "Google_Analyst"], "default": "Google_Analyst"}
+        }
+    }
+}
+
+
+def load_workflow(workflow: Union[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """按名称、JSON文件路径或字典加载工作流定义"""
+    if isinstance(workflow, dict):
+        return workflow
+    if workflow in WORKFLOWS:
+        return WORKFLOWS[workflow]
+    if os.path.exists(workflow):
+        with open(workflow, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    raise ValueError(f"Unknown workflow: {workflow}")
+
+
+class SpeakerGraph:
+    """
+    GroupChat的发言者选择器（speaker_selection_method）
+
+    按工作流的转移图选择下一位发言者：只有一个允许的发言者时直接选择，没有时结束对话，
+    只有存在多个选择时才交给Manager的LLM（并限定在允许的发言者之内）。
+    """
+
+    def __init__(self, workflow: Union[str, Dict[str, Any]] = "default", llm_selection: bool = True):
+        """
+        初始化发言者转移图
+
+        Args:
+            workflow: 工作流名称、JSON文件路径或工作流字典
+            llm_selection: 存在多个允许的发言者时是否由LLM选择（否则使用default）
+        """
+        definition = load_workflow(workflow)
+        self.name = workflow if isinstance(workflow, str) else definition.get("name", "custom")
+        self.start: Optional[str] = definition.get("start")
+        self.transitions: Dict[str, Dict[str, Any]] = definition["transitions"]
+        self.llm_selection = llm_selection
+        for speaker, node in self.transitions.items():
+            default = node.get("default")
+            if default is not None and default not in node["allowed"]:
+                raise ValueError(f"Default next speaker {default} of {speaker} is not an allowed transition")
+        self.reset()
+
+    def reset(self) -> None:
+        """重置每次分析的统计"""
+        self.rule_selections = 0
+        self.llm_selections = 0
+        self.terminations = 0
+        self.path: List[str] = []
+
+    def allowed_transitions(self, agents: List[Any]) -> Dict[Any, List[Any]]:
+        """构造GroupChat的allowed_or_disallowed_speaker_transitions（限定LLM的候选范围）"""
+        by_name = {agent.name: agent for agent in agents}
+        unknown = {
+            name for speaker, node in self.transitions.items() for name in [speaker, *node["allowed"]]
+        } - set(by_name)
+        if unknown:
+            raise ValueError(f"Workflow {self.name} references unknown agents: {', '.join(sorted(unknown))}")
+        return {
+            by_name[speaker]: [by_name[name] for name in node["allowed"]]
+            for speaker, node in self.transitions.items()
+        }
+
+    def __call__(self, last_speaker: Any, groupchat: Any) -> Union[Any, str, None]:
+        """选择下一位发言者：返回Agent、"auto"（交给LLM）或None（结束对话）"""
+        tool_turn = self._tool_turn(last_speaker, groupchat)
+        if tool_turn is not None:
+            self.rule_selections += 1
+            return tool_turn
+        
+        node = self.transitions.get(last_speaker.name)
+        if node is None:
+            # 上一位发言者不在图中（例如发起对话的Manager），从起点开始
+            allowed = [self.start] if self.start else [agent.name for agent in groupchat.agents]
+            node = {"allowed": allowed}
+
+        allowed = node["allowed"]
+        if not allowed:
+            self.terminations += 1
+            logger.info(f"Workflow {self.name} finished after {last_speaker.name}")
+            return None
+        if len(allowed) > 1 and self.llm_selection:
+            self.llm_selections += 1
+            self.path.append("auto")
+            return "auto"
+
+        choice = allowed[0] if len(allowed) == 1 else node.get("default", allowed[0])
+        self.rule_selections += 1
+        self.path.append(choice)
+        return groupchat.agent_by_name(choice)
+
+    def _tool_turn(self, last_speaker: Any, groupchat: Any) -> Optional[Any]:
+        """
+        工具调用不是工作流中的一步：工具调用交给能执行它的Agent，
+        工具结果交回调用方解读，之后才按转移图继续
+        """
+        message = groupchat.messages[-1] if groupchat.messages else {}
+        calls = message.get("tool_calls") or ([{"function": message["function_call"]}] if message.get("function_call") else [])
+        if calls:
+            names = [call["function"]["name"] for call in calls]
+            for agent in [last_speaker, *groupchat.agents]:
+                can_execute = getattr(agent, "can_execute_function", None)
+                if can_execute is not None and can_execute(names):
+                    return agent
+            logger.warning(f"No agent can execute {', '.join(names)}")
+            return None
+        if message.get("tool_responses") or message.get("role") in ("tool", "function"):
+            return last_speaker
+        return None
+    
+    def report(self) -> Dict[str, Any]:
+        """本次分析的发言者选择统计（规则选择和结束对话都节省了一次Manager LLM调用）"""
+        return {
+            "workflow": self.name,
+            "path": list(self.path),
+            "rule_selections": self.rule_selections,
+            "llm_selections": self.llm_selections,
+            "terminations": self.terminations,
+            "manager_calls_saved": self.rule_selections + self.terminations
+        }
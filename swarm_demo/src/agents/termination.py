@@ -0,0 +1,191 @@
+"""
+Completion, stall and budget detection for analysis conversations.
+"""
+import json
+import logging
+import re
+import time
+from collections import deque
+from typing import Dict, Any, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 结构化报告（ReportWriterAgent.generate_report的结果）必须包含的章节
+REQUIRED_SECTIONS = ("summary", "detailed_analysis", "recommendations")
+
+# 文本报告必须包含的章节标题（每组任一同义词出现即可），对应初始消息中要求的报告内容
+REQUIRED_HEADINGS = (
+    ("市场数据分析", "market analysis", "market data"),
+    ("新闻情感分析", "sentiment"),
+    ("关键见解和建议", "建议", "recommendation")
+)
+
+STOP_COMPLETE = "complete"
+STOP_STALLED = "stalled"
+STOP_MESSAGE_BUDGET = "message_budget"
+STOP_TOKEN_BUDGET = "token_budget"
+STOP_TIME_BUDGET = "time_budget"
+STOP_WORKFLOW_END = "workflow_end"
+STOP_MAX_ROUND = "max_round"
+STOP_DEADLINE = "deadline"
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def _text(message: Any) -> str:
+    """消息文本（兼容字符串、字典与多模态内容列表）"""
+    content = message.get("content") if isinstance(message, dict) else message
+    if content is None:
+        return ""
+    if isinstance(content, list):
+        return " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return str(content)
+
+
+def _shingles(text: str) -> frozenset:
+    words = _WORD.findall(text.lower())
+    if len(words) < 3:
+        return frozenset(words)
+    return frozenset(zip(words, words[1:], words[2:]))
+
+
+def _similarity(a: frozenset, b: frozenset) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class TerminationMonitor:
+    """
+    GroupChatManager的is_termination_msg：检测到以下情况时立即结束对话并记录原因
+
+    - 完成：报告Agent已生成结构完整的报告（必需章节齐全且completeness为Full）
+    - 停滞：连续多条消息几乎相同
+    - 预算耗尽：消息数、估算token数或耗时超出预算
+    """
+
+    def __init__(
+        self,
+        report_agent: str = "Report_Writer",
+        required_sections: Sequence[str] = REQUIRED_SECTIONS,
+        required_headings: Sequence[Tuple[str, ...]] = REQUIRED_HEADINGS,
+        stall_repeats: int = 3,
+        stall_similarity: float = 0.9,
+        max_messages: Optional[int] = None,
+        max_tokens: Optional[int] = None,
+        max_seconds: Optional[float] = None
+    ):
+        """
+        初始化终止条件
+
+        Args:
+            report_agent: 生成最终报告的Agent名称
+            required_sections: 结构化报告content中必须存在且非空的章节
+            required_headings: 文本报告中必须出现的章节标题（None或空表示不接受纯文本报告）
+            stall_repeats: 连续多少条近似相同的消息视为停滞
+            stall_similarity: 判定近似相同的相似度阈值（词三元组Jaccard）
+            max_messages: 消息数预算
+            max_tokens: 对话估算token预算（约4字符/token）
+            max_seconds: 对话耗时预算（秒）
+        """
+        self.report_agent = report_agent
+        self.required_sections = tuple(required_sections)
+        self.required_headings = tuple(required_headings or ())
+        self.stall_repeats = stall_repeats
+        self.stall_similarity = stall_similarity
+        self.max_messages = max_messages
+        self.max_tokens = max_tokens
+        self.max_seconds = max_seconds
+        self.reset()
+
+    def reset(self, context: Optional['AnalysisContext'] = None) -> None:
+        """开始新的分析（context用于读取报告Agent写入的结构化结果）"""
+        self.context = context
+        self.messages = 0
+        self.estimated_tokens = 0
+        self.started = time.monotonic()
+        self.recent: deque = deque(maxlen=max(2, self.stall_repeats))
+        self.stop_reason: Optional[Dict[str, Any]] = None
+
+    def __call__(self, message: Any) -> bool:
+        if self.stop_reason is not None:
+            return True
+        text = _text(message)
+        self.messages += 1
+        self.estimated_tokens += len(text) // 4
+
+        reason, detail = self._check(message, text)
+        if reason is None:
+            return False
+        self.stop_reason = {
+            "reason": reason,
+            "detail": detail,
+            "speaker": message.get("name") if isinstance(message, dict) else None,
+            **self._usage()
+        }
+        logger.info(f"Stopping conversation ({reason}): {detail}")
+        return True
+
+    def _check(self, message: Any, text: str) -> Tuple[Optional[str], Optional[str]]:
+        complete = self._complete_report(message, text)
+        if complete:
+            return STOP_COMPLETE, complete
+
+        # 纯工具调用消息没有文本内容，不参与停滞判断
+        if text.strip():
+            self.recent.append(_shingles(text))
+        if len(self.recent) >= self.stall_repeats and all(
+            _similarity(a, b) >= self.stall_similarity
+            for a, b in zip(list(self.recent), list(self.recent)[1:])
+        ):
+            return STOP_STALLED, f"{self.stall_repeats} consecutive near-identical messages"
+
+        if self.max_messages is not None and self.messages >= self.max_messages:
+            return STOP_MESSAGE_BUDGET, f"{self.messages} messages (budget {self.max_messages})"
+        if self.max_tokens is not None and self.estimated_tokens >= self.max_tokens:
+            return STOP_TOKEN_BUDGET, f"~{self.estimated_tokens} tokens (budget {self.max_tokens})"
+        elapsed = time.monotonic() - self.started
+        if self.max_seconds is not None and elapsed >= self.max_seconds:
+            return STOP_TIME_BUDGET, f"{elapsed:.0f}s (budget {self.max_seconds:.0f}s)"
+        return None, None
+
+    def _complete_report(self, message: Any, text: str) -> Optional[str]:
+        """报告是否已完整：优先检查上下文和消息中的结构化报告，其次检查文本报告的章节标题"""
+        if self.context is not None:
+            report = self.context.get_context()["agents"].get(self.report_agent, {}).get("data")
+            if self._is_full_report(report):
+                return "structured report in analysis context"
+
+        if isinstance(message, dict) and message.get("name") != self.report_agent:
+            return None
+        try:
+            payload = json.loads(text)
+        except ValueError:
+            payload = None
+        if isinstance(payload, dict):
+            return "structured report in message" if self._is_full_report(payload) else None
+
+        if self.required_headings:
+            lowered = text.lower()
+            if all(any(heading.lower() in lowered for heading in group) for group in self.required_headings):
+                return "report message contains all required sections"
+        return None
+
+    def _is_full_report(self, report: Any) -> bool:
+        if not isinstance(report, dict) or report.get("completeness") != "Full":
+            return False
+        content = report.get("content") or {}
+        return all(content.get(section) for section in self.required_sections)
+
+    def _usage(self) -> Dict[str, Any]:
+        return {
+            "messages": self.messages,
+            "estimated_tokens": self.estimated_tokens,
+            "elapsed_seconds": round(time.monotonic() - self.started, 2)
+        }
+
+    def report(self, fallback_reason: str = STOP_MAX_ROUND) -> Dict[str, Any]:
+        """本次对话的终止原因（未由本监视器终止时使用fallback_reason）"""
+        if self.stop_reason is not None:
+            return dict(self.stop_reason)
+        return {"reason": fallback_reason, "detail": None, "speaker": None, **self._usage()}
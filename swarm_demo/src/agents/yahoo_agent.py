@@ -1,11 +1,13 @@
 """
 Yahoo Finance analysis agent.
 """
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Annotated
 from datetime import datetime
-import yfinance as yf
 from .base_agent import BaseAgent
+from config import Config
 from services.market_service import MarketService
+from services.article_batch import ArticleBatch
+from utils import resolve_ticker
 import logging
 
 logger = logging.getLogger(__name__)
@@ -48,6 +50,39 @@ class YahooFinanceAgent(BaseAgent):
         else:
             raise ValueError(f"Unknown action: {action}")
 
+    def tools(self) -> Dict[str, Any]:
+        """注册给LLM的工具"""
+        tools = super().tools()
+        tools["yahoo_market_analysis"] = (
+            self.yahoo_market_analysis,
+            "Fetch market data, technical indicators, trends and recent Yahoo Finance news for a company "
+            "or ticker. Returns a result handle and a short digest."
+        )
+        return tools
+    
+    async def yahoo_market_analysis(
+        self,
+        query: Annotated[str, "Company name, ticker or topic, e.g. 'Tesla' or 'TSLA'"]
+    ) -> str:
+        """工具：获取并分析市场数据（同一股票在一次分析中只获取一次）"""
+        return await self._run_tool(
+            "yahoo_market_analysis",
+            {"ticker": resolve_ticker(query)},
+            lambda: self.process_news(query, self.analysis_context),
+            self._digest
+        )
+    
+    def _digest(self, result: Dict[str, Any]) -> str:
+        """市场数据结果的简短摘要"""
+        data = result["data"]
+        price = data["market_data"].get("current_price")
+        trends = ", ".join(
+            f"{trend['indicator']} {trend['value']}" + (f" ({trend['change']})" if trend.get("change") else "")
+            for trend in data.get("trends", [])
+        )
+        price_text = f"{float(price):.2f}" if price is not None else "n/a"
+        return f"{data['ticker']} price {price_text}; {trends or 'no trends'}; {len(data['news'])} news items"
+
     async def process_news(self, query: str, context: Optional['AnalysisContext'] = None) -> Dict[str, Any]:
         """处理Yahoo Finance新闻数据"""
         logger.info(f"Processing Yahoo Finance news for query: {query}")
@@ -58,22 +93,30 @@ class YahooFinanceAgent(BaseAgent):
             })
             
             # 获取股票代码
-            company_to_ticker = {
-                "Tesla": "TSLA",
-                "Apple": "AAPL",
-                "Microsoft": "MSFT",
-                "Google": "GOOGL",
-                "Amazon": "AMZN"
-            }
-            company = query.split()[0]
-            ticker = company_to_ticker.get(company, company)
+            ticker = resolve_ticker(query)
             
-            # 使用MarketService获取市场数据
-            market_data = await self.get_market_data(ticker, context)
+            # 最近已抓取过该股票的新闻时直接使用本地归档，否则与市场数据一起并发获取
+            news_config = Config.get_news_config()
+            news_limit = news_config["yahoo_max_articles"]
+            archive = self._open_archive()
+            from_archive = archive is not None and archive.is_fresh(
+                "yahoo", ticker, news_config["archive_max_age_minutes"]
+            )
+            market_data = await self.get_market_data(ticker, context, news_limit=0 if from_archive else news_limit)
+            if from_archive:
+                news = archive.search(ticker=ticker, origin="yahoo", limit=news_limit)
+                logger.info(f"Using {len(news)} archived Yahoo news items for {ticker}")
+            else:
+                news = market_data.pop("news", ArticleBatch())
+                self._archive_articles(archive, news, origin="yahoo", ticker=ticker)
             
-            # 获取新闻数据
-            stock = yf.Ticker(ticker)
-            news = MarketService.process_stock_news(stock)
+            if context and context.topic_state is not None:
+                seen_news = context.topic_state["yahoo_news"]
+                context.record_change("new_yahoo_news", [
+                    article["title"] for article in news if article["link"] not in seen_news
+                ])
+                for article in news:
+                    seen_news[article["link"]] = article.to_dict()
             
             # 分析趋势
             trends_analysis = await self.analyze_trends(market_data, context)
@@ -84,6 +127,7 @@ class YahooFinanceAgent(BaseAgent):
                 "query": query,
                 "timestamp": datetime.utcnow().isoformat(),
                 "data": {
+                    "ticker": ticker,
                     "news": news,
                     **market_data,
                     "trends_analysis": trends_analysis
@@ -108,15 +152,27 @@ class YahooFinanceAgent(BaseAgent):
         except Exception as e:
             self._handle_error(e, "processing Yahoo Finance news")
     
-    async def get_market_data(self, ticker: str, context: Optional['AnalysisContext'] = None) -> Dict[str, Any]:
-        """获取市场数据"""
+    async def get_market_data(self, ticker: str, context: Optional['AnalysisContext'] = None,
+                              news_limit: int = 0) -> Dict[str, Any]:
+        """获取市场数据（news_limit大于0时同时获取新闻）"""
         try:
             self._log_context(context, "get_market_data", {
                 "ticker": ticker,
                 "description": "Retrieving market data"
             })
             
-            market_data = MarketService.get_stock_data(ticker)
+            # 增量分析：只下载上一次运行之后的新K线
+            topic_state = context.topic_state if context else None
+            cached_bars = topic_state["bars"].get(ticker) if topic_state else None
+            
+            market_data = await MarketService.fetch_ticker_data(
+                ticker, cached_bars=cached_bars, news_limit=news_limit
+            )
+            
+            if topic_state is not None:
+                topic_state["bars"][ticker] = market_data["price_history"]
+                context.record_change("new_bars", {ticker: market_data["new_bars"]})
+            
             return market_data
             
         except Exception as e:
@@ -149,7 +205,7 @@ class YahooFinanceAgent(BaseAgent):
             return "No trend data available"
             
         latest_trend = trends[0]
-        return f"Price {latest_trend['direction']} by {latest_trend['change']}%"
+        return f"Price {latest_trend.get('value', 'N/A')} by {latest_trend.get('change', 'N/A')}"
     
     def _analyze_indicators(self, indicators: Dict[str, Any]) -> Dict[str, str]:
         """分析技术指标"""
@@ -159,4 +215,4 @@ class YahooFinanceAgent(BaseAgent):
                 signals[indicator] = "Overbought" if value > 70 else "Oversold" if value < 30 else "Neutral"
             elif indicator == "MACD":
                 signals[indicator] = "Bullish" if value > 0 else "Bearish"
-        return signals
\ No newline at end of file
+        return signals
@@ -0,0 +1,101 @@
+"""
+Command-line backtest of the report recommendation rules.
+
+Replays the "Price Trend", "SMA Crossover" and news sentiment rules over years
+of daily bars for many tickers at once, using the sentiment stored by earlier
+runs (report store and news archive) where it exists:
+
+    python backtest.py TSLA AAPL MSFT --period 5y --horizons 1 5 21
+    python backtest.py --tickers-file sp500.txt --prices prices.csv --json
+"""
+import argparse
+import json
+import sys
+from typing import List, Optional
+
+from config import Config, setup_logging
+from utils import COMPANY_TO_TICKER
+
+
+def read_tickers(path: str) -> List[str]:
+    """读取股票代码文件（每行一个或以空白/逗号分隔，#开头为注释）"""
+    tickers = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.split("#", 1)[0]
+            tickers.extend(token.strip().upper() for token in line.replace(",", " ").split() if token.strip())
+    return tickers
+
+
+def load_price_file(path: str):
+    """读取保存的收盘价表（CSV或Parquet，行为日期、列为股票代码）"""
+    import pandas as pd
+
+    if path.endswith(".parquet"):
+        return pd.read_parquet(path)
+    return pd.read_csv(path, index_col=0, parse_dates=True)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Backtest the report recommendation rules")
+    parser.add_argument("tickers", nargs="*", help="Tickers to test (default: the known company tickers)")
+    parser.add_argument("--tickers-file", help="File with tickers to test")
+    parser.add_argument("--period", default="5y", help="History to download from Yahoo Finance")
+    parser.add_argument("--prices", help="Use a saved close-price table (CSV/Parquet) instead of downloading")
+    parser.add_argument("--save-prices", help="Save the downloaded close-price table as CSV")
+    parser.add_argument("--horizons", type=int, nargs="+", default=[1, 5, 21], help="Holding periods in bars")
+    parser.add_argument("--cost-bps", type=float, default=0.0, help="Portfolio cost per unit of turnover")
+    parser.add_argument("--sentiment-max-age", type=int, default=5,
+                        help="Days a stored sentiment value stays usable")
+    parser.add_argument("--no-sentiment", action="store_true", help="Ignore stored sentiment")
+    parser.add_argument("--json", action="store_true", help="Print the full result as JSON")
+    args = parser.parse_args(argv)
+    setup_logging()
+
+    from services.backtest import run_backtest, load_prices, load_sentiment, format_results
+
+    tickers = [ticker.upper() for ticker in args.tickers]
+    if args.tickers_file:
+        tickers.extend(read_tickers(args.tickers_file))
+    if not tickers and not args.prices:
+        tickers = list(COMPANY_TO_TICKER.values())
+
+    if args.prices:
+        close = load_price_file(args.prices)
+        if tickers:
+            close = close[[ticker for ticker in dict.fromkeys(tickers) if ticker in close.columns]]
+    else:
+        close = load_prices(tickers, period=args.period)
+        if args.save_prices:
+            close.to_csv(args.save_prices)
+    if close.empty:
+        print("No price history to backtest", file=sys.stderr)
+        return 1
+
+    sentiment = None
+    if not args.no_sentiment:
+        from services.news_archive import NewsArchive
+        from services.report_store import ReportStore
+
+        system_config = Config.get_system_config()
+        sentiment = load_sentiment(
+            close.columns,
+            report_store=ReportStore(system_config["report_store_db"]),
+            archive=NewsArchive(system_config["news_archive_db"])
+        )
+
+    results = run_backtest(
+        close, sentiment,
+        horizons=args.horizons,
+        cost_bps=args.cost_bps,
+        sentiment_max_age_days=args.sentiment_max_age
+    )
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print("\n".join(format_results(results)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
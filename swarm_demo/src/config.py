@@ -2,23 +2,33 @@
 Configuration management for the financial news analysis system.
 """
 import os
-from typing import Dict, Any
-from dotenv import load_dotenv
+from typing import Dict, Any, List, Optional
 import logging
 
-# 加载环境变量
-load_dotenv()
-
-# 设置日志
-logging.basicConfig(level=os.getenv('LOG_LEVEL', 'INFO'))
 logger = logging.getLogger(__name__)
 
+_environment_loaded = False
+
+def load_environment() -> None:
+    """加载环境变量（仅在首次调用时执行，避免导入时的开销）"""
+    global _environment_loaded
+    if _environment_loaded:
+        return
+    from dotenv import load_dotenv
+    load_dotenv()
+    _environment_loaded = True
+
+def setup_logging() -> None:
+    """设置日志（由程序入口调用，而不是在导入时执行）"""
+    logging.basicConfig(level=Config.get_system_config()["log_level"])
+
 class Config:
     """配置管理类"""
     
     @staticmethod
     def get_api_keys() -> Dict[str, str]:
         """获取API密钥配置"""
+        load_environment()
         keys = {
             "openrouter": os.getenv("OPENROUTER_API_KEY"),
             "serpapi": os.getenv("SERPAPI_API_KEY"),
@@ -33,31 +43,179 @@ class Config:
         return keys
     
     @staticmethod
-    def get_llm_config() -> Dict[str, Any]:
-        """获取LLM配置"""
+    def get_llm_config(role: Optional[str] = None, overrides: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        获取LLM配置
+        
+        Args:
+            role: Agent角色（如yahoo_analyst、manager）。该角色的模型、max_tokens、temperature
+                  和备选模型列表依次读取<ROLE>_LLM_MODEL、<ROLE>_MAX_TOKENS、<ROLE>_TEMPERATURE、
+                  <ROLE>_LLM_FALLBACK_MODELS，未设置时使用全局的LLM_MODEL、MAX_TOKENS等
+            overrides: 本次运行的覆盖值（model、max_tokens、temperature、fallback_models）
+        """
+        load_environment()
+        overrides = overrides or {}
+        
+        def setting(name: str, default: str) -> str:
+            value = os.getenv(f"{role.upper()}_{name}") if role else None
+            return value if value else os.getenv(name, default)
+        
         api_key = os.getenv("OPENROUTER_API_KEY")
+        base_url = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
         
         # Set OpenAI API key for AutoGen
         os.environ["OPENAI_API_KEY"] = api_key
-        os.environ["OPENAI_API_BASE"] = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
+        os.environ["OPENAI_API_BASE"] = base_url
+        
+        model = overrides.get("model") or setting("LLM_MODEL", "anthropic/claude-3-sonnet")
+        entry = {
+            "model": model,
+            "api_key": api_key,
+            "base_url": base_url,
+            "api_type": "openrouter",
+            "max_tokens": int(overrides.get("max_tokens") or setting("MAX_TOKENS", "4000")),
+            "timeout": float(os.getenv("LLM_REQUEST_TIMEOUT_SECONDS", 120))
+        }
         
+        fallbacks = overrides.get("fallback_models")
+        if fallbacks is None:
+            fallbacks = os.getenv(f"{role.upper()}_LLM_FALLBACK_MODELS") if role else None
+        if fallbacks is None:
+            fallbacks = os.getenv("LLM_FALLBACK_MODELS", "")
+        models = list(dict.fromkeys([model, *(m.strip() for m in fallbacks.split(",") if m.strip())]))
+        hedge = os.getenv("LLM_HEDGING", "False").lower() == "true"
+        if len(models) > 1 or hedge:
+            # 多模型回退或对冲请求由RoutedModelClient处理（按模型延迟统计选择模型）
+            entry.pop("api_type")
+            entry.update(model_client_cls="RoutedModelClient", models=models, hedge=hedge and len(models) > 1)
+        
+        return {
+            "config_list": [entry],
+            "temperature": float(overrides.get("temperature", setting("TEMPERATURE", "0.7")))
+        }
+    
+    @staticmethod
+    def get_router_config() -> Dict[str, Any]:
+        """获取模型回退与对冲请求配置"""
+        load_environment()
         return {
-            "config_list": [{
-                "model": os.getenv("LLM_MODEL", "anthropic/claude-3-sonnet"),
-                "api_key": api_key,
-                "base_url": os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1"),
-                "api_type": "openrouter",
-                "max_tokens": int(os.getenv("MAX_TOKENS", 4000))
-            }],
-            "temperature": float(os.getenv("TEMPERATURE", 0.7))
+            "ewma_alpha": float(os.getenv("LLM_LATENCY_EWMA_ALPHA", 0.2)),
+            "failure_cooldown": float(os.getenv("LLM_FAILURE_COOLDOWN_SECONDS", 30)),
+            "degraded_factor": float(os.getenv("LLM_DEGRADED_FACTOR", 2.0)),
+            "hedge_max_ratio": float(os.getenv("LLM_HEDGE_MAX_RATIO", 0.1)),
+            "hedge_min_delay": float(os.getenv("LLM_HEDGE_MIN_DELAY_SECONDS", 0.5)),
+            "hedge_default_delay": float(os.getenv("LLM_HEDGE_DEFAULT_DELAY_SECONDS", 3.0)),
+            "request_timeout": float(os.getenv("LLM_REQUEST_TIMEOUT_SECONDS", 120))
         }
     
     @staticmethod
     def get_system_config() -> Dict[str, Any]:
         """获取系统配置"""
+        load_environment()
         return {
             "debug": os.getenv("DEBUG", "False").lower() == "true",
-            "log_level": os.getenv("LOG_LEVEL", "INFO")
+            "log_level": os.getenv("LOG_LEVEL", "INFO"),
+            "topic_state_dir": os.getenv("TOPIC_STATE_DIR", "state"),
+            "report_store_db": os.getenv("REPORT_STORE_DB", "data/reports.db"),
+            "news_archive_db": os.getenv("NEWS_ARCHIVE_DB", "data/news_archive.db"),
+            "workflow": os.getenv("WORKFLOW", "default"),
+            "workflow_llm_selection": os.getenv("WORKFLOW_LLM_SELECTION", "True").lower() == "true",
+            "context_backend": os.getenv("CONTEXT_BACKEND", "memory"),
+            "context_db": os.getenv("CONTEXT_DB", "data/context.db"),
+            "context_inline_bytes": int(os.getenv("CONTEXT_INLINE_BYTES", 64 * 1024)),
+            "chart_dir": os.getenv("CHART_DIR", "reports/charts"),
+            "chart_workers": int(os.getenv("CHART_WORKERS", 2)),
+            "analysis_deadline": float(os.getenv("ANALYSIS_DEADLINE_SECONDS", 900) or 0),
+            "report_grace_seconds": float(os.getenv("ANALYSIS_REPORT_GRACE_SECONDS", 30))
+        }
+
+    @staticmethod
+    def get_news_config() -> Dict[str, Any]:
+        """获取新闻抓取配置"""
+        load_environment()
+        window = os.getenv("NEWS_DATE_WINDOW_DAYS", "7")
+        return {
+            "max_articles": int(os.getenv("NEWS_MAX_ARTICLES", 100)),
+            "fan_out": int(os.getenv("NEWS_FAN_OUT", 4)),
+            "date_window_days": float(window) if window else None,
+            "yahoo_max_articles": int(os.getenv("YAHOO_NEWS_LIMIT", 10)),
+            "archive_max_age_minutes": float(os.getenv("NEWS_ARCHIVE_MAX_AGE_MINUTES", 30)),
+            "topic_corpus_path": os.getenv("TOPIC_CORPUS_PATH", "data/topic_corpus.json")
+        }
+
+    @staticmethod
+    def get_service_config() -> Dict[str, Any]:
+        """获取常驻服务配置"""
+        load_environment()
+        return {
+            "host": os.getenv("SERVICE_HOST", "127.0.0.1"),
+            "port": int(os.getenv("SERVICE_PORT", 8080)),
+            "concurrency": max(1, int(os.getenv("SERVICE_CONCURRENCY", 2))),
+            "queue_size": int(os.getenv("SERVICE_QUEUE_SIZE", 100)),
+            "max_finished_jobs": int(os.getenv("SERVICE_MAX_FINISHED_JOBS", 500)),
+            "max_routed_systems": int(os.getenv("SERVICE_MAX_ROUTED_SYSTEMS", 4))
+        }
+
+    @staticmethod
+    def get_queue_config() -> Dict[str, Any]:
+        """获取持久化任务队列与Worker配置"""
+        load_environment()
+        return {
+            "db_path": os.getenv("JOB_QUEUE_DB", "data/jobs.db"),
+            "visibility_timeout": float(os.getenv("JOB_VISIBILITY_TIMEOUT", 900)),
+            "max_attempts": int(os.getenv("JOB_MAX_ATTEMPTS", 3)),
+            "retry_backoff": float(os.getenv("JOB_RETRY_BACKOFF", 30)),
+            "journal_mode": os.getenv("JOB_QUEUE_JOURNAL_MODE", "WAL"),
+            "poll_interval": float(os.getenv("WORKER_POLL_INTERVAL", 2)),
+            "processes": int(os.getenv("WORKER_PROCESSES", 2))
+        }
+
+    @staticmethod
+    def get_termination_config() -> Dict[str, Any]:
+        """获取对话终止条件配置（预算为0表示不限制）"""
+        load_environment()
+        
+        def budget(name: str, default: str, cast):
+            value = cast(os.getenv(name, default) or 0)
+            return value if value > 0 else None
+        
+        return {
+            "max_messages": budget("CHAT_MAX_MESSAGES", "30", int),
+            "max_tokens": budget("CHAT_TOKEN_BUDGET", "60000", int),
+            "max_seconds": budget("CHAT_TIME_BUDGET_SECONDS", "600", float),
+            "stall_repeats": int(os.getenv("CHAT_STALL_REPEATS", 3)),
+            "stall_similarity": float(os.getenv("CHAT_STALL_SIMILARITY", 0.9))
+        }
+
+    @staticmethod
+    def get_memory_config() -> Dict[str, Any]:
+        """获取内存剖析与每次分析后的内存释放配置"""
+        load_environment()
+        rss_limit = float(os.getenv("MEMORY_RSS_LIMIT_MB", 0) or 0)
+        return {
+            "profiling": os.getenv("MEMORY_PROFILING", "False").lower() == "true",
+            "profile_top": int(os.getenv("MEMORY_PROFILE_TOP", 10)),
+            "clear_chat_history": os.getenv("MEMORY_CLEAR_CHAT_HISTORY", "True").lower() == "true",
+            "evict_context": os.getenv("MEMORY_EVICT_CONTEXT", "True").lower() == "true",
+            "rss_limit_mb": rss_limit if rss_limit > 0 else None
+        }
+
+    @staticmethod
+    def get_monitor_config() -> Dict[str, Any]:
+        """获取股票池监控配置"""
+        load_environment()
+        return {
+            "tickers": [t.strip() for t in os.getenv("MONITOR_TICKERS", "").split(",") if t.strip()],
+            "poll_interval": float(os.getenv("MONITOR_POLL_INTERVAL", 60)),
+            "bar_interval": os.getenv("MONITOR_BAR_INTERVAL", "1d"),
+            "seed_period": os.getenv("MONITOR_SEED_PERIOD", "6mo"),
+            "poll_period": os.getenv("MONITOR_POLL_PERIOD", "5d"),
+            "rsi_overbought": float(os.getenv("MONITOR_RSI_OVERBOUGHT", 70)),
+            "rsi_oversold": float(os.getenv("MONITOR_RSI_OVERSOLD", 30)),
+            "sentiment_window": int(os.getenv("MONITOR_SENTIMENT_WINDOW", 20)),
+            "sentiment_swing": float(os.getenv("MONITOR_SENTIMENT_SWING", 0.3)),
+            "sentiment_every": int(os.getenv("MONITOR_SENTIMENT_EVERY", 10)),
+            "cooldown": float(os.getenv("MONITOR_COOLDOWN", 3600))
         }
 
 def validate_config():
@@ -72,7 +230,9 @@ def validate_config():
             raise ValueError("Missing config_list in LLM configuration")
         
         config = llm_config["config_list"][0]
-        required_fields = ["model", "api_key", "base_url", "api_type"]
+        required_fields = ["model", "api_key", "base_url"]
+        if "model_client_cls" not in config:
+            required_fields.append("api_type")
         if not all(k in config for k in required_fields):
             raise ValueError(f"Missing required LLM configuration parameters: {required_fields}")
         
@@ -88,21 +248,70 @@ def validate_config():
         logger.error(f"Configuration validation failed: {str(e)}")
         raise
 
-def get_agent_configs() -> Dict[str, Dict[str, Any]]:
-    """获取Agent配置"""
-    llm_config = Config.get_llm_config()
+AGENT_ROLES = ("yahoo_analyst", "google_analyst", "report_writer", "manager")
+ROUTING_KEYS = {"model": str, "max_tokens": int, "temperature": float, "fallback_models": str}
+
+def parse_model_routing(specs: List[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    解析单次运行的模型路由覆盖（如 "yahoo_analyst.model=openai/gpt-4o-mini"、
+    "manager.max_tokens=500"），返回 角色 -> {设置: 值}
+    """
+    routing: Dict[str, Dict[str, Any]] = {}
+    for spec in specs:
+        key, sep, value = spec.partition("=")
+        role, dot, setting = key.strip().lower().partition(".")
+        if not sep or not dot or role not in AGENT_ROLES or setting not in ROUTING_KEYS:
+            raise ValueError(
+                f"Invalid model route '{spec}': expected ROLE.SETTING=VALUE with ROLE in "
+                f"{', '.join(AGENT_ROLES)} and SETTING in {', '.join(ROUTING_KEYS)}"
+            )
+        routing.setdefault(role, {})[setting] = value.strip()
+    return validate_model_routing(routing)
+
+def validate_model_routing(routing: Any) -> Dict[str, Dict[str, Any]]:
+    """
+    校验按角色组织的模型路由覆盖（如HTTP请求中的 {"manager": {"max_tokens": 500}}），
+    返回 角色 -> {设置: 值}。fallback_models可以是模型列表（按逗号拼接），其余设置必须是单个值
+    """
+    if not isinstance(routing, dict):
+        raise ValueError("model_routing must map roles to settings")
+    validated: Dict[str, Dict[str, Any]] = {}
+    for role, settings in routing.items():
+        if role not in AGENT_ROLES or not isinstance(settings, dict):
+            raise ValueError(f"Invalid model route role '{role}': expected one of {', '.join(AGENT_ROLES)} "
+                             f"mapping to settings")
+        for setting, value in settings.items():
+            if setting not in ROUTING_KEYS:
+                raise ValueError(f"Invalid model route setting '{role}.{setting}': expected one of "
+                                 f"{', '.join(ROUTING_KEYS)}")
+            if setting == "fallback_models" and isinstance(value, list):
+                if not all(isinstance(model, str) for model in value):
+                    raise ValueError(f"{role}.fallback_models must be a list of model ids")
+                value = ",".join(model.strip() for model in value)
+            elif value is None or isinstance(value, (bool, dict, list)):
+                raise ValueError(f"{role}.{setting} must be a single value")
+            try:
+                validated.setdefault(role, {})[setting] = ROUTING_KEYS[setting](
+                    value.strip() if isinstance(value, str) else value
+                )
+            except ValueError:
+                raise ValueError(f"Invalid value for {role}.{setting}: {value!r}") from None
+    return validated
+
+def get_agent_configs(model_routing: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    获取Agent配置
     
+    Args:
+        model_routing: 本次运行按角色覆盖的模型设置（见parse_model_routing）
+    """
+    model_routing = model_routing or {}
+    names = {"yahoo_analyst": "Yahoo_Analyst", "google_analyst": "Google_Analyst", "report_writer": "Report_Writer"}
     return {
-        "yahoo_analyst": {
-            "name": "Yahoo_Analyst",
-            "llm_config": llm_config
-        },
-        "google_analyst": {
-            "name": "Google_Analyst",
-            "llm_config": llm_config
-        },
-        "report_writer": {
-            "name": "Report_Writer",
-            "llm_config": llm_config
+        role: {
+            "name": name,
+            "role": role,
+            "llm_config": Config.get_llm_config(role, model_routing.get(role))
         }
+        for role, name in names.items()
     }
\ No newline at end of file
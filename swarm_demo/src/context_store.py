@@ -0,0 +1,360 @@
+"""
+Pluggable storage for analysis context data shared between agents and processes.
+"""
+import logging
+import mmap
+import os
+import pickle
+import shutil
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS analyses (
+    analysis_id TEXT PRIMARY KEY,
+    topic TEXT NOT NULL,
+    start_time TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS agent_data (
+    analysis_id TEXT NOT NULL,
+    agent TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    last_update TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    payload BLOB,
+    blob_path TEXT,
+    PRIMARY KEY (analysis_id, agent)
+);
+"""
+
+
+class VersionConflict(Exception):
+    """Agent数据已被其他写入者更新（写入时的期望版本与当前版本不一致）"""
+
+    def __init__(self, analysis_id: str, agent: str, expected: int, actual: int):
+        super().__init__(
+            f"Lost update on {agent} in analysis {analysis_id}: expected version {expected}, found {actual}"
+        )
+        self.analysis_id = analysis_id
+        self.agent = agent
+        self.expected = expected
+        self.actual = actual
+
+
+class ContextBackend:
+    """
+    分析上下文存储接口
+
+    每个Agent的数据是一个带版本号的条目：每次写入版本号加一，写入时可以指定期望版本，
+    不一致时抛出VersionConflict（乐观并发控制，检测丢失更新）。
+    """
+
+    def create(self, analysis_id: str, topic: str, start_time: str) -> None:
+        """登记一次分析"""
+        raise NotImplementedError
+
+    def meta(self, analysis_id: str) -> Optional[Dict[str, Any]]:
+        """分析的主题和开始时间（未登记时返回None）"""
+        raise NotImplementedError
+
+    def put(self, analysis_id: str, agent: str, data: Any, expected_version: Optional[int] = None) -> int:
+        """
+        原子写入Agent数据
+
+        Args:
+            analysis_id: 分析任务ID
+            agent: Agent名称
+            data: Agent结果
+            expected_version: 期望的当前版本（0表示尚无数据，None表示不检查）
+
+        Returns:
+            写入后的版本号
+        """
+        raise NotImplementedError
+
+    def get(self, analysis_id: str, agent: str) -> Optional[Dict[str, Any]]:
+        """Agent条目（version、last_update、data），不存在时返回None"""
+        raise NotImplementedError
+
+    def agents(self, analysis_id: str) -> Dict[str, Dict[str, Any]]:
+        """本次分析所有Agent的条目"""
+        raise NotImplementedError
+
+    def delete(self, analysis_id: str) -> None:
+        """删除一次分析的全部数据"""
+        raise NotImplementedError
+
+    def evict(self, analysis_id: str) -> None:
+        """释放本进程为该分析保存的数据（其他进程仍可读取的持久化数据保留）"""
+        raise NotImplementedError
+
+
+class MemoryContextBackend(ContextBackend):
+    """进程内存储（默认）：数据按引用保存，不做序列化"""
+
+    def __init__(self):
+        self._analyses: Dict[str, Dict[str, Any]] = {}
+        self._entries: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+
+    def create(self, analysis_id: str, topic: str, start_time: str) -> None:
+        with self._lock:
+            self._analyses[analysis_id] = {"topic": topic, "start_time": start_time}
+            self._entries.setdefault(analysis_id, {})
+
+    def meta(self, analysis_id: str) -> Optional[Dict[str, Any]]:
+        return self._analyses.get(analysis_id)
+
+    def put(self, analysis_id: str, agent: str, data: Any, expected_version: Optional[int] = None) -> int:
+        with self._lock:
+            entries = self._entries.setdefault(analysis_id, {})
+            current = entries[agent]["version"] if agent in entries else 0
+            if expected_version is not None and expected_version != current:
+                raise VersionConflict(analysis_id, agent, expected_version, current)
+            entries[agent] = {
+                "version": current + 1,
+                "last_update": datetime.utcnow().isoformat(),
+                "data": data
+            }
+            return current + 1
+
+    def get(self, analysis_id: str, agent: str) -> Optional[Dict[str, Any]]:
+        return self._entries.get(analysis_id, {}).get(agent)
+
+    def agents(self, analysis_id: str) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return dict(self._entries.get(analysis_id, {}))
+
+    def delete(self, analysis_id: str) -> None:
+        with self._lock:
+            self._analyses.pop(analysis_id, None)
+            self._entries.pop(analysis_id, None)
+
+    def evict(self, analysis_id: str) -> None:
+        # 数据只保存在本进程中，释放即删除
+        self.delete(analysis_id)
+
+
+class SQLiteContextBackend(ContextBackend):
+    """
+    多进程共享存储：条目元数据在SQLite中，数据用pickle序列化
+
+    小数据直接存放在数据库中；超过inline_limit字节的数据写入按版本命名的独立文件，
+    读取时通过mmap映射文件并直接反序列化，不经过数据库页缓存，也不先复制成bytes。
+    每个进程按（Agent, 版本）缓存已解码的数据，版本不变时不再重复读取。
+
+    数据文件仅在同一组受信任的进程之间共享（pickle不适用于不可信来源）。
+    """
+
+    def __init__(
+        self,
+        db_path: str = "data/context.db",
+        blob_dir: Optional[str] = None,
+        inline_limit: int = 64 * 1024,
+        journal_mode: str = "WAL"
+    ):
+        """
+        初始化上下文存储
+
+        Args:
+            db_path: SQLite数据库路径（多个进程共享同一个文件）
+            blob_dir: 大数据文件目录（默认为数据库旁的context_blobs目录）
+            inline_limit: 直接存放在数据库中的最大数据字节数
+            journal_mode: SQLite日志模式；网络文件系统上应使用DELETE而不是WAL
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.blob_dir = Path(blob_dir) if blob_dir else self.db_path.parent / "context_blobs"
+        self.inline_limit = inline_limit
+        self.journal_mode = journal_mode
+        self._decoded: Dict[Tuple[str, str], Tuple[int, Any]] = {}
+        self._lock = threading.Lock()
+
+        with closing(self._connect()) as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        """创建数据库连接（autocommit模式，事务由调用方显式控制）"""
+        conn = sqlite3.connect(str(self.db_path), timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute(f"PRAGMA journal_mode={self.journal_mode}")
+        conn.execute("PRAGMA busy_timeout=30000")
+        return conn
+
+    def create(self, analysis_id: str, topic: str, start_time: str) -> None:
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO analyses (analysis_id, topic, start_time) VALUES (?, ?, ?)",
+                (analysis_id, topic, start_time)
+            )
+
+    def meta(self, analysis_id: str) -> Optional[Dict[str, Any]]:
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT topic, start_time FROM analyses WHERE analysis_id = ?", (analysis_id,)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def _blob_path(self, analysis_id: str, agent: str, version: int) -> Path:
+        return self.blob_dir / analysis_id / f"{agent}.v{version}.pkl"
+
+    def put(self, analysis_id: str, agent: str, data: Any, expected_version: Optional[int] = None) -> int:
+        payload = pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+        conn = self._connect()
+        blob_path = None
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT version, blob_path FROM agent_data WHERE analysis_id = ? AND agent = ?",
+                (analysis_id, agent)
+            ).fetchone()
+            current = row["version"] if row else 0
+            if expected_version is not None and expected_version != current:
+                raise VersionConflict(analysis_id, agent, expected_version, current)
+
+            version = current + 1
+            if len(payload) > self.inline_limit:
+                # 在事务内写文件：版本号由写锁保证唯一，提交失败时删除
+                blob_path = self._blob_path(analysis_id, agent, version)
+                blob_path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = blob_path.with_suffix(".tmp")
+                with open(tmp_path, 'wb') as f:
+                    f.write(payload)
+                tmp_path.replace(blob_path)
+
+            conn.execute(
+                "INSERT OR REPLACE INTO agent_data "
+                "(analysis_id, agent, version, last_update, size, payload, blob_path) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (analysis_id, agent, version, datetime.utcnow().isoformat(), len(payload),
+                 None if blob_path else payload, str(blob_path) if blob_path else None)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            if blob_path is not None:
+                blob_path.unlink(missing_ok=True)
+            raise
+        finally:
+            conn.close()
+
+        if row and row["blob_path"]:
+            Path(row["blob_path"]).unlink(missing_ok=True)
+        with self._lock:
+            self._decoded[(analysis_id, agent)] = (version, data)
+        return version
+
+    def _decode(self, analysis_id: str, agent: str, version: int,
+                payload: Optional[bytes], blob_path: Optional[str]) -> Any:
+        """解码条目数据（同一版本只解码一次）"""
+        key = (analysis_id, agent)
+        with self._lock:
+            cached = self._decoded.get(key)
+        if cached and cached[0] == version:
+            return cached[1]
+
+        if blob_path:
+            with open(blob_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                data = pickle.loads(mapped)
+        else:
+            data = pickle.loads(payload)
+        with self._lock:
+            self._decoded[key] = (version, data)
+        return data
+
+    def _entry(self, conn: sqlite3.Connection, analysis_id: str, row: sqlite3.Row) -> Dict[str, Any]:
+        """构造条目；大数据文件被并发写入替换时重新读取最新版本"""
+        for _ in range(3):
+            try:
+                data = self._decode(analysis_id, row["agent"], row["version"], row["payload"], row["blob_path"])
+                return {"version": row["version"], "last_update": row["last_update"], "data": data}
+            except FileNotFoundError:
+                time.sleep(0.01)
+                row = conn.execute(
+                    "SELECT * FROM agent_data WHERE analysis_id = ? AND agent = ?", (analysis_id, row["agent"])
+                ).fetchone()
+        raise RuntimeError(f"Context data for {row['agent']} in {analysis_id} kept changing while reading")
+
+    def _cached_version(self, analysis_id: str, agent: str) -> Optional[int]:
+        with self._lock:
+            cached = self._decoded.get((analysis_id, agent))
+        return cached[0] if cached else None
+
+    def _rows(self, conn: sqlite3.Connection, analysis_id: str, agent: Optional[str] = None):
+        """读取条目行；本进程已解码当前版本的条目不再读取payload"""
+        where, params = "analysis_id = ?", [analysis_id]
+        if agent is not None:
+            where += " AND agent = ?"
+            params.append(agent)
+        versions = conn.execute(
+            f"SELECT agent, version, last_update FROM agent_data WHERE {where}", params
+        ).fetchall()
+        rows = []
+        for row in versions:
+            if self._cached_version(analysis_id, row["agent"]) == row["version"]:
+                rows.append({**dict(row), "payload": None, "blob_path": None})
+            else:
+                rows.append(conn.execute(
+                    "SELECT * FROM agent_data WHERE analysis_id = ? AND agent = ?", (analysis_id, row["agent"])
+                ).fetchone())
+        return rows
+
+    def get(self, analysis_id: str, agent: str) -> Optional[Dict[str, Any]]:
+        with closing(self._connect()) as conn:
+            rows = self._rows(conn, analysis_id, agent)
+            return self._entry(conn, analysis_id, rows[0]) if rows else None
+
+    def agents(self, analysis_id: str) -> Dict[str, Dict[str, Any]]:
+        with closing(self._connect()) as conn:
+            return {row["agent"]: self._entry(conn, analysis_id, row) for row in self._rows(conn, analysis_id)}
+
+    def delete(self, analysis_id: str) -> None:
+        with closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM agent_data WHERE analysis_id = ?", (analysis_id,))
+            conn.execute("DELETE FROM analyses WHERE analysis_id = ?", (analysis_id,))
+        shutil.rmtree(self.blob_dir / analysis_id, ignore_errors=True)
+        self.evict(analysis_id)
+
+    def evict(self, analysis_id: str) -> None:
+        # 只丢弃已解码数据的缓存，数据库和数据文件保留
+        with self._lock:
+            for key in [key for key in self._decoded if key[0] == analysis_id]:
+                del self._decoded[key]
+
+
+_backends: Dict[str, SQLiteContextBackend] = {}
+_backends_lock = threading.Lock()
+
+
+def get_context_backend(kind: Optional[str] = None, db_path: Optional[str] = None,
+                        inline_limit: Optional[int] = None) -> ContextBackend:
+    """
+    按配置获取上下文存储（SQLite存储每个进程每个数据库只创建一次，内存存储每次新建）
+
+    Args:
+        kind: memory或sqlite（默认读取CONTEXT_BACKEND）
+        db_path: SQLite数据库路径（默认读取CONTEXT_DB）
+        inline_limit: 直接存放在数据库中的最大数据字节数（默认读取CONTEXT_INLINE_BYTES）
+    """
+    from config import Config
+
+    config = Config.get_system_config()
+    kind = kind or config["context_backend"]
+    if kind == "memory":
+        return MemoryContextBackend()
+    if kind != "sqlite":
+        raise ValueError(f"Unknown context backend: {kind}")
+
+    db_path = db_path or config["context_db"]
+    key = os.path.abspath(db_path)
+    with _backends_lock:
+        if key not in _backends:
+            _backends[key] = SQLiteContextBackend(db_path, inline_limit=inline_limit or config["context_inline_bytes"])
+        return _backends[key]
@@ -0,0 +1,229 @@
+"""
+Durable SQLite-backed job queue for distributing analysis jobs across worker processes.
+"""
+import json
+import logging
+import sqlite3
+import time
+import uuid
+from contextlib import closing
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_COMPLETED = "completed"
+STATUS_FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    topic TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    worker_id TEXT,
+    available_at REAL NOT NULL,
+    lease_expires_at REAL,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    result TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status_available ON jobs (status, available_at);
+"""
+
+
+class JobQueue:
+    """基于SQLite的持久化任务队列，支持可见性超时与重试"""
+
+    def __init__(
+        self,
+        db_path: str = "jobs.db",
+        visibility_timeout: float = 900.0,
+        max_attempts: int = 3,
+        retry_backoff: float = 30.0,
+        journal_mode: str = "WAL"
+    ):
+        """
+        初始化任务队列
+
+        Args:
+            db_path: SQLite数据库路径（多个进程/主机共享同一个文件）
+            visibility_timeout: 任务租约时长（秒），超时未续约的任务会重新变为可领取
+            max_attempts: 默认最大尝试次数
+            retry_backoff: 失败后重新入队的基础退避时间（秒），按尝试次数线性增长
+            journal_mode: SQLite日志模式；网络文件系统上应使用DELETE而不是WAL
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.journal_mode = journal_mode
+
+        with closing(self._connect()) as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        """创建数据库连接（autocommit模式，事务由调用方显式控制）"""
+        conn = sqlite3.connect(str(self.db_path), timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute(f"PRAGMA journal_mode={self.journal_mode}")
+        conn.execute("PRAGMA busy_timeout=30000")
+        return conn
+
+    def submit(self, topic: str, max_attempts: Optional[int] = None) -> str:
+        """提交分析任务，返回job_id"""
+        job_id = uuid.uuid4().hex
+        now = datetime.utcnow().isoformat()
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "INSERT INTO jobs (job_id, topic, status, max_attempts, available_at, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, topic, STATUS_QUEUED, max_attempts or self.max_attempts, time.time(), now, now)
+            )
+        logger.info(f"Submitted job {job_id} for topic: {topic}")
+        return job_id
+
+    def claim(self, worker_id: str) -> Optional[Dict[str, Any]]:
+        """
+        领取一个可执行的任务
+
+        可领取的任务包括排队中且已到可执行时间的任务，以及租约已过期的运行中任务
+        （其Worker可能已崩溃）。领取操作在 BEGIN IMMEDIATE 事务中完成，保证同一任务
+        只会被一个Worker领取。
+        """
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            now = time.time()
+
+            # 租约过期且已用尽重试次数的任务直接标记为失败
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, worker_id = NULL, lease_expires_at = NULL, updated_at = ? "
+                "WHERE status = ? AND lease_expires_at <= ? AND attempts >= max_attempts",
+                (STATUS_FAILED, "Visibility timeout expired on final attempt",
+                 datetime.utcnow().isoformat(), STATUS_RUNNING, now)
+            )
+
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE (status = ? AND available_at <= ?) "
+                "OR (status = ? AND lease_expires_at <= ?) "
+                "ORDER BY available_at LIMIT 1",
+                (STATUS_QUEUED, now, STATUS_RUNNING, now)
+            ).fetchone()
+
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+
+            conn.execute(
+                "UPDATE jobs SET status = ?, attempts = attempts + 1, worker_id = ?, "
+                "lease_expires_at = ?, updated_at = ? WHERE job_id = ?",
+                (STATUS_RUNNING, worker_id, now + self.visibility_timeout,
+                 datetime.utcnow().isoformat(), row["job_id"])
+            )
+            conn.execute("COMMIT")
+
+            job = dict(row)
+            job.update(status=STATUS_RUNNING, attempts=row["attempts"] + 1, worker_id=worker_id)
+            return job
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def heartbeat(self, job_id: str, worker_id: str) -> bool:
+        """续约任务租约，返回False表示租约已丢失（任务已被其他Worker接管）"""
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET lease_expires_at = ?, updated_at = ? "
+                "WHERE job_id = ? AND worker_id = ? AND status = ?",
+                (time.time() + self.visibility_timeout, datetime.utcnow().isoformat(),
+                 job_id, worker_id, STATUS_RUNNING)
+            )
+            return cursor.rowcount == 1
+
+    def complete(self, job_id: str, worker_id: str, result: Dict[str, Any]) -> bool:
+        """写回任务结果（包括思维链），只有持有租约的Worker才能写入"""
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = NULL, lease_expires_at = NULL, updated_at = ? "
+                "WHERE job_id = ? AND worker_id = ? AND status = ?",
+                (STATUS_COMPLETED, json.dumps(result, default=str, ensure_ascii=False),
+                 datetime.utcnow().isoformat(), job_id, worker_id, STATUS_RUNNING)
+            )
+        if cursor.rowcount != 1:
+            logger.warning(f"Discarding result for job {job_id}: lease lost by {worker_id}")
+            return False
+        return True
+
+    def fail(self, job_id: str, worker_id: str, error: str) -> bool:
+        """记录任务失败；未达到最大尝试次数时按退避时间重新入队"""
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT attempts, max_attempts FROM jobs WHERE job_id = ? AND worker_id = ? AND status = ?",
+                (job_id, worker_id, STATUS_RUNNING)
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return False
+
+            retry = row["attempts"] < row["max_attempts"]
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, worker_id = NULL, lease_expires_at = NULL, "
+                "available_at = ?, updated_at = ? WHERE job_id = ?",
+                (STATUS_QUEUED if retry else STATUS_FAILED, error,
+                 time.time() + self.retry_backoff * row["attempts"],
+                 datetime.utcnow().isoformat(), job_id)
+            )
+            conn.execute("COMMIT")
+            return True
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def get(self, job_id: str, include_result: bool = True) -> Optional[Dict[str, Any]]:
+        """获取任务记录"""
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        if include_result and job["result"]:
+            job["result"] = json.loads(job["result"])
+        elif not include_result:
+            job.pop("result")
+        return job
+
+    def list_jobs(self, status: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """按提交时间倒序列出任务（不含结果内容）"""
+        query = ("SELECT job_id, topic, status, attempts, max_attempts, worker_id, created_at, updated_at, error "
+                 "FROM jobs")
+        params: List[Any] = []
+        if status:
+            query += " WHERE status = ?"
+            params.append(status)
+        query += " ORDER BY created_at DESC LIMIT ?"
+        params.append(limit)
+        with closing(self._connect()) as conn:
+            return [dict(row) for row in conn.execute(query, params)]
+
+    def stats(self) -> Dict[str, int]:
+        """各状态的任务数量"""
+        with closing(self._connect()) as conn:
+            return {
+                row["status"]: row["count"]
+                for row in conn.execute("SELECT status, COUNT(*) AS count FROM jobs GROUP BY status")
+            }
@@ -1,33 +1,49 @@
 """
 Main entry point for the financial news analysis system.
 """
+import argparse
 import asyncio
+import json
 import logging
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 from datetime import datetime
 
-from agents import (
-    YahooFinanceAgent,
-    GoogleNewsAgent,
-    ReportWriterAgent,
-    create_swarm_network,
-    get_default_manager_config
-)
-from config import Config, validate_config, get_agent_configs
+from config import Config, setup_logging, validate_config, get_agent_configs, parse_model_routing
+from context_store import get_context_backend
+from memory_monitor import MEMORY_AGENT, MemoryProfiler, release_run_memory
+from services import deadline
+from services.charts import shutdown_pool
+from services.news_service import NewsService
+from services.report_store import ReportStore
+from topic_state import TopicStateStore
 from utils import AnalysisContext
 
-# 设置日志
-logging.basicConfig(level=Config.get_system_config()["log_level"])
 logger = logging.getLogger(__name__)
 
-async def initialize_system() -> Dict[str, Any]:
-    """初始化系统"""
+DEFAULT_TOPIC = "Tesla Q4 2024 Earnings"
+
+async def initialize_system(model_routing: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """
+    初始化系统
+    
+    Args:
+        model_routing: 本次运行按角色覆盖的模型设置（角色 -> model/max_tokens/temperature/fallback_models）
+    """
     try:
+        # 延迟导入：agents会加载autogen/yfinance/serpapi/textblob
+        from agents import (
+            YahooFinanceAgent,
+            GoogleNewsAgent,
+            ReportWriterAgent,
+            create_swarm_network,
+            get_default_manager_config
+        )
+
         # 验证配置
         validate_config()
         
         # 获取Agent配置
-        agent_configs = get_agent_configs()
+        agent_configs = get_agent_configs(model_routing)
         
         # 创建Agents
         agents = {
@@ -37,9 +53,13 @@ async def initialize_system() -> Dict[str, Any]:
         }
         
         # 创建GroupChat和Manager
+        system_config = Config.get_system_config()
         chat_system = create_swarm_network(
-            manager_config=get_default_manager_config(),
-            agents=list(agents.values())
+            manager_config=get_default_manager_config(model_routing),
+            agents=list(agents.values()),
+            workflow=system_config["workflow"],
+            llm_selection=system_config["workflow_llm_selection"],
+            termination_config=Config.get_termination_config()
         )
         
         return {
@@ -56,41 +76,111 @@ async def run_analysis(
     topic: str,
     agents: Dict[str, Any],
     group_chat: Any,
-    manager: Any
+    manager: Any,
+    incremental: bool = True,
+    deadline_seconds: Optional[float] = None,
+    metadata: Optional[Dict[str, Any]] = None
 ) -> Dict[str, Any]:
-    """运行新闻分析流程"""
+    """
+    运行新闻分析流程
+    
+    Args:
+        deadline_seconds: 本次分析的截止时间（秒，默认ANALYSIS_DEADLINE_SECONDS，0表示不限制）。
+                          到期时取消未完成的工作，并根据已完成的结果生成Partial报告
+        metadata: 附加到报告中的调用方信息（例如监控触发的信号），不影响分析主题
+    """
+    memory_config = Config.get_memory_config()
+    profiler = MemoryProfiler(memory_config["profile_top"]) if memory_config["profiling"] else None
+    context: Optional[AnalysisContext] = None
+    final_report: Optional[Dict[str, Any]] = None
     try:
-        logger.info(f"Starting analysis for topic: {topic}")
+        logger.info(f"Starting analysis for topic: {topic}" + (f" ({metadata})" if metadata else ""))
+        if profiler is not None:
+            profiler.start()
+        
+        # 增量分析：加载该主题上一次运行的状态
+        state_store = TopicStateStore(Config.get_system_config()["topic_state_dir"]) if incremental else None
+        topic_state = state_store.load(topic) if state_store else None
         
         # 创建分析上下文
-        context = AnalysisContext(topic)
+        context = AnalysisContext(topic, topic_state=topic_state, backend=get_context_backend())
         logger.info(f"Created analysis context with ID: {context.analysis_id}")
         
         # 设置初始消息
         initial_message = f"""请分析以下主题的财经新闻: {topic}
         
-1. Yahoo Finance Agent: 请收集和分析相关的财务数据
-2. Google News Agent: 请收集和分析相关的新闻文章
-3. Report Writer: 根据收集到的信息生成综合报告
+1. Yahoo Finance Agent: 请调用yahoo_market_analysis收集和分析相关的财务数据
+2. Google News Agent: 请调用google_news_analysis收集和分析相关的新闻文章
+3. Report Writer: 请调用write_report根据收集到的信息生成综合报告
 
 请确保报告包含:
 - 市场数据分析
 - 新闻情感分析
 - 关键见解和建议"""
 
+        # 发言者转移图按分析统计选择次数
+        speaker_graph = getattr(group_chat, "speaker_selection_method", None)
+        if hasattr(speaker_graph, "reset"):
+            speaker_graph.reset()
+        
+        # 终止条件监视器读取上下文中的结构化报告
+        termination_monitor = getattr(manager, "termination_monitor", None)
+        if termination_monitor is not None:
+            termination_monitor.reset(context)
+        
+        # 工具结果保存在本次分析的上下文中
+        for agent in agents.values():
+            if hasattr(agent, "bind_context"):
+                agent.bind_context(context)
+        
+        # 按角色统计本次分析的LLM调用
+        for agent in [*agents.values(), manager]:
+            if getattr(agent, "llm_usage", None) is not None:
+                agent.llm_usage.reset()
+        
+        # 截止时间传递到工具、HTTP请求和LLM调用，到期时取消整个对话
+        system_config = Config.get_system_config()
+        if deadline_seconds is None:
+            deadline_seconds = system_config["analysis_deadline"]
+        deadline_exceeded = False
+        
         # 启动对话
-        result = await manager.initiate_chat(
-            recipient=agents["yahoo"],
-            message=initial_message,
-            clear_history=True
-        )
-        logger.info("Group chat completed")
+        with deadline.scope(deadline_seconds) as expires:
+            for agent in [*agents.values(), manager]:
+                if hasattr(agent, "llm_deadline"):
+                    agent.llm_deadline = expires
+            try:
+                result = await deadline.within(manager.a_initiate_chat(
+                    recipient=agents["yahoo"],
+                    message=initial_message,
+                    clear_history=True
+                ))
+            except deadline.DeadlineExceeded:
+                deadline_exceeded = True
+                result = None
+            finally:
+                for agent in [*agents.values(), manager]:
+                    if hasattr(agent, "bind_context"):
+                        agent.bind_context(None)
+                    if hasattr(agent, "llm_deadline"):
+                        agent.llm_deadline = None
+            # 对话内部处理了超时错误而自行结束时同样视为超时
+            deadline_exceeded = deadline_exceeded or deadline.remaining() == 0
+        
+        if deadline_exceeded:
+            logger.warning(f"Analysis deadline of {deadline_seconds:.0f}s exceeded, writing a partial report")
+            result = await _partial_report(context, agents, system_config["report_grace_seconds"])
+        else:
+            logger.info("Group chat completed")
         
         # 整合结果
         final_report = {
             "timestamp": datetime.utcnow().isoformat(),
+            "analysis_id": context.analysis_id,
             "topic": topic,
             "content": result,
+            "deadline": {"seconds": deadline_seconds or None, "exceeded": deadline_exceeded},
+            "metadata": metadata or {},
             "thought_chains": {
                 "yahoo": context.get_agent_thoughts(agents["yahoo"].name),
                 "google": context.get_agent_thoughts(agents["google"].name),
@@ -98,17 +188,116 @@ async def run_analysis(
             }
         }
         
+        if termination_monitor is not None:
+            from agents.termination import STOP_WORKFLOW_END, STOP_MAX_ROUND, STOP_DEADLINE
+            
+            workflow_ended = getattr(speaker_graph, "terminations", 0) > 0
+            if deadline_exceeded:
+                final_report["termination"] = {
+                    **termination_monitor.report(STOP_DEADLINE),
+                    "reason": STOP_DEADLINE,
+                    "detail": f"{deadline_seconds:.0f}s analysis deadline"
+                }
+            else:
+                final_report["termination"] = termination_monitor.report(
+                    STOP_WORKFLOW_END if workflow_ended else STOP_MAX_ROUND
+                )
+            logger.info(f"Conversation stopped: {final_report['termination']['reason']}")
+        
+        from agents.model_client import get_tracker
+        
+        # 进程内累计的各模型延迟与对冲统计
+        final_report["llm_latency"] = get_tracker().snapshot()
+        
+        # 各角色本次分析使用的模型、耗时和token数
+        final_report["llm_usage"] = {
+            agent.llm_usage.role: agent.llm_usage.report()
+            for agent in [*agents.values(), manager]
+            if getattr(agent, "llm_usage", None) is not None
+        }
+        
+        final_report["tool_calls"] = {**context.tool_stats, "results": list(context.results)}
+        
+        if hasattr(speaker_graph, "report"):
+            final_report["speaker_selection"] = speaker_graph.report()
+            logger.info(f"Speaker selection saved {final_report['speaker_selection']['manager_calls_saved']} manager LLM call(s)")
+        
+        if state_store:
+            final_report["whats_new"] = context.changes
+            state_store.save(topic, topic_state)
+        
+        # 持久化结构化指标，供跨主题和时间序列分析使用
+        try:
+            ReportStore(Config.get_system_config()["report_store_db"]).save(context.get_context())
+        except Exception as e:
+            logger.warning(f"Failed to persist report metrics: {str(e)}")
+        
+        # 内存剖析结果（RSS峰值、按模块汇总的新增分配）写入思维链日志
+        if profiler is not None:
+            profile = profiler.stop()
+            profiler = None
+            context.log_agent_thought(MEMORY_AGENT, profile)
+            final_report["memory"] = profile
+            logger.info(f"Analysis {context.analysis_id} peak RSS {profile['peak_rss_mb']} MB "
+                        f"(delta {profile['rss_delta_mb']} MB)")
+        
         return final_report
     
     except Exception as e:
         logger.error(f"Analysis failed: {str(e)}")
         raise
+    
+    finally:
+        if profiler is not None:
+            profiler.stop()
+        # 常驻进程中每次分析后清空对话历史并释放上下文数据，避免内存随分析次数增长
+        released = release_run_memory(
+            context,
+            [*agents.values(), manager],
+            group_chat,
+            clear_chat_history=memory_config["clear_chat_history"],
+            evict_context=memory_config["evict_context"],
+            rss_limit_mb=memory_config["rss_limit_mb"]
+        )
+        if memory_config["evict_context"] and getattr(manager, "termination_monitor", None) is not None:
+            manager.termination_monitor.reset()
+        if final_report is not None:
+            final_report.setdefault("memory", {})["released"] = released
 
-async def main(topic: str) -> Dict[str, Any]:
+async def _partial_report(context: AnalysisContext, agents: Dict[str, Any], grace_seconds: float) -> Dict[str, Any]:
+    """
+    截止时间到期后根据已完成的结果生成报告，并列出缺失的部分
+    
+    报告Agent已经写入的报告直接使用；否则在grace_seconds内基于上下文中已有的
+    数据Agent结果生成报告。
+    """
+    writer = agents["writer"]
+    entry = context.get_agent_data(writer.name)
+    report = entry["data"] if entry else None
+    if report is None:
+        try:
+            report = await asyncio.wait_for(writer.generate_report_from_context(context), grace_seconds)
+        except Exception as e:
+            logger.error(f"Failed to write partial report: {str(e)}")
+    
+    stored = context.get_context()["agents"]
+    missing = {
+        "agents": [agent.name for key, agent in agents.items() if key != "writer" and agent.name not in stored],
+        "sections": report.get("missing", []) if report else ["report"],
+        "interrupted_tools": list(context.interrupted_tools)
+    }
+    report = dict(report or {"report_type": "Financial Analysis", "content": None})
+    report["completeness"] = "Partial"
+    report["missing"] = missing
+    return report
+
+async def main(topic: str, incremental: bool = True,
+               model_routing: Optional[Dict[str, Dict[str, Any]]] = None,
+               deadline_seconds: Optional[float] = None) -> Dict[str, Any]:
     """主程序入口"""
     try:
         # 初始化系统
-        system = await initialize_system()
+        system = await initialize_system(model_routing)
         logger.info("System initialized successfully")
         
         # 运行分析
@@ -116,7 +305,9 @@ async def main(topic: str) -> Dict[str, Any]:
             topic=topic,
             agents=system["agents"],
             group_chat=system["group_chat"],
-            manager=system["manager"]
+            manager=system["manager"],
+            incremental=incremental,
+            deadline_seconds=deadline_seconds
         )
         
         logger.info("Analysis completed successfully")
@@ -125,25 +316,76 @@ async def main(topic: str) -> Dict[str, Any]:
     except Exception as e:
         logger.error(f"Program execution failed: {str(e)}")
         raise
+    
+    finally:
+        await NewsService.close_session()
+        shutdown_pool()
+
+async def write_report(analysis_id: str) -> Dict[str, Any]:
+    """在当前进程中只运行报告Agent，读取共享上下文存储中其他进程写入的数据Agent结果"""
+    from agents import ReportWriterAgent
+    
+    backend = get_context_backend("sqlite")
+    context = AnalysisContext.attach(analysis_id, backend)
+    writer = ReportWriterAgent(**get_agent_configs()["report_writer"])
+    logger.info(f"Writing report for analysis {analysis_id} from {backend.db_path}")
+    return await writer.generate_report_from_context(context)
 
-def run_sync(topic: str) -> Dict[str, Any]:
+def run_sync(topic: str, incremental: bool = True,
+             model_routing: Optional[Dict[str, Dict[str, Any]]] = None,
+             deadline_seconds: Optional[float] = None) -> Dict[str, Any]:
     """同步运行入口"""
-    return asyncio.run(main(topic))
+    return asyncio.run(main(topic, incremental=incremental, model_routing=model_routing,
+                            deadline_seconds=deadline_seconds))
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="Multi-agent financial news analysis")
+    parser.add_argument("topic", nargs="?", default=DEFAULT_TOPIC, help="Topic to analyze")
+    parser.add_argument("--full", action="store_true",
+                        help="Ignore state from previous runs and re-analyze everything")
+    parser.add_argument("--report-for", metavar="ANALYSIS_ID",
+                        help="Only run the Report Writer on an analysis in the shared SQLite context store")
+    parser.add_argument("--deadline", type=float, metavar="SECONDS",
+                        help="Stop the analysis after this many seconds and write a partial report "
+                             "(default: ANALYSIS_DEADLINE_SECONDS, 0 for no deadline)")
+    parser.add_argument("--route", action="append", default=[], metavar="ROLE.SETTING=VALUE",
+                        help="Override a role's model setting for this run, e.g. "
+                             "yahoo_analyst.model=openai/gpt-4o-mini or manager.max_tokens=500 (repeatable)")
+    args = parser.parse_args(argv)
+    try:
+        args.model_routing = parse_model_routing(args.route)
+    except ValueError as e:
+        parser.error(str(e))
+    return args
 
 if __name__ == "__main__":
-    # 示例使用
+    args = parse_args()
+    setup_logging()
+
+    if args.report_for:
+        report = asyncio.run(write_report(args.report_for))
+        print(json.dumps(report, ensure_ascii=False, indent=2, default=str))
+        raise SystemExit(0)
+
     try:
         # 设置分析主题
-        analysis_topic = "Tesla Q4 2024 Earnings"
+        analysis_topic = args.topic
         
         # 运行分析
-        result = run_sync(analysis_topic)
+        result = run_sync(analysis_topic, incremental=not args.full,
+                          model_routing=args.model_routing, deadline_seconds=args.deadline)
         
         # 打印结果
         print("\nAnalysis Result:")
         print("=" * 50)
         print(f"Topic: {analysis_topic}")
         print(f"Timestamp: {result.get('timestamp', 'N/A')}")
+        if result.get("deadline", {}).get("exceeded"):
+            print(f"Deadline exceeded, partial report. Missing: {json.dumps(result['content'].get('missing'))}")
+        for role, usage in result.get("llm_usage", {}).items():
+            print(f"LLM {role}: {usage['model']}, {usage['calls']} call(s), "
+                  f"{usage['total_seconds']}s, {usage['total_tokens']} tokens")
         print("\nReport Content:")
         print("-" * 30)
         if "content" in result:
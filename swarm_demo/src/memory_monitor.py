@@ -0,0 +1,209 @@
+"""
+Memory profiling and per-run memory caps for long-running analysis processes.
+"""
+import gc
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+MEMORY_AGENT = "Memory_Monitor"
+RSS_SAMPLE_INTERVAL = 0.5
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def current_rss() -> Optional[int]:
+    """当前进程的常驻内存（字节）；无法读取/proc时返回None"""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def process_peak_rss() -> Optional[int]:
+    """进程启动以来的峰值常驻内存（字节）"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux以KB为单位，macOS以字节为单位
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def module_name(filename: str) -> str:
+    """将源文件路径转换为模块名（按sys.path中最长的匹配前缀）"""
+    path = os.path.abspath(filename)
+    best = ""
+    for entry in sys.path:
+        root = os.path.abspath(entry or ".")
+        if path.startswith(root + os.sep) and len(root) > len(best):
+            best = root
+    if not best:
+        return filename
+    name = os.path.splitext(path[len(best) + 1:])[0].replace(os.sep, ".")
+    return name[:-len(".__init__")] if name.endswith(".__init__") else name
+
+
+def _mb(value: Optional[int]) -> Optional[float]:
+    return round(value / (1024 * 1024), 2) if value is not None else None
+
+
+class MemoryProfiler:
+    """
+    单次分析的内存剖析
+
+    开始时记录tracemalloc快照和RSS，并在后台线程中采样RSS峰值；结束时对比快照，
+    按模块汇总新增的内存分配。tracemalloc和RSS都是进程级的统计，同一进程中
+    并发运行的分析会计入彼此的数据。
+    """
+
+    def __init__(self, top: int = 10):
+        self.top = top
+        self._before: Optional[tracemalloc.Snapshot] = None
+        self._rss_before: Optional[int] = None
+        self._rss_peak: Optional[int] = None
+        self._started = 0.0
+        self._stop = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """开始剖析（首次调用时启动tracemalloc）"""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        self._before = self._snapshot()
+        self._rss_before = self._rss_peak = current_rss()
+        self._started = time.monotonic()
+        self._stop.clear()
+        if self._rss_before is not None:
+            self._sampler = threading.Thread(target=self._sample_rss, name="rss-sampler", daemon=True)
+            self._sampler.start()
+
+    def _sample_rss(self) -> None:
+        while not self._stop.wait(RSS_SAMPLE_INTERVAL):
+            rss = current_rss()
+            if rss is not None and rss > (self._rss_peak or 0):
+                self._rss_peak = rss
+
+    @staticmethod
+    def _snapshot() -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+            tracemalloc.Filter(False, "<unknown>")
+        ])
+
+    def stop(self) -> Dict[str, Any]:
+        """结束剖析，返回RSS变化、tracemalloc峰值和按模块汇总的新增分配"""
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join()
+            self._sampler = None
+        after = self._snapshot()
+        traced_current, traced_peak = tracemalloc.get_traced_memory()
+        rss_after = current_rss()
+        if rss_after is not None:
+            self._rss_peak = max(self._rss_peak or 0, rss_after)
+
+        by_module: Dict[str, Dict[str, int]] = {}
+        for stat in after.compare_to(self._before, "filename"):
+            module = module_name(stat.traceback[0].filename)
+            entry = by_module.setdefault(module, {"size_diff": 0, "count_diff": 0, "size": 0})
+            entry["size_diff"] += stat.size_diff
+            entry["count_diff"] += stat.count_diff
+            entry["size"] += stat.size
+        top = sorted(by_module.items(), key=lambda item: item[1]["size_diff"], reverse=True)[:self.top]
+
+        return {
+            "action": "memory_profile",
+            "timestamp": datetime.utcnow().isoformat(),
+            "elapsed_seconds": round(time.monotonic() - self._started, 3),
+            "rss_before_mb": _mb(self._rss_before),
+            "rss_after_mb": _mb(rss_after),
+            "rss_delta_mb": _mb(rss_after - self._rss_before) if rss_after is not None and self._rss_before is not None else None,
+            "peak_rss_mb": _mb(self._rss_peak),
+            "process_peak_rss_mb": _mb(process_peak_rss()),
+            "traced_current_mb": _mb(traced_current),
+            "traced_peak_mb": _mb(traced_peak),
+            "top_allocators": [
+                {
+                    "module": module,
+                    "size_diff_kb": round(stats["size_diff"] / 1024, 1),
+                    "count_diff": stats["count_diff"],
+                    "size_kb": round(stats["size"] / 1024, 1)
+                }
+                for module, stats in top
+            ]
+        }
+
+
+def _malloc_trim() -> bool:
+    """将glibc空闲的堆内存归还给操作系统（非glibc平台上不做处理）"""
+    try:
+        import ctypes
+
+        return bool(ctypes.CDLL("libc.so.6").malloc_trim(0))
+    except (OSError, AttributeError):
+        return False
+
+
+def release_run_memory(
+    context: Any,
+    agents: List[Any],
+    group_chat: Any = None,
+    clear_chat_history: bool = True,
+    evict_context: bool = True,
+    rss_limit_mb: Optional[float] = None
+) -> Dict[str, Any]:
+    """
+    分析结束后释放常驻进程中的对话和上下文数据
+
+    Args:
+        context: 本次分析的AnalysisContext
+        agents: 参与对话的Agent（包括Manager）
+        group_chat: 本次分析的GroupChat
+        clear_chat_history: 清空GroupChat消息和各Agent的对话历史
+        evict_context: 释放上下文在进程内保存的工具结果和Agent数据（共享存储中的数据保留）
+        rss_limit_mb: RSS超过该值时执行完整垃圾回收并归还空闲堆内存（None表示不限制）
+
+    Returns:
+        本次执行的释放操作
+    """
+    released: Dict[str, Any] = {}
+    if clear_chat_history:
+        messages = len(getattr(group_chat, "messages", None) or [])
+        if group_chat is not None:
+            group_chat.reset()
+        for agent in agents:
+            if hasattr(agent, "clear_history"):
+                agent.clear_history()
+        released["chat_messages"] = messages
+
+    if evict_context and context is not None:
+        released["context_results"] = context.evict()
+
+    if rss_limit_mb:
+        rss = current_rss()
+        if rss is not None and rss > rss_limit_mb * 1024 * 1024:
+            collected = gc.collect()
+            trimmed = _malloc_trim()
+            after = current_rss()
+            released["rss_cap"] = {
+                "limit_mb": rss_limit_mb,
+                "before_mb": _mb(rss),
+                "after_mb": _mb(after),
+                "gc_collected": collected,
+                "malloc_trim": trimmed
+            }
+            logger.warning(f"RSS {_mb(rss)} MB over the {rss_limit_mb} MB cap; after collection {_mb(after)} MB")
+    return released
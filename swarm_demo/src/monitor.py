@@ -0,0 +1,328 @@
+"""
+Watchlist monitor: streaming per-ticker indicators with threshold-triggered analyses.
+
+    python monitor.py TSLA AAPL MSFT --poll-interval 60
+    python monitor.py --queue          # submit triggered analyses to the durable job queue
+"""
+import argparse
+import asyncio
+import logging
+import sys
+import time
+from typing import Dict, Any, List, Optional, Callable, Awaitable
+
+from config import Config, setup_logging
+from services.indicators import RollingMean, WilderRSI, MACD
+from services.market_service import MarketService
+
+logger = logging.getLogger(__name__)
+
+
+class TickerMonitorState:
+    """单个股票的流式指标状态，每根新K线以O(1)更新"""
+
+    def __init__(self, ticker: str, thresholds: Dict[str, Any]):
+        """
+        初始化股票监控状态
+
+        Args:
+            ticker: 股票代码
+            thresholds: 触发阈值（RSI超买/超卖、情绪波动幅度、情绪窗口）
+        """
+        self.ticker = ticker
+        self.thresholds = thresholds
+        self.sma20 = RollingMean(20)
+        self.sma50 = RollingMean(50)
+        self.rsi = WilderRSI(14)
+        self.macd = MACD()
+        self.sentiment = RollingMean(thresholds["sentiment_window"])
+        self.sentiment_reference: Optional[float] = None
+        self.last_bar: Optional[Any] = None
+        self.last_close: Optional[float] = None
+        self.seen_news: set = set()
+
+    def update_bar(self, timestamp: Any, close: float) -> List[Dict[str, Any]]:
+        """处理一根新K线，返回本次触发的信号"""
+        previous_spread = self._sma_spread()
+        previous_rsi = self.rsi.value
+        previous_histogram = self.macd.histogram
+
+        self.sma20.update(close)
+        self.sma50.update(close)
+        rsi = self.rsi.update(close)
+        self.macd.update(close)
+        self.last_bar = timestamp
+        self.last_close = close
+
+        triggers = []
+        spread = self._sma_spread()
+        if previous_spread is not None and spread is not None and (previous_spread > 0) != (spread > 0):
+            triggers.append(self._trigger(
+                "sma_crossover",
+                f"SMA20 crossed {'above' if spread > 0 else 'below'} SMA50"
+            ))
+
+        overbought, oversold = self.thresholds["rsi_overbought"], self.thresholds["rsi_oversold"]
+        if previous_rsi is not None and rsi is not None:
+            if previous_rsi <= overbought < rsi:
+                triggers.append(self._trigger("rsi_overbought", f"RSI rose above {overbought}"))
+            elif previous_rsi >= oversold > rsi:
+                triggers.append(self._trigger("rsi_oversold", f"RSI fell below {oversold}"))
+
+        histogram = self.macd.histogram
+        if previous_histogram is not None and histogram is not None and (previous_histogram > 0) != (histogram > 0):
+            triggers.append(self._trigger(
+                "macd_crossover",
+                f"MACD crossed {'above' if histogram > 0 else 'below'} its signal line"
+            ))
+
+        return triggers
+
+    def update_sentiment(self, score: float) -> List[Dict[str, Any]]:
+        """加入一条新闻情感评分，滚动均值相对参考值的变化超过阈值时触发"""
+        average = self.sentiment.update(score)
+        if average is None:
+            return []
+        if self.sentiment_reference is None:
+            self.sentiment_reference = average
+            return []
+
+        swing = average - self.sentiment_reference
+        if abs(swing) < self.thresholds["sentiment_swing"]:
+            return []
+
+        self.sentiment_reference = average
+        return [self._trigger("sentiment_swing", f"Rolling news sentiment moved {swing:+.2f} to {average:.2f}")]
+
+    def snapshot(self) -> Dict[str, Any]:
+        """当前指标值"""
+        return {
+            "ticker": self.ticker,
+            "last_bar": str(self.last_bar) if self.last_bar is not None else None,
+            "close": self.last_close,
+            "sma20": self.sma20.value,
+            "sma50": self.sma50.value,
+            "rsi": self.rsi.value,
+            "macd": self.macd.macd,
+            "macd_signal": self.macd.signal,
+            "sentiment": self.sentiment.value
+        }
+
+    def _sma_spread(self) -> Optional[float]:
+        if self.sma20.value is None or self.sma50.value is None:
+            return None
+        return self.sma20.value - self.sma50.value
+
+    def _trigger(self, kind: str, description: str) -> Dict[str, Any]:
+        return {"ticker": self.ticker, "type": kind, "description": description, **self.snapshot()}
+
+
+class WatchlistMonitor:
+    """股票池监控器：批量拉取新K线，增量更新指标，并在阈值被触发时启动分析"""
+
+    def __init__(
+        self,
+        tickers: List[str],
+        on_trigger: Callable[[Dict[str, Any]], Awaitable[None]],
+        monitor_config: Dict[str, Any]
+    ):
+        """
+        初始化监控器
+
+        Args:
+            tickers: 监控的股票代码
+            on_trigger: 信号触发时的回调
+            monitor_config: 监控配置（见 Config.get_monitor_config）
+        """
+        self.config = monitor_config
+        self.on_trigger = on_trigger
+        self.states = {ticker: TickerMonitorState(ticker, monitor_config) for ticker in tickers}
+        self._last_fired: Dict[str, float] = {}
+        self._cycle = 0
+
+    async def seed(self) -> None:
+        """用历史K线预热指标（每个股票只在启动时计算一次）"""
+        bars = await self._download(self.config["seed_period"])
+        for ticker, series in bars.items():
+            state = self.states[ticker]
+            for timestamp, close in series:
+                state.update_bar(timestamp, close)
+        logger.info(f"Seeded {len(bars)} of {len(self.states)} ticker(s)")
+
+    async def poll_once(self) -> List[Dict[str, Any]]:
+        """拉取一次最新数据，只处理每个股票上次之后的新K线"""
+        triggers = []
+        bars = await self._download(self.config["poll_period"])
+        for ticker, series in bars.items():
+            state = self.states[ticker]
+            for timestamp, close in series:
+                if state.last_bar is not None and timestamp <= state.last_bar:
+                    continue
+                triggers.extend(state.update_bar(timestamp, close))
+
+        if self.config["sentiment_every"] and self._cycle % self.config["sentiment_every"] == 0:
+            triggers.extend(await self._poll_sentiment())
+        self._cycle += 1
+
+        for trigger in triggers:
+            await self._fire(trigger)
+        return triggers
+
+    async def run(self) -> None:
+        """持续监控"""
+        await self.seed()
+        while True:
+            started = time.monotonic()
+            try:
+                await self.poll_once()
+            except Exception as e:
+                logger.error(f"Monitor poll failed: {str(e)}")
+            await asyncio.sleep(max(0.0, self.config["poll_interval"] - (time.monotonic() - started)))
+
+    async def _fire(self, trigger: Dict[str, Any]) -> None:
+        """在冷却时间之外才触发分析，避免同一股票被反复分析"""
+        ticker = trigger["ticker"]
+        now = time.monotonic()
+        if now - self._last_fired.get(ticker, float("-inf")) < self.config["cooldown"]:
+            logger.info(f"Suppressed {trigger['type']} for {ticker} (cooldown)")
+            return
+        self._last_fired[ticker] = now
+        logger.info(f"Trigger {trigger['type']} for {ticker}: {trigger['description']}")
+        await self.on_trigger(trigger)
+
+    async def _download(self, period: str) -> Dict[str, List[Any]]:
+        """一次请求批量下载所有股票的已收盘K线"""
+        import yfinance as yf
+
+        tickers = list(self.states)
+        frame = await asyncio.get_running_loop().run_in_executor(None, lambda: yf.download(
+            tickers,
+            period=period,
+            interval=self.config["bar_interval"],
+            group_by="ticker",
+            auto_adjust=False,
+            progress=False,
+            threads=True
+        ))
+
+        # group_by="ticker"时列为(股票, 字段)两级，新版yfinance对单个股票同样如此
+        grouped = getattr(frame.columns, "nlevels", 1) > 1
+        bars = {}
+        for ticker in tickers:
+            try:
+                closes = frame[ticker]["Close"] if grouped else frame["Close"]
+            except KeyError:
+                continue
+            # 最后一根K线可能尚未收盘；流式指标一旦累加便无法修正，因此只处理已收盘的K线
+            closes = closes.dropna().iloc[:-1]
+            bars[ticker] = list(zip(closes.index, (float(v) for v in closes)))
+        return bars
+
+    async def _poll_sentiment(self) -> List[Dict[str, Any]]:
+        """为每个股票的Yahoo新闻中未见过的标题评分，并更新滚动情感均值"""
+        from textblob import TextBlob
+
+        def fetch_news(ticker: str) -> List[Dict[str, Any]]:
+            try:
+                return MarketService.get_ticker(ticker).news or []
+            except Exception as e:
+                logger.warning(f"News poll failed for {ticker}: {str(e)}")
+                return []
+
+        loop = asyncio.get_running_loop()
+        news_by_ticker = await asyncio.gather(*[
+            loop.run_in_executor(None, fetch_news, ticker) for ticker in self.states
+        ])
+
+        triggers = []
+        for state, news in zip(self.states.values(), news_by_ticker):
+            for article in news:
+                key = article.get("link") or article.get("title")
+                if not key or key in state.seen_news:
+                    continue
+                state.seen_news.add(key)
+                score = TextBlob(article.get("title", "")).sentiment.polarity
+                triggers.extend(state.update_sentiment(score))
+        return triggers
+
+
+def analysis_runner(use_queue: bool) -> Callable[[Dict[str, Any]], Awaitable[None]]:
+    """创建触发回调：提交到持久化队列，或在本进程的预热系统上依次运行分析"""
+    if use_queue:
+        from worker import create_queue
+
+        queue = create_queue()
+
+        async def submit(trigger: Dict[str, Any]) -> None:
+            # 主题只用股票代码，以便复用该股票的增量状态；触发原因记录在日志中
+            job_id = queue.submit(trigger["ticker"])
+            logger.info(f"Submitted job {job_id} for {trigger['ticker']} ({trigger['type']}: {trigger['description']})")
+
+        return submit
+
+    from main import initialize_system, run_analysis
+
+    system: Dict[str, Any] = {}
+    lock = asyncio.Lock()
+    pending: set = set()
+
+    async def run(trigger: Dict[str, Any]) -> None:
+        async with lock:
+            if not system:
+                system.update(await initialize_system())
+            system["group_chat"].reset()
+            report = await run_analysis(
+                topic=trigger["ticker"],
+                agents=system["agents"],
+                group_chat=system["group_chat"],
+                manager=system["manager"],
+                metadata={"trigger": trigger}
+            )
+            logger.info(f"Analysis finished for {trigger['ticker']} at {report['timestamp']}")
+
+    async def schedule(trigger: Dict[str, Any]) -> None:
+        # 分析在后台运行，不阻塞下一轮行情轮询
+        task = asyncio.create_task(run(trigger))
+        pending.add(task)
+        task.add_done_callback(lambda done: finished(done, trigger))
+
+    def finished(task: asyncio.Task, trigger: Dict[str, Any]) -> None:
+        pending.discard(task)
+        if task.cancelled():
+            return
+        error = task.exception()
+        if error is not None:
+            logger.error(f"Analysis for {trigger['ticker']} ({trigger['type']}) failed: {str(error)}",
+                         exc_info=error)
+
+    return schedule
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    monitor_config = Config.get_monitor_config()
+
+    parser = argparse.ArgumentParser(description="Watch a list of tickers and trigger analyses on signals")
+    parser.add_argument("tickers", nargs="*", default=monitor_config["tickers"])
+    parser.add_argument("--poll-interval", type=float, default=monitor_config["poll_interval"])
+    parser.add_argument("--queue", action="store_true", help="Submit triggered analyses to the job queue")
+    args = parser.parse_args(argv)
+    setup_logging()
+
+    if not args.tickers:
+        parser.error("No tickers given (pass them as arguments or set MONITOR_TICKERS)")
+
+    monitor_config["poll_interval"] = args.poll_interval
+    monitor = WatchlistMonitor(
+        tickers=[ticker.upper() for ticker in args.tickers],
+        on_trigger=analysis_runner(args.queue),
+        monitor_config=monitor_config
+    )
+    try:
+        asyncio.run(monitor.run())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,269 @@
+"""
+Resident analysis service for the financial news analysis system.
+
+Keeps initialized agent systems warm between requests and runs analysis
+jobs submitted over HTTP on an internal asyncio queue.
+"""
+import asyncio
+import json
+import logging
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from functools import partial
+from typing import Dict, Any, List, Optional
+
+from aiohttp import web
+
+from config import Config, setup_logging, validate_model_routing
+from main import initialize_system, run_analysis
+from services.charts import shutdown_pool
+from services.news_service import NewsService
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+
+_json_dumps = partial(json.dumps, default=str, ensure_ascii=False)
+
+
+class AnalysisService:
+    """常驻分析服务：预热的Agent系统 + 异步任务队列"""
+
+    def __init__(self, concurrency: int = 2, queue_size: int = 100, max_finished_jobs: int = 500,
+                 max_routed_systems: int = 4):
+        """
+        初始化分析服务
+
+        Args:
+            concurrency: 同时运行的分析任务数（每个任务占用一套独立的Agent系统）
+            queue_size: 等待队列的最大长度
+            max_finished_jobs: 内存中保留的已完成任务数量上限
+            max_routed_systems: 每个工作协程为不同模型路由保留的预热系统数量上限（最久未使用的先淘汰）
+        """
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.max_finished_jobs = max_finished_jobs
+        self.max_routed_systems = max_routed_systems
+        self.jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._queue: Optional[asyncio.Queue] = None
+        self._systems: List[Dict[str, Any]] = []
+        self._workers: List[asyncio.Task] = []
+
+    async def start(self) -> None:
+        """预热Agent系统并启动工作协程"""
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+
+        # GroupChat的消息列表不能在并发分析之间共享，每个并发槽位各自持有一套系统
+        for _ in range(self.concurrency):
+            self._systems.append(await initialize_system())
+
+        self._workers = [
+            asyncio.create_task(self._worker(index, system))
+            for index, system in enumerate(self._systems)
+        ]
+        logger.info(f"Analysis service started with {self.concurrency} warm worker(s)")
+
+    async def stop(self) -> None:
+        """停止所有工作协程"""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        await NewsService.close_session()
+        shutdown_pool()
+        logger.info("Analysis service stopped")
+
+    def submit(self, topic: str, model_routing: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[str, Any]:
+        """提交分析任务（可按角色覆盖模型设置），队列已满时抛出 asyncio.QueueFull"""
+        job = {
+            "job_id": uuid.uuid4().hex,
+            "topic": topic,
+            "model_routing": model_routing or None,
+            "status": JOB_QUEUED,
+            "submitted_at": datetime.utcnow().isoformat(),
+            "started_at": None,
+            "finished_at": None,
+            "result": None,
+            "error": None
+        }
+        self._queue.put_nowait(job)
+        self.jobs[job["job_id"]] = job
+        return job
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """获取任务记录"""
+        return self.jobs.get(job_id)
+
+    def stats(self) -> Dict[str, Any]:
+        """获取服务运行状态"""
+        counts: Dict[str, int] = {}
+        for job in self.jobs.values():
+            counts[job["status"]] = counts.get(job["status"], 0) + 1
+        return {
+            "workers": len(self._workers),
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "jobs": counts
+        }
+
+    async def _worker(self, index: int, system: Dict[str, Any]) -> None:
+        """从队列中依次取出任务并在预热的系统上执行"""
+        # 覆盖了模型设置的任务按路由（规范化的JSON）复用本工作协程预热过的系统
+        routed: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        while True:
+            job = await self._queue.get()
+            job["status"] = JOB_RUNNING
+            job["started_at"] = datetime.utcnow().isoformat()
+            logger.info(f"Worker {index} running job {job['job_id']} ({job['topic']})")
+            try:
+                # 复用Agent实例，但每个任务从空白对话开始
+                job_system = await self._routed_system(routed, job["model_routing"]) if job["model_routing"] else system
+                job_system["group_chat"].reset()
+                job["result"] = await run_analysis(
+                    topic=job["topic"],
+                    agents=job_system["agents"],
+                    group_chat=job_system["group_chat"],
+                    manager=job_system["manager"]
+                )
+                job["status"] = JOB_COMPLETED
+            except asyncio.CancelledError:
+                job["status"] = JOB_FAILED
+                job["error"] = "Service shutting down"
+                raise
+            except Exception as e:
+                logger.error(f"Job {job['job_id']} failed: {str(e)}")
+                job["status"] = JOB_FAILED
+                job["error"] = str(e)
+            finally:
+                job["finished_at"] = datetime.utcnow().isoformat()
+                self._queue.task_done()
+                self._evict_finished_jobs()
+
+    async def _routed_system(
+        self,
+        routed: "OrderedDict[str, Dict[str, Any]]",
+        model_routing: Dict[str, Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """获取该模型路由的预热系统，首次使用时创建"""
+        key = json.dumps(model_routing, sort_keys=True)
+        if key in routed:
+            routed.move_to_end(key)
+            return routed[key]
+        system = await initialize_system(model_routing)
+        if self.max_routed_systems > 0:
+            routed[key] = system
+            while len(routed) > self.max_routed_systems:
+                routed.popitem(last=False)
+        return system
+
+    def _evict_finished_jobs(self) -> None:
+        """按提交顺序淘汰最早完成的任务，避免常驻进程内存持续增长"""
+        finished = [
+            job_id for job_id, job in self.jobs.items()
+            if job["status"] in (JOB_COMPLETED, JOB_FAILED)
+        ]
+        for job_id in finished[:max(0, len(finished) - self.max_finished_jobs)]:
+            del self.jobs[job_id]
+
+
+def _job_summary(job: Dict[str, Any]) -> Dict[str, Any]:
+    """任务状态（不含结果内容）"""
+    return {k: v for k, v in job.items() if k != "result"}
+
+
+async def handle_submit(request: web.Request) -> web.Response:
+    """POST /analyses"""
+    service: AnalysisService = request.app["service"]
+    try:
+        payload = await request.json()
+    except json.JSONDecodeError:
+        raise web.HTTPBadRequest(text="Request body must be JSON")
+
+    topic = (payload.get("topic") or "").strip() if isinstance(payload, dict) else ""
+    if not topic:
+        raise web.HTTPBadRequest(text="Missing required field: topic")
+
+    try:
+        model_routing = validate_model_routing(payload.get("model_routing") or {})
+    except ValueError as e:
+        raise web.HTTPBadRequest(text=str(e))
+
+    try:
+        job = service.submit(topic, model_routing)
+    except asyncio.QueueFull:
+        raise web.HTTPServiceUnavailable(text="Analysis queue is full")
+
+    return web.json_response(_job_summary(job), status=202, dumps=_json_dumps)
+
+
+async def handle_list(request: web.Request) -> web.Response:
+    """GET /analyses"""
+    service: AnalysisService = request.app["service"]
+    return web.json_response([_job_summary(job) for job in service.jobs.values()], dumps=_json_dumps)
+
+
+async def handle_status(request: web.Request) -> web.Response:
+    """GET /analyses/{job_id}"""
+    job = request.app["service"].get_job(request.match_info["job_id"])
+    if job is None:
+        raise web.HTTPNotFound(text="Unknown job_id")
+    return web.json_response(_job_summary(job), dumps=_json_dumps)
+
+
+async def handle_result(request: web.Request) -> web.Response:
+    """GET /analyses/{job_id}/result"""
+    job = request.app["service"].get_job(request.match_info["job_id"])
+    if job is None:
+        raise web.HTTPNotFound(text="Unknown job_id")
+    if job["status"] == JOB_FAILED:
+        return web.json_response(_job_summary(job), status=500, dumps=_json_dumps)
+    if job["status"] != JOB_COMPLETED:
+        return web.json_response(_job_summary(job), status=202, dumps=_json_dumps)
+    return web.json_response(job["result"], dumps=_json_dumps)
+
+
+async def handle_health(request: web.Request) -> web.Response:
+    """GET /health"""
+    return web.json_response(request.app["service"].stats())
+
+
+def create_app(service: AnalysisService) -> web.Application:
+    """创建aiohttp应用"""
+    app = web.Application()
+    app["service"] = service
+
+    async def on_startup(app: web.Application) -> None:
+        await service.start()
+
+    async def on_cleanup(app: web.Application) -> None:
+        await service.stop()
+
+    app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
+    app.add_routes([
+        web.post("/analyses", handle_submit),
+        web.get("/analyses", handle_list),
+        web.get("/analyses/{job_id}", handle_status),
+        web.get("/analyses/{job_id}/result", handle_result),
+        web.get("/health", handle_health)
+    ])
+    return app
+
+
+if __name__ == "__main__":
+    setup_logging()
+    service_config = Config.get_service_config()
+
+    web.run_app(
+        create_app(AnalysisService(
+            concurrency=service_config["concurrency"],
+            queue_size=service_config["queue_size"],
+            max_finished_jobs=service_config["max_finished_jobs"],
+            max_routed_systems=service_config["max_routed_systems"]
+        )),
+        host=service_config["host"],
+        port=service_config["port"]
+    )
@@ -3,8 +3,22 @@ Services package initialization.
 """
 from .market_service import MarketService
 from .news_service import NewsService
+from .indicators import RollingMean, EMA, WilderRSI, MACD
+from .article_batch import ArticleBatch, ArticleView
+from .report_store import ReportStore
+from .news_archive import NewsArchive
+from .event_detector import EventDetector
 
 __all__ = [
     'MarketService',
-    'NewsService'
+    'NewsService',
+    'RollingMean',
+    'EMA',
+    'WilderRSI',
+    'MACD',
+    'ArticleBatch',
+    'ArticleView',
+    'ReportStore',
+    'NewsArchive',
+    'EventDetector'
 ]
\ No newline at end of file
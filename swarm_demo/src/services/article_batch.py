@@ -0,0 +1,168 @@
+"""
+Columnar container for news articles passed between pipeline stages.
+"""
+import math
+from array import array
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Union
+
+# Field names produced at the JSON/LLM boundary, in column order
+FIELDS = ("title", "source", "published", "snippet", "link", "sentiment_score", "kind")
+
+
+class ArticleView:
+    """Read-only, dict-like view of one row of an ArticleBatch (no per-article dict is allocated)"""
+
+    __slots__ = ("_batch", "_row")
+
+    def __init__(self, batch: "ArticleBatch", row: int):
+        self._batch = batch
+        self._row = row
+
+    def __getitem__(self, field: str) -> Any:
+        return self._batch.value(self._row, field)
+
+    def get(self, field: str, default: Any = None) -> Any:
+        if field not in FIELDS:
+            return default
+        value = self._batch.value(self._row, field)
+        return default if value is None else value
+
+    def keys(self):
+        return FIELDS
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {field: self._batch.value(self._row, field) for field in FIELDS}
+
+    def __repr__(self) -> str:
+        return f"ArticleView({self.to_dict()!r})"
+
+
+class ArticleBatch:
+    """
+    Articles stored as parallel columns
+
+    Stages receive the same batch object by reference and append or read columns
+    in place. Sentiment scores live in a packed ``array('d')`` (NaN means "not
+    scored"). Dicts are only materialized by ``to_dicts`` when data leaves the
+    pipeline (JSON persistence, LLM messages).
+    """
+
+    __slots__ = ("titles", "sources", "published", "snippets", "links", "scores", "kinds", "_link_index")
+
+    def __init__(self):
+        self.titles: List[Optional[str]] = []
+        self.sources: List[Optional[str]] = []
+        self.published: List[Any] = []
+        self.snippets: List[Optional[str]] = []
+        self.links: List[Optional[str]] = []
+        self.scores = array("d")
+        self.kinds: List[Optional[str]] = []
+        self._link_index: Optional[Dict[str, int]] = None
+
+    @classmethod
+    def from_dicts(cls, records: Iterable[Dict[str, Any]]) -> "ArticleBatch":
+        batch = cls()
+        for record in records:
+            batch.append_dict(record)
+        return batch
+
+    def append(
+        self,
+        title: Optional[str],
+        source: Optional[str] = None,
+        published: Any = None,
+        snippet: Optional[str] = None,
+        link: Optional[str] = None,
+        sentiment_score: Optional[float] = None,
+        kind: Optional[str] = None
+    ) -> int:
+        """Append one article and return its row index"""
+        self.titles.append(title)
+        self.sources.append(source)
+        self.published.append(published)
+        self.snippets.append(snippet)
+        self.links.append(link)
+        self.scores.append(math.nan if sentiment_score is None else sentiment_score)
+        self.kinds.append(kind)
+        if self._link_index is not None and link is not None:
+            self._link_index.setdefault(link, len(self.links) - 1)
+        return len(self.links) - 1
+
+    def append_dict(self, record: Union[Dict[str, Any], ArticleView]) -> int:
+        return self.append(*(record.get(field) for field in FIELDS))
+
+    def extend(self, other: "ArticleBatch") -> None:
+        """Append every row of another batch"""
+        self.titles.extend(other.titles)
+        self.sources.extend(other.sources)
+        self.published.extend(other.published)
+        self.snippets.extend(other.snippets)
+        self.links.extend(other.links)
+        self.scores.extend(other.scores)
+        self.kinds.extend(other.kinds)
+        self._link_index = None
+
+    def value(self, row: int, field: str) -> Any:
+        """Value of one field in one row"""
+        if field == "title":
+            return self.titles[row]
+        if field == "source":
+            return self.sources[row]
+        if field == "published":
+            return self.published[row]
+        if field == "snippet":
+            return self.snippets[row]
+        if field == "link":
+            return self.links[row]
+        if field == "sentiment_score":
+            score = self.scores[row]
+            return None if math.isnan(score) else score
+        if field == "kind":
+            return self.kinds[row]
+        raise KeyError(field)
+
+    def contains_link(self, link: str) -> bool:
+        if self._link_index is None:
+            self._link_index = {}
+            for row, existing in enumerate(self.links):
+                if existing is not None:
+                    self._link_index.setdefault(existing, row)
+        return link in self._link_index
+
+    def scored(self) -> List[float]:
+        """Sentiment scores of the rows that have been scored"""
+        return [score for score in self.scores if not math.isnan(score)]
+
+    def take(self, rows: Iterable[int]) -> "ArticleBatch":
+        """New batch containing the given rows"""
+        batch = ArticleBatch()
+        for row in rows:
+            batch.append(*(self.value(row, field) for field in FIELDS))
+        return batch
+
+    def to_dicts(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Materialize rows as dicts (for JSON serialization and LLM prompts)"""
+        rows = range(len(self) if limit is None else min(limit, len(self)))
+        return [{field: self.value(row, field) for field in FIELDS} for row in rows]
+
+    def __len__(self) -> int:
+        return len(self.links)
+
+    def __iter__(self) -> Iterator[ArticleView]:
+        for row in range(len(self)):
+            yield ArticleView(self, row)
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[ArticleView, "ArticleBatch"]:
+        if isinstance(index, slice):
+            return self.take(range(*index.indices(len(self))))
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("ArticleBatch index out of range")
+        return ArticleView(self, index)
+
+    def __bool__(self) -> bool:
+        return len(self) > 0
+
+    def __repr__(self) -> str:
+        return f"ArticleBatch({len(self)} articles)"
@@ -0,0 +1,273 @@
+"""
+Vectorized backtest of the report recommendation rules over many tickers.
+"""
+import logging
+import time
+from typing import Dict, Any, Iterable, List, Optional, Sequence, TYPE_CHECKING
+
+from .market_service import MarketService
+from .news_service import NewsService
+
+if TYPE_CHECKING:
+    import pandas as pd
+    from .news_archive import NewsArchive
+    from .report_store import ReportStore
+
+logger = logging.getLogger(__name__)
+
+RULES = ("price_trend", "sma_crossover", "sentiment", "majority")
+TRADING_DAYS = 252
+
+
+def _naive_dates(index) -> 'pd.DatetimeIndex':
+    """Calendar dates without timezone, so bars and sentiment days line up"""
+    import pandas as pd
+
+    index = pd.DatetimeIndex(pd.to_datetime(index))
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    return index.normalize()
+
+
+def rule_signals(
+    close: 'pd.DataFrame',
+    sentiment: Optional['pd.DataFrame'] = None,
+    trend_window: int = MarketService.TREND_WINDOW,
+    sma_fast: int = MarketService.SMA_FAST,
+    sma_slow: int = MarketService.SMA_SLOW,
+    threshold: float = NewsService.SIGNAL_THRESHOLD,
+    sentiment_max_age_days: int = 5
+) -> Dict[str, 'pd.DataFrame']:
+    """
+    Signals of each recommendation rule for every bar and ticker
+
+    ``close`` is a date x ticker frame of daily closes. Each signal frame has the
+    same shape and holds +1 (bullish), -1 (bearish) or 0 (no signal). The rules
+    are the ones used to build report recommendations:
+
+    - price_trend: change over ``trend_window`` bars above zero (MarketService "Price Trend")
+    - sma_crossover: SMA(sma_fast) above SMA(sma_slow) (MarketService "SMA Crossover")
+    - sentiment: average news sentiment beyond ``threshold`` (ReportWriterAgent)
+    - majority: sign of the sum of the three signals
+
+    Sentiment for a day only becomes usable on the following day and stays valid for
+    ``sentiment_max_age_days``, so the signal never sees news published after the bar.
+    """
+    import pandas as pd
+
+    listed = close.notna()
+
+    change = close / close.shift(trend_window - 1) - 1
+    price_trend = (change > 0).astype(int) * 2 - 1
+    price_trend = price_trend.where(change.notna() & listed, 0)
+
+    fast = close.rolling(sma_fast).mean()
+    slow = close.rolling(sma_slow).mean()
+    sma_crossover = (fast > slow).astype(int) * 2 - 1
+    sma_crossover = sma_crossover.where(slow.notna() & listed, 0)
+
+    sentiment_signal = pd.DataFrame(0, index=close.index, columns=close.columns)
+    if sentiment is not None and not sentiment.empty:
+        available = sentiment.copy()
+        available.index = _naive_dates(available.index) + pd.Timedelta(days=1)
+        available = available.groupby(level=0).last().sort_index()
+        bar_dates = _naive_dates(close.index)
+        aligned = available.reindex(
+            bar_dates, method="ffill", tolerance=pd.Timedelta(days=sentiment_max_age_days)
+        ).reindex(columns=close.columns)
+        aligned.index = close.index
+        sentiment_signal = ((aligned > threshold).astype(int) - (aligned < -threshold).astype(int))
+        sentiment_signal = sentiment_signal.where(listed, 0)
+
+    majority = (price_trend + sma_crossover + sentiment_signal).clip(-1, 1)
+    return {
+        "price_trend": price_trend,
+        "sma_crossover": sma_crossover,
+        "sentiment": sentiment_signal,
+        "majority": majority
+    }
+
+
+def _signal_stats(signal: 'pd.DataFrame', forward: 'pd.DataFrame') -> Dict[str, Any]:
+    """Hit rate and average returns (in the signal's direction) of the non-zero signals with a known forward return"""
+    import numpy as np
+
+    signs = signal.to_numpy()
+    returns = forward.to_numpy()
+    valid = (signs != 0) & ~np.isnan(returns)
+    signs, returns = signs[valid], returns[valid]
+    long, short = signs > 0, signs < 0
+
+    def mean(values):
+        return float(values.mean()) if values.size else None
+
+    return {
+        "signals": int(signs.size),
+        "long": int(long.sum()),
+        "short": int(short.sum()),
+        "hit_rate": mean(np.sign(returns) == signs),
+        "average_return": mean(signs * returns),
+        "average_long_return": mean(returns[long]),
+        "average_short_return": mean(-returns[short])
+    }
+
+
+def _portfolio(signal: 'pd.DataFrame', close: 'pd.DataFrame', cost_bps: float) -> Dict[str, Any]:
+    """Equal-weight daily long/short portfolio that holds each signal for the next bar"""
+    import numpy as np
+
+    next_return = (close.shift(-1) / close - 1).fillna(0.0)
+    active = (signal != 0).sum(axis=1)
+    weights = signal.div(active.where(active > 0, 1), axis=0)
+    turnover = weights.diff().fillna(weights).abs().sum(axis=1)
+    daily = (weights * next_return).sum(axis=1) - turnover * cost_bps / 10000
+    daily = daily.iloc[:-1]  # the last bar has no next return
+    if daily.empty:
+        return {"days": 0, "total_return": None, "annualized_return": None, "sharpe": None, "max_drawdown": None}
+
+    equity = (1 + daily).cumprod()
+    std = daily.std()
+    total = float(equity.iloc[-1] - 1)
+    return {
+        "days": int(daily.size),
+        "invested_days": int((active.iloc[:-1] > 0).sum()),
+        "total_return": total,
+        "annualized_return": float((1 + total) ** (TRADING_DAYS / daily.size) - 1) if total > -1 else -1.0,
+        "sharpe": float(daily.mean() / std * np.sqrt(TRADING_DAYS)) if std > 0 else None,
+        "max_drawdown": float((equity / equity.cummax() - 1).min()),
+        "average_turnover": float(turnover.mean())
+    }
+
+
+def run_backtest(
+    close: 'pd.DataFrame',
+    sentiment: Optional['pd.DataFrame'] = None,
+    horizons: Sequence[int] = (1, 5, 21),
+    cost_bps: float = 0.0,
+    **rule_options
+) -> Dict[str, Any]:
+    """
+    Replay the recommendation rules over a date x ticker frame of daily closes
+
+    For each rule and horizon, a signal on bar t is scored against the close-to-close
+    return from t to t + horizon. Signals on consecutive bars overlap for horizons
+    above one. The portfolio figures avoid that overlap by holding each day's signals
+    for one bar only.
+    """
+    started = time.perf_counter()
+    close = close.sort_index()
+    signals = rule_signals(close, sentiment, **rule_options)
+    forward = {horizon: close.shift(-horizon) / close - 1 for horizon in horizons}
+
+    results = {}
+    for rule in RULES:
+        signal = signals[rule]
+        results[rule] = {
+            "horizons": {str(horizon): _signal_stats(signal, forward[horizon]) for horizon in horizons},
+            "portfolio": _portfolio(signal, close, cost_bps)
+        }
+
+    baseline = {}
+    for horizon in horizons:
+        values = forward[horizon].to_numpy().ravel()
+        values = values[values == values]  # drop NaN
+        baseline[str(horizon)] = float(values.mean()) if values.size else None
+
+    return {
+        "tickers": int(close.shape[1]),
+        "bars": int(close.shape[0]),
+        "start": str(close.index[0])[:10] if len(close) else None,
+        "end": str(close.index[-1])[:10] if len(close) else None,
+        "sentiment_tickers": int(sentiment.notna().any().sum()) if sentiment is not None and not sentiment.empty else 0,
+        "cost_bps": cost_bps,
+        "baseline_average_return": baseline,
+        "rules": results,
+        "elapsed_seconds": round(time.perf_counter() - started, 3)
+    }
+
+
+def load_prices(tickers: Iterable[str], period: str = "5y") -> 'pd.DataFrame':
+    """Daily adjusted closes (date x ticker) for all tickers in one bulk Yahoo Finance download"""
+    import yfinance as yf
+
+    tickers = list(dict.fromkeys(tickers))
+    data = yf.download(
+        tickers, period=period, interval="1d", auto_adjust=True,
+        group_by="column", threads=True, progress=False,
+        session=MarketService.get_session()
+    )
+    close = data["Close"]
+    if not hasattr(close, "columns"):
+        close = close.to_frame(tickers[0])
+    missing = [ticker for ticker in tickers if ticker not in close.columns or close[ticker].isna().all()]
+    if missing:
+        logger.warning(f"No price history for: {', '.join(missing)}")
+    return close.dropna(axis=1, how="all")
+
+
+def load_sentiment(
+    tickers: Iterable[str],
+    report_store: Optional['ReportStore'] = None,
+    archive: Optional['NewsArchive'] = None
+) -> 'pd.DataFrame':
+    """
+    Historical daily sentiment (date x ticker) from stored runs
+
+    Archived articles give the average sentiment per publish day. Where a stored
+    report exists for that ticker and day, its sentiment score wins, because it is
+    the value the report rules actually saw.
+    """
+    import pandas as pd
+
+    columns = {}
+    for ticker in tickers:
+        daily: Dict[str, float] = {}
+        if archive is not None:
+            for row in archive.sentiment_summary(ticker=ticker, by_day=True):
+                if row["average_score"] is not None:
+                    daily[row["date"]] = row["average_score"]
+        if report_store is not None:
+            for row in report_store.time_series(ticker=ticker, metrics=("sentiment_score",)):
+                if row["sentiment_score"] is not None:
+                    daily[row["created_at"][:10]] = row["sentiment_score"]
+        if daily:
+            columns[ticker] = daily
+
+    if not columns:
+        return pd.DataFrame()
+    frame = pd.DataFrame(columns)
+    frame.index = pd.to_datetime(frame.index)
+    return frame.sort_index()
+
+
+def format_results(results: Dict[str, Any]) -> List[str]:
+    """Plain-text table of a backtest result"""
+    lines = [
+        f"{results['tickers']} tickers x {results['bars']} bars ({results['start']} .. {results['end']}), "
+        f"sentiment for {results['sentiment_tickers']} tickers, computed in {results['elapsed_seconds']}s",
+        "",
+        f"{'rule':<14}{'horizon':>8}{'signals':>10}{'hit rate':>10}{'avg ret':>10}{'long':>10}{'short':>10}"
+    ]
+
+    def pct(value):
+        return f"{value * 100:.2f}%" if value is not None else "-"
+
+    for rule, result in results["rules"].items():
+        for horizon, stats in result["horizons"].items():
+            lines.append(
+                f"{rule:<14}{horizon + 'd':>8}{stats['signals']:>10}{pct(stats['hit_rate']):>10}"
+                f"{pct(stats['average_return']):>10}{pct(stats['average_long_return']):>10}"
+                f"{pct(stats['average_short_return']):>10}"
+            )
+    lines.append("")
+    lines.append(f"{'rule':<14}{'total':>10}{'annual':>10}{'sharpe':>8}{'max dd':>10}")
+    for rule, result in results["rules"].items():
+        portfolio = result["portfolio"]
+        sharpe = f"{portfolio['sharpe']:.2f}" if portfolio.get("sharpe") is not None else "-"
+        lines.append(
+            f"{rule:<14}{pct(portfolio['total_return']):>10}{pct(portfolio['annualized_return']):>10}"
+            f"{sharpe:>8}{pct(portfolio['max_drawdown']):>10}"
+        )
+    baseline = ", ".join(f"{h}d {pct(v)}" for h, v in results["baseline_average_return"].items())
+    lines.append(f"\nBuy-and-hold average return: {baseline}")
+    return lines
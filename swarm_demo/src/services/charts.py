@@ -0,0 +1,211 @@
+"""
+Report chart rendering in a process pool with a content-addressed file cache.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Any, Callable, List, Optional, Sequence
+from xml.sax.saxutils import escape
+
+logger = logging.getLogger(__name__)
+
+WIDTH = 800
+HEIGHT = 400
+MARGIN = {"top": 40, "right": 20, "bottom": 40, "left": 60}
+PALETTE = ("#1f77b4", "#ff7f0e", "#2ca02c", "#d62728")
+SENTIMENT_COLORS = {"Negative": "#d62728", "Neutral": "#7f7f7f", "Positive": "#2ca02c"}
+
+
+def _svg(width: int, height: int, title: str, body: List[str]) -> str:
+    return "\n".join([
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+        f'viewBox="0 0 {width} {height}" font-family="sans-serif" font-size="11">',
+        f'<rect width="{width}" height="{height}" fill="white"/>',
+        f'<text x="{width / 2:.1f}" y="22" text-anchor="middle" font-size="15">{escape(title)}</text>',
+        *body,
+        "</svg>"
+    ])
+
+
+def _moving_average(values: Sequence[float], window: int) -> List[Optional[float]]:
+    averages, total = [], 0.0
+    for i, value in enumerate(values):
+        total += value
+        if i >= window:
+            total -= values[i - window]
+        averages.append(total / window if i >= window - 1 else None)
+    return averages
+
+
+def _polyline(points: List[tuple], color: str, dashed: bool = False) -> str:
+    coordinates = " ".join(f"{x:.1f},{y:.1f}" for x, y in points)
+    dash = ' stroke-dasharray="6 4"' if dashed else ""
+    return f'<polyline points="{coordinates}" fill="none" stroke="{color}" stroke-width="1.5"{dash}/>'
+
+
+def render_price_chart(series: Dict[str, Any], spec: Dict[str, Any]) -> str:
+    """Close prices with simple moving average overlays"""
+    dates, close = series["dates"], [float(value) for value in series["close"]]
+    width, height = spec.get("width", WIDTH), spec.get("height", HEIGHT)
+    left, top = MARGIN["left"], MARGIN["top"]
+    plot_width = width - MARGIN["left"] - MARGIN["right"]
+    plot_height = height - MARGIN["top"] - MARGIN["bottom"]
+
+    lines = [("Close", close, False)]
+    for window in spec.get("sma", ()):
+        lines.append((f"SMA{window}", _moving_average(close, window), True))
+
+    values = [value for _, line, _ in lines for value in line if value is not None]
+    low, high = min(values), max(values)
+    if high == low:
+        low, high = low - 1, high + 1
+    step = plot_width / max(1, len(close) - 1)
+
+    def x(i: int) -> float:
+        return left + i * step
+
+    def y(value: float) -> float:
+        return top + (high - value) / (high - low) * plot_height
+
+    body = [
+        f'<line x1="{left}" y1="{top + plot_height}" x2="{left + plot_width}" y2="{top + plot_height}" stroke="#333"/>',
+        f'<line x1="{left}" y1="{top}" x2="{left}" y2="{top + plot_height}" stroke="#333"/>'
+    ]
+    for tick in range(5):
+        value = low + (high - low) * tick / 4
+        body.append(f'<line x1="{left}" y1="{y(value):.1f}" x2="{left + plot_width}" y2="{y(value):.1f}" stroke="#eee"/>')
+        body.append(f'<text x="{left - 6}" y="{y(value) + 4:.1f}" text-anchor="end">{value:.2f}</text>')
+    for i in sorted({0, len(dates) // 2, len(dates) - 1}):
+        body.append(f'<text x="{x(i):.1f}" y="{top + plot_height + 16}" text-anchor="middle">{escape(str(dates[i])[:10])}</text>')
+
+    for index, (label, line, dashed) in enumerate(lines):
+        color = PALETTE[index % len(PALETTE)]
+        points = [(x(i), y(value)) for i, value in enumerate(line) if value is not None]
+        if len(points) > 1:
+            body.append(_polyline(points, color, dashed))
+        legend_x = left + 10 + index * 90
+        body.append(f'<line x1="{legend_x}" y1="{top + 8}" x2="{legend_x + 20}" y2="{top + 8}" stroke="{color}" stroke-width="2"/>')
+        body.append(f'<text x="{legend_x + 24}" y="{top + 12}">{escape(label)}</text>')
+    return _svg(width, height, spec.get("title", "Price"), body)
+
+
+def render_sentiment_histogram(series: Dict[str, Any], spec: Dict[str, Any]) -> str:
+    """Distribution of per-article sentiment scores over [-1, 1]"""
+    scores = [float(score) for score in series["scores"]]
+    bins = spec.get("bins", 10)
+    width, height = spec.get("width", WIDTH), spec.get("height", HEIGHT)
+    left, top = MARGIN["left"], MARGIN["top"]
+    plot_width = width - MARGIN["left"] - MARGIN["right"]
+    plot_height = height - MARGIN["top"] - MARGIN["bottom"]
+
+    counts = [0] * bins
+    for score in scores:
+        counts[min(bins - 1, max(0, int((score + 1) / 2 * bins)))] += 1
+    peak = max(counts) or 1
+    bar_width = plot_width / bins
+
+    body = [f'<line x1="{left}" y1="{top + plot_height}" x2="{left + plot_width}" y2="{top + plot_height}" stroke="#333"/>']
+    for i, count in enumerate(counts):
+        middle = -1 + (2 * i + 1) / bins
+        label = "Positive" if middle > 0 else "Negative" if middle < 0 else "Neutral"
+        bar_height = count / peak * plot_height
+        bar_x = left + i * bar_width
+        body.append(
+            f'<rect x="{bar_x + 1:.1f}" y="{top + plot_height - bar_height:.1f}" width="{bar_width - 2:.1f}" '
+            f'height="{bar_height:.1f}" fill="{SENTIMENT_COLORS[label]}"/>'
+        )
+        if count:
+            body.append(f'<text x="{bar_x + bar_width / 2:.1f}" y="{top + plot_height - bar_height - 4:.1f}" '
+                        f'text-anchor="middle">{count}</text>')
+    for value in (-1, -0.5, 0, 0.5, 1):
+        tick_x = left + (value + 1) / 2 * plot_width
+        body.append(f'<text x="{tick_x:.1f}" y="{top + plot_height + 16}" text-anchor="middle">{value:g}</text>')
+    body.append(f'<text x="{left + plot_width}" y="{top + 12}" text-anchor="end">{len(scores)} articles</text>')
+    return _svg(width, height, spec.get("title", "Sentiment distribution"), body)
+
+
+RENDERERS: Dict[str, Callable[[Dict[str, Any], Dict[str, Any]], str]] = {
+    "price_sma": render_price_chart,
+    "sentiment_histogram": render_sentiment_histogram
+}
+
+
+def chart_key(kind: str, series: Dict[str, Any], spec: Dict[str, Any]) -> str:
+    """Hash of the chart kind, input series and spec; identical inputs render to the same file"""
+    payload = json.dumps({"kind": kind, "series": series, "spec": spec}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def render_to_file(kind: str, series: Dict[str, Any], spec: Dict[str, Any], path: str) -> str:
+    """Render one chart and write it atomically (runs in a pool process)"""
+    svg = RENDERERS[kind](series, spec)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(svg)
+    os.replace(tmp_path, path)
+    return path
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool(max_workers: int = 2) -> ProcessPoolExecutor:
+    """Process pool shared by all renderers in this process, started on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=max_workers)
+        return _pool
+
+
+def shutdown_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True)
+            _pool = None
+
+
+class ChartRenderer:
+    """
+    Renders report charts off the event loop
+
+    Charts are SVG files named by ``chart_key`` in ``output_dir``. A chart whose
+    file already exists is not rendered again, and concurrent requests for the
+    same chart share one render.
+    """
+
+    def __init__(self, output_dir: str = "reports/charts", max_workers: int = 2):
+        self.output_dir = Path(output_dir)
+        self.max_workers = max_workers
+        self._pending: Dict[str, asyncio.Future] = {}
+
+    async def render(self, kind: str, series: Dict[str, Any], spec: Dict[str, Any]) -> Dict[str, Any]:
+        """Render a chart (or reuse the cached file); returns its type, title, path and cache status"""
+        if kind not in RENDERERS:
+            raise ValueError(f"Unknown chart kind: {kind}")
+        key = chart_key(kind, series, spec)
+        path = self.output_dir / f"{kind}-{key[:16]}.svg"
+        chart = {"type": kind, "title": spec.get("title"), "path": str(path), "format": "svg"}
+        if path.exists():
+            return {**chart, "cached": True}
+
+        pending = self._pending.get(key)
+        if pending is None:
+            self.output_dir.mkdir(parents=True, exist_ok=True)
+            loop = asyncio.get_running_loop()
+            pending = asyncio.ensure_future(loop.run_in_executor(
+                get_pool(self.max_workers), render_to_file, kind, series, spec, str(path)
+            ))
+            self._pending[key] = pending
+            pending.add_done_callback(lambda _: self._pending.pop(key, None))
+            await pending
+            return {**chart, "cached": False}
+        await pending
+        return {**chart, "cached": True}
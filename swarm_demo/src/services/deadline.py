@@ -0,0 +1,106 @@
+"""
+Per-analysis deadlines propagated to agent actions and upstream calls.
+"""
+import asyncio
+import contextvars
+import time
+from contextlib import contextmanager
+from typing import Awaitable, Iterator, Optional, TypeVar
+
+T = TypeVar("T")
+
+# Absolute time.monotonic() at which the current analysis must stop; None means no deadline
+_expires: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("analysis_deadline", default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    """The analysis deadline passed before the operation finished"""
+
+
+@contextmanager
+def scope(seconds: Optional[float]) -> Iterator[Optional[float]]:
+    """
+    Run the block (and the tasks it creates) under a deadline ``seconds`` from now
+
+    A nested scope can only shorten an outer deadline. ``None`` or a value <= 0 adds
+    no deadline. Yields the absolute expiry time (or None).
+    """
+    expires = time.monotonic() + seconds if seconds and seconds > 0 else None
+    with bind(expires) as bound:
+        yield bound
+
+
+@contextmanager
+def bind(expires: Optional[float]) -> Iterator[Optional[float]]:
+    """
+    Run the block under an absolute expiry time
+
+    Used where the context does not flow on its own, e.g. in executor threads that
+    AutoGen starts for LLM calls.
+    """
+    current = _expires.get()
+    if current is not None and (expires is None or current < expires):
+        expires = current
+    token = _expires.set(expires)
+    try:
+        yield expires
+    finally:
+        _expires.reset(token)
+
+
+def expires_at() -> Optional[float]:
+    """Absolute expiry time of the current deadline, if any"""
+    return _expires.get()
+
+
+def remaining() -> Optional[float]:
+    """Seconds left before the deadline (None without a deadline)"""
+    expires = _expires.get()
+    return None if expires is None else max(0.0, expires - time.monotonic())
+
+
+def timeout(default: Optional[float] = None) -> Optional[float]:
+    """
+    Timeout for one upstream call: the smaller of ``default`` and the time left
+
+    Raises DeadlineExceeded when the deadline has already passed, so no new request
+    is started after it.
+    """
+    left = remaining()
+    if left is None:
+        return default
+    if left <= 0:
+        raise DeadlineExceeded("Analysis deadline exceeded")
+    return left if default is None else min(default, left)
+
+
+async def _wait(future: Awaitable[T]) -> T:
+    return await future
+
+
+async def within(awaitable: Awaitable[T], default: Optional[float] = None) -> T:
+    """
+    Await under the current deadline (and ``default`` seconds, if given)
+
+    The awaitable is cancelled when the time runs out. Hitting the deadline raises
+    DeadlineExceeded. Hitting only ``default`` raises asyncio.TimeoutError.
+    """
+    try:
+        limit = timeout(default)
+    except DeadlineExceeded:
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()
+        elif isinstance(awaitable, asyncio.Future):
+            awaitable.cancel()
+        raise
+    if limit is None:
+        return await awaitable
+    if asyncio.isfuture(awaitable):
+        # Awaited from a task so that the outcome of a cancelled gather() is retrieved
+        awaitable = _wait(awaitable)
+    try:
+        return await asyncio.wait_for(awaitable, limit)
+    except asyncio.TimeoutError:
+        if remaining() == 0:
+            raise DeadlineExceeded("Analysis deadline exceeded") from None
+        raise
@@ -0,0 +1,224 @@
+"""
+Online clustering of news articles into distinct events.
+"""
+import math
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, Any, List, Optional, Set, Tuple
+
+from .text_utils import tokenize, article_text, feature_index
+
+_MASK64 = (1 << 64) - 1
+
+# A single article only counts as an event on its own when its sentiment is this strong
+SIGNIFICANT_SENTIMENT = 0.5
+
+
+def _splitmix64(value: int) -> int:
+    z = (value + 0x9E3779B97F4A7C15) & _MASK64
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return z ^ (z >> 31)
+
+
+@lru_cache(maxsize=1 << 16)
+def _hyperplane_signs(feature: int, bits: int) -> int:
+    """Signs of one feature on ``bits`` random hyperplanes, as the bits of an int (64-bit splitmix64 lanes)"""
+    signs = 0
+    for lane in range((bits + 63) // 64):
+        signs |= _splitmix64(feature * 64 + lane) << (64 * lane)
+    return signs
+
+
+def projections(vector: Dict[int, float], bits: int) -> List[float]:
+    """Projections of a sparse vector on ``bits`` random hyperplanes (±1 entries)"""
+    totals = [0.0] * bits
+    for feature, weight in vector.items():
+        signs = _hyperplane_signs(feature, bits)
+        for bit in range(bits):
+            totals[bit] += weight if (signs >> bit) & 1 else -weight
+    return totals
+
+
+def simhash(totals: List[float]) -> int:
+    """Random-hyperplane signature from projections (bit set where the projection is positive)"""
+    signature = 0
+    for bit, total in enumerate(totals):
+        if total > 0:
+            signature |= 1 << bit
+    return signature
+
+
+class EventCluster:
+    """One event: the running centroid of its member vectors plus per-member metadata"""
+
+    __slots__ = ("centroid", "norm_sq", "projections", "keys", "members", "terms")
+
+    def __init__(self, bits: int):
+        self.centroid: Dict[int, float] = {}
+        self.norm_sq = 0.0
+        # Hyperplane projections of the centroid (projection is linear, so member projections just add up)
+        self.projections = [0.0] * bits
+        self.keys: List[Tuple[int, int]] = []
+        self.members: List[Tuple[Dict[int, float], Dict[str, Any]]] = []
+        self.terms: Counter = Counter()
+
+    def similarity(self, vector: Dict[int, float]) -> float:
+        """Cosine similarity between a unit vector and the centroid"""
+        if not self.norm_sq:
+            return 0.0
+        centroid = self.centroid
+        return sum(weight * centroid.get(feature, 0.0) for feature, weight in vector.items()) / math.sqrt(self.norm_sq)
+
+    def add(self, vector: Dict[int, float], projected: List[float], tokens: List[str], article: Dict[str, Any]) -> None:
+        centroid = self.centroid
+        dot = sum(weight * centroid.get(feature, 0.0) for feature, weight in vector.items())
+        for feature, weight in vector.items():
+            centroid[feature] = centroid.get(feature, 0.0) + weight
+        # |c + v|^2 = |c|^2 + 2 c.v + |v|^2 with |v| = 1
+        self.norm_sq += 2 * dot + 1.0
+        self.projections = [total + value for total, value in zip(self.projections, projected)]
+        self.members.append((vector, article))
+        self.terms.update(set(tokens))
+
+
+class EventDetector:
+    """
+    Incremental event clustering over hashed TF-IDF vectors
+
+    Each article becomes a unit TF-IDF vector in a hashed feature space. Document
+    frequencies are updated as articles arrive, so no corpus pass is needed. The
+    article joins the most similar existing cluster when the cosine similarity to
+    that cluster's centroid reaches ``threshold``; otherwise it starts a new cluster.
+    Candidate clusters come from an LSH index instead of comparing against every
+    cluster. Each cluster is indexed by the random-hyperplane signature of its
+    centroid, split into ``bands`` bands of ``rows`` bits; a cluster is a candidate
+    when any band matches. With 16-bit bands the 65,536 buckets per band stay
+    nearly empty, so a lookup touches O(bands * probes) mostly empty buckets rather
+    than a fixed fraction of all clusters. To recover recall, each band is also
+    probed with each of its ``probes`` least certain bits (smallest projections)
+    flipped.
+    """
+
+    def __init__(self, threshold: float = 0.3, bands: int = 16, rows: int = 16, probes: int = 2):
+        if bands < 1 or rows < 1 or not 0 <= probes <= rows:
+            raise ValueError("bands and rows must be positive and probes between 0 and rows")
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = rows
+        self.probes = probes
+        self.documents = 0
+        self.document_frequency: Dict[int, int] = {}
+        self.clusters: List[EventCluster] = []
+        self.buckets: Dict[Tuple[int, int], Set[int]] = {}
+        self.comparisons = 0
+
+    def _vectorize(self, tokens: List[str]) -> Dict[int, float]:
+        counts: Dict[int, int] = {}
+        for token in tokens:
+            index = feature_index(token)
+            counts[index] = counts.get(index, 0) + 1
+
+        self.documents += 1
+        frequency = self.document_frequency
+        for index in counts:
+            frequency[index] = frequency.get(index, 0) + 1
+
+        documents = self.documents
+        vector = {
+            index: (1.0 + math.log(count)) * (math.log((1 + documents) / (1 + frequency[index])) + 1.0)
+            for index, count in counts.items()
+        }
+        norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+        return {index: weight / norm for index, weight in vector.items()} if norm else {}
+
+    def _band_keys(self, signature: int) -> List[Tuple[int, int]]:
+        mask = (1 << self.rows) - 1
+        return [(band, (signature >> (band * self.rows)) & mask) for band in range(self.bands)]
+
+    def _probe_keys(self, projected: List[float]) -> List[Tuple[int, int]]:
+        """Band keys of the signature plus, per band, the keys with each of its ``probes`` least certain bits flipped"""
+        rows = self.rows
+        keys = []
+        for band, value in self._band_keys(simhash(projected)):
+            keys.append((band, value))
+            offset = band * rows
+            uncertain = sorted(range(rows), key=lambda row: abs(projected[offset + row]))[:self.probes]
+            keys.extend((band, value ^ (1 << row)) for row in uncertain)
+        return keys
+
+    def add(self, article: Dict[str, Any]) -> Optional[int]:
+        """Assign one article (dict or ArticleView) to an event; returns the cluster index"""
+        tokens = tokenize(article_text(article))
+        vector = self._vectorize(tokens)
+        if not vector:
+            return None
+
+        projected = projections(vector, self.bands * self.rows)
+        candidates: Set[int] = set()
+        for key in self._probe_keys(projected):
+            candidates.update(self.buckets.get(key, ()))
+
+        best, best_similarity = None, self.threshold
+        for cluster_id in candidates:
+            self.comparisons += 1
+            similarity = self.clusters[cluster_id].similarity(vector)
+            if similarity >= best_similarity:
+                best, best_similarity = cluster_id, similarity
+
+        if best is None:
+            best = len(self.clusters)
+            self.clusters.append(EventCluster(self.bands * self.rows))
+        cluster = self.clusters[best]
+        cluster.add(vector, projected, tokens, {
+            "title": article.get("title"),
+            "source": article.get("source"),
+            "link": article.get("link"),
+            "published": article.get("published"),
+            "sentiment_score": article.get("sentiment_score")
+        })
+
+        # Re-index the cluster under its moved centroid
+        keys = self._band_keys(simhash(cluster.projections))
+        for key in set(cluster.keys) - set(keys):
+            self.buckets[key].discard(best)
+        for key in keys:
+            self.buckets.setdefault(key, set()).add(best)
+        cluster.keys = keys
+        return best
+
+    def add_batch(self, articles) -> None:
+        for article in articles:
+            self.add(article)
+
+    def events(self, min_size: int = 2, limit: Optional[int] = 20) -> List[Dict[str, Any]]:
+        """
+        Event summaries, largest first
+
+        Clusters smaller than ``min_size`` are only reported when their sentiment is
+        significant (|score| > SIGNIFICANT_SENTIMENT).
+        """
+        events = []
+        for cluster in self.clusters:
+            scores = [a["sentiment_score"] for _, a in cluster.members if a["sentiment_score"] is not None]
+            average = sum(scores) / len(scores) if scores else 0.0
+            if len(cluster.members) < min_size and abs(average) <= SIGNIFICANT_SENTIMENT:
+                continue
+
+            ranked = sorted(cluster.members, key=lambda member: cluster.similarity(member[0]), reverse=True)
+            representative = ranked[0][1]
+            events.append({
+                "type": "News Event",
+                "title": representative["title"],
+                "link": representative["link"],
+                "size": len(cluster.members),
+                "related_titles": [a["title"] for _, a in ranked[1:4]],
+                "sources": sorted({a["source"] for _, a in cluster.members if a["source"]}),
+                "keywords": [term for term, _ in cluster.terms.most_common(5)],
+                "average_sentiment": average,
+                "sentiment": "Positive" if average > 0 else "Negative" if average < 0 else "Neutral",
+                "score": average
+            })
+
+        events.sort(key=lambda event: (event["size"], abs(event["average_sentiment"])), reverse=True)
+        return events[:limit] if limit is not None else events
@@ -0,0 +1,115 @@
+"""
+Streaming technical indicators updated in O(1) per new observation.
+"""
+from collections import deque
+from typing import Deque, Optional, Tuple
+
+
+class RollingMean:
+    """Simple moving average over a fixed window, maintained with a running sum"""
+
+    def __init__(self, window: int):
+        self.window = window
+        self._values: Deque[float] = deque()
+        self._sum = 0.0
+
+    def update(self, value: float) -> Optional[float]:
+        """Add an observation and return the mean, or None until the window is full"""
+        self._values.append(value)
+        self._sum += value
+        if len(self._values) > self.window:
+            self._sum -= self._values.popleft()
+        return self.value
+
+    @property
+    def value(self) -> Optional[float]:
+        if len(self._values) < self.window:
+            return None
+        return self._sum / self.window
+
+    @property
+    def count(self) -> int:
+        return len(self._values)
+
+
+class EMA:
+    """Exponential moving average seeded with the SMA of the first ``span`` values"""
+
+    def __init__(self, span: int):
+        self.span = span
+        self.alpha = 2.0 / (span + 1)
+        self._seed = RollingMean(span)
+        self.value: Optional[float] = None
+
+    def update(self, value: float) -> Optional[float]:
+        if self.value is None:
+            self.value = self._seed.update(value)
+        else:
+            self.value += self.alpha * (value - self.value)
+        return self.value
+
+
+class WilderRSI:
+    """Relative Strength Index with Wilder smoothing"""
+
+    def __init__(self, period: int = 14):
+        self.period = period
+        self._previous: Optional[float] = None
+        self._gains = RollingMean(period)
+        self._losses = RollingMean(period)
+        self._avg_gain: Optional[float] = None
+        self._avg_loss: Optional[float] = None
+
+    def update(self, close: float) -> Optional[float]:
+        if self._previous is None:
+            self._previous = close
+            return None
+
+        change = close - self._previous
+        self._previous = close
+        gain, loss = max(change, 0.0), max(-change, 0.0)
+
+        if self._avg_gain is None:
+            # Seed with the simple average of the first ``period`` changes
+            self._avg_gain = self._gains.update(gain)
+            self._avg_loss = self._losses.update(loss)
+        else:
+            self._avg_gain = (self._avg_gain * (self.period - 1) + gain) / self.period
+            self._avg_loss = (self._avg_loss * (self.period - 1) + loss) / self.period
+        return self.value
+
+    @property
+    def value(self) -> Optional[float]:
+        if self._avg_gain is None or self._avg_loss is None:
+            return None
+        if self._avg_loss == 0:
+            return 100.0
+        return 100.0 - 100.0 / (1.0 + self._avg_gain / self._avg_loss)
+
+
+class MACD:
+    """Moving Average Convergence Divergence built from streaming EMAs"""
+
+    def __init__(self, fast: int = 12, slow: int = 26, signal: int = 9):
+        self._fast = EMA(fast)
+        self._slow = EMA(slow)
+        self._signal = EMA(signal)
+        self.macd: Optional[float] = None
+        self.signal: Optional[float] = None
+
+    def update(self, close: float) -> Tuple[Optional[float], Optional[float], Optional[float]]:
+        """Return (macd, signal, histogram); values are None while warming up"""
+        fast = self._fast.update(close)
+        slow = self._slow.update(close)
+        if fast is None or slow is None:
+            return None, None, None
+
+        self.macd = fast - slow
+        self.signal = self._signal.update(self.macd)
+        return self.macd, self.signal, self.histogram
+
+    @property
+    def histogram(self) -> Optional[float]:
+        if self.macd is None or self.signal is None:
+            return None
+        return self.macd - self.signal
@@ -1,87 +1,240 @@
 """
 Market data processing service.
 """
-import yfinance as yf
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Tuple, TYPE_CHECKING
+import asyncio
 import logging
+import threading
 from datetime import datetime
+from .article_batch import ArticleBatch
+from . import deadline
+
+if TYPE_CHECKING:
+    import pandas as pd
+    import yfinance as yf
 
 logger = logging.getLogger(__name__)
 
 class MarketService:
     """Service for processing market data"""
     
+    # Bars retained per ticker; SMA50 needs at least 50
+    HISTORY_BARS = 60
+    # Bars used for the "Price Trend" change (about one month of trading days)
+    TREND_WINDOW = 21
+    # Moving averages compared by the "SMA Crossover" trend
+    SMA_FAST = 20
+    SMA_SLOW = 50
+
+    # Connections kept alive per host in the shared session
+    POOL_SIZE = 10
+    # Timeout of one history download (seconds), shortened to the analysis deadline
+    HTTP_TIMEOUT = 10
+    
+    _session = None
+    _session_lock = threading.Lock()
+
     @staticmethod
-    def get_stock_data(ticker: str) -> Dict[str, Any]:
-        """Get stock market data from Yahoo Finance"""
+    def get_session():
+        """
+        HTTP session shared by every Yahoo request
+
+        Reusing one session keeps connections alive and lets yfinance negotiate the
+        cookie/crumb pair once instead of once per ``yf.Ticker``.
+        """
+        with MarketService._session_lock:
+            if MarketService._session is None:
+                try:
+                    # Newer yfinance releases only accept curl_cffi sessions
+                    from curl_cffi import requests as curl_requests
+                    MarketService._session = curl_requests.Session(impersonate="chrome")
+                except ImportError:
+                    import requests
+                    from requests.adapters import HTTPAdapter
+
+                    session = requests.Session()
+                    adapter = HTTPAdapter(
+                        pool_connections=MarketService.POOL_SIZE,
+                        pool_maxsize=MarketService.POOL_SIZE
+                    )
+                    session.mount("https://", adapter)
+                    session.mount("http://", adapter)
+                    MarketService._session = session
+            return MarketService._session
+
+    @staticmethod
+    def get_ticker(ticker: str) -> 'yf.Ticker':
+        """
+        ``yf.Ticker`` bound to the shared session
+
+        A new object is built per fetch because yfinance memoizes ``info`` and ``news``
+        on the instance, which would serve stale data to a long-running process.
+        """
+        import yfinance as yf
+
+        return yf.Ticker(ticker, session=MarketService.get_session())
+
+    @staticmethod
+    async def fetch_ticker_data(
+        ticker: str,
+        cached_bars: Optional[Dict[str, List[Any]]] = None,
+        news_limit: int = 0
+    ) -> Dict[str, Any]:
+        """
+        Fetch info, history and (optionally) news for one ticker concurrently
+
+        All three requests share one ``yf.Ticker`` on the pooled session and run in
+        worker threads that see the analysis deadline. Waiting stops at the deadline.
+        The result is the ``get_stock_data`` payload plus a ``news`` ArticleBatch when
+        ``news_limit`` > 0.
+        """
         try:
-            stock = yf.Ticker(ticker)
+            stock = MarketService.get_ticker(ticker)
+            pending = [
+                asyncio.to_thread(lambda: stock.info),
+                asyncio.to_thread(MarketService._fetch_history, stock, cached_bars)
+            ]
+            if news_limit > 0:
+                pending.append(asyncio.to_thread(MarketService.process_stock_news, stock, news_limit))
             
-            # Get stock information
-            info = stock.info
+            info, (hist, new_bars), *news = await deadline.within(asyncio.gather(*pending))
             
-            # Get historical data
-            hist = stock.history(period="1mo")
+            result = MarketService._build_stock_data(info, hist, new_bars)
+            if news_limit > 0:
+                result["news"] = news[0]
+            return result
             
-            # Calculate technical indicators
-            sma_20 = hist['Close'].rolling(window=20).mean().iloc[-1]
-            sma_50 = hist['Close'].rolling(window=50).mean().iloc[-1]
+        except Exception as e:
+            logger.error(f"Error fetching data for {ticker}: {str(e)}")
+            raise
+
+    @staticmethod
+    def get_stock_data(ticker: str, cached_bars: Optional[Dict[str, List[Any]]] = None) -> Dict[str, Any]:
+        """
+        Get stock market data from Yahoo Finance
+
+        ``cached_bars`` is the ``price_history`` returned by a previous call. When given,
+        only bars from the last cached date onward are downloaded and merged in.
+        """
+        try:
+            stock = MarketService.get_ticker(ticker)
             
-            # Calculate price change
-            current_price = hist['Close'].iloc[-1]
-            price_change = ((current_price - hist['Close'].iloc[0]) / hist['Close'].iloc[0]) * 100
+            # Get stock information
+            info = stock.info
             
-            # Process market trends
-            trends = [
-                {
-                    "indicator": "Price Trend",
-                    "value": "Bullish" if price_change > 0 else "Bearish",
-                    "change": f"{price_change:.2f}%"
-                },
-                {
-                    "indicator": "SMA Crossover",
-                    "value": "Bullish" if sma_20 > sma_50 else "Bearish",
-                    "details": f"SMA20: {sma_20:.2f}, SMA50: {sma_50:.2f}"
-                }
-            ]
+            # Get historical data
+            hist, new_bars = MarketService._fetch_history(stock, cached_bars)
             
-            return {
-                "market_data": {
-                    "current_price": current_price,
-                    "volume": hist['Volume'].iloc[-1],
-                    "market_cap": info.get('marketCap'),
-                    "pe_ratio": info.get('forwardPE'),
-                    "dividend_yield": info.get('dividendYield')
-                },
-                "trends": trends,
-                "technical_indicators": {
-                    "sma20": sma_20,
-                    "sma50": sma_50
-                }
-            }
+            return MarketService._build_stock_data(info, hist, new_bars)
             
         except Exception as e:
             logger.error(f"Error getting stock data: {str(e)}")
             raise
 
     @staticmethod
-    def process_stock_news(stock: yf.Ticker) -> List[Dict[str, Any]]:
-        """Process news data from Yahoo Finance"""
+    def _fetch_history(stock: 'yf.Ticker', cached_bars: Optional[Dict[str, List[Any]]]) -> Tuple['pd.DataFrame', int]:
+        """Download bars (only those after the cache when given) and count the new ones"""
+        import pandas as pd
+
+        if cached_bars and cached_bars.get("dates"):
+            # The last cached bar is re-fetched since it may have been captured intraday
+            fresh = stock.history(start=cached_bars["dates"][-1][:10],
+                                  timeout=deadline.timeout(MarketService.HTTP_TIMEOUT))
+            hist = MarketService._merge_bars(cached_bars, fresh)
+            last_cached = pd.Timestamp(cached_bars["dates"][-1]).tz_convert("UTC")
+            new_bars = int((hist.index > last_cached).sum())
+        else:
+            hist = MarketService._to_utc(stock.history(period="3mo", timeout=deadline.timeout(MarketService.HTTP_TIMEOUT)))
+            new_bars = len(hist)
+        return hist.tail(MarketService.HISTORY_BARS), new_bars
+
+    @staticmethod
+    def _build_stock_data(info: Dict[str, Any], hist: 'pd.DataFrame', new_bars: int) -> Dict[str, Any]:
+        """Compute indicators and trends from downloaded info and bars"""
+        # Calculate technical indicators
+        sma_20 = hist['Close'].rolling(window=MarketService.SMA_FAST).mean().iloc[-1]
+        sma_50 = hist['Close'].rolling(window=MarketService.SMA_SLOW).mean().iloc[-1]
+        
+        # Calculate price change
+        current_price = hist['Close'].iloc[-1]
+        base_price = hist['Close'].iloc[-min(len(hist), MarketService.TREND_WINDOW)]
+        price_change = ((current_price - base_price) / base_price) * 100
+        
+        # Process market trends
+        trends = [
+            {
+                "indicator": "Price Trend",
+                "value": "Bullish" if price_change > 0 else "Bearish",
+                "change": f"{price_change:.2f}%"
+            },
+            {
+                "indicator": "SMA Crossover",
+                "value": "Bullish" if sma_20 > sma_50 else "Bearish",
+                "details": f"SMA20: {sma_20:.2f}, SMA50: {sma_50:.2f}"
+            }
+        ]
+        
+        return {
+            "market_data": {
+                "current_price": current_price,
+                "volume": hist['Volume'].iloc[-1],
+                "market_cap": info.get('marketCap'),
+                "pe_ratio": info.get('forwardPE'),
+                "dividend_yield": info.get('dividendYield')
+            },
+            "trends": trends,
+            "technical_indicators": {
+                "sma20": sma_20,
+                "sma50": sma_50
+            },
+            "price_history": {
+                "dates": [ts.isoformat() for ts in hist.index],
+                "close": [float(v) for v in hist['Close']],
+                "volume": [float(v) for v in hist['Volume']]
+            },
+            "new_bars": new_bars
+        }
+
+    @staticmethod
+    def _merge_bars(cached_bars: Dict[str, List[Any]], fresh: 'pd.DataFrame') -> 'pd.DataFrame':
+        """Merge cached bars with freshly downloaded ones, preferring the fresh values"""
+        import pandas as pd
+
+        cached = pd.DataFrame(
+            {"Close": cached_bars["close"], "Volume": cached_bars["volume"]},
+            index=pd.to_datetime(cached_bars["dates"], utc=True)
+        )
+        if fresh.empty:
+            return cached
+
+        fresh = MarketService._to_utc(fresh)
+        return pd.concat([cached[cached.index < fresh.index[0]], fresh])
+
+    @staticmethod
+    def _to_utc(hist: 'pd.DataFrame') -> 'pd.DataFrame':
+        """Keep Close/Volume columns and normalize the index to UTC"""
+        hist = hist[["Close", "Volume"]].copy()
+        hist.index = hist.index.tz_convert("UTC") if hist.index.tz is not None else hist.index.tz_localize("UTC")
+        return hist
+
+    @staticmethod
+    def process_stock_news(stock: 'yf.Ticker', limit: int = 10) -> ArticleBatch:
+        """Process the latest ``limit`` news items from Yahoo Finance"""
         try:
-            news = stock.news
-            processed_news = []
+            news = stock.news or []
+            processed_news = ArticleBatch()
             
-            for article in news[:10]:  # Process latest 10 news items
-                processed_news.append({
-                    "title": article.get("title"),
-                    "publisher": article.get("publisher"),
-                    "link": article.get("link"),
-                    "published": article.get("providerPublishTime"),
-                    "type": article.get("type")
-                })
+            for article in news[:limit]:
+                processed_news.append(
+                    title=article.get("title"),
+                    source=article.get("publisher"),
+                    link=article.get("link"),
+                    published=article.get("providerPublishTime"),
+                    kind=article.get("type")
+                )
             
             return processed_news
             
         except Exception as e:
             logger.error(f"Error processing stock news: {str(e)}")
-            raise
\ No newline at end of file
+            raise
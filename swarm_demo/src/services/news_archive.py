@@ -0,0 +1,276 @@
+"""
+Persistent full-text archive of every fetched news article.
+"""
+import logging
+import re
+import sqlite3
+from contextlib import closing
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Union
+
+from .article_batch import ArticleBatch
+from .news_service import parse_published
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS articles (
+    id INTEGER PRIMARY KEY,
+    link TEXT UNIQUE,
+    title TEXT,
+    snippet TEXT,
+    source TEXT,
+    kind TEXT,
+    origin TEXT NOT NULL,
+    ticker TEXT,
+    published_at TEXT,
+    fetched_at TEXT NOT NULL,
+    sentiment_score REAL
+);
+CREATE INDEX IF NOT EXISTS idx_articles_ticker_published ON articles (ticker, published_at);
+CREATE INDEX IF NOT EXISTS idx_articles_published ON articles (published_at);
+CREATE TABLE IF NOT EXISTS article_queries (
+    query TEXT NOT NULL,
+    origin TEXT NOT NULL,
+    article_id INTEGER NOT NULL,
+    fetched_at TEXT NOT NULL,
+    PRIMARY KEY (query, origin, article_id)
+) WITHOUT ROWID;
+CREATE VIRTUAL TABLE IF NOT EXISTS articles_fts USING fts5(
+    title, snippet, content='articles', content_rowid='id', tokenize='porter unicode61'
+);
+CREATE TRIGGER IF NOT EXISTS articles_ai AFTER INSERT ON articles BEGIN
+    INSERT INTO articles_fts (rowid, title, snippet) VALUES (new.id, new.title, new.snippet);
+END;
+CREATE TRIGGER IF NOT EXISTS articles_ad AFTER DELETE ON articles BEGIN
+    INSERT INTO articles_fts (articles_fts, rowid, title, snippet) VALUES ('delete', old.id, old.title, old.snippet);
+END;
+CREATE TRIGGER IF NOT EXISTS articles_au AFTER UPDATE OF title, snippet ON articles BEGIN
+    INSERT INTO articles_fts (articles_fts, rowid, title, snippet) VALUES ('delete', old.id, old.title, old.snippet);
+    INSERT INTO articles_fts (rowid, title, snippet) VALUES (new.id, new.title, new.snippet);
+END;
+CREATE TABLE IF NOT EXISTS fetches (
+    origin TEXT NOT NULL,
+    key TEXT NOT NULL,
+    fetched_at TEXT NOT NULL,
+    articles INTEGER NOT NULL,
+    PRIMARY KEY (origin, key)
+);
+"""
+
+_UPSERT = """
+INSERT INTO articles (link, title, snippet, source, kind, origin, ticker, published_at, fetched_at, sentiment_score)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (link) DO UPDATE SET
+    fetched_at = excluded.fetched_at,
+    sentiment_score = COALESCE(excluded.sentiment_score, articles.sentiment_score),
+    ticker = COALESCE(articles.ticker, excluded.ticker),
+    published_at = COALESCE(articles.published_at, excluded.published_at)
+"""
+
+# An article stays linked to every query that returned it
+_LINK_QUERY = """
+INSERT OR REPLACE INTO article_queries (query, origin, article_id, fetched_at)
+SELECT ?, ?, id, ? FROM articles WHERE link = ?
+"""
+
+# Version 1 moved the single articles.query column into article_queries
+_SCHEMA_VERSION = 1
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+TimeBound = Union[datetime, str, None]
+
+
+def _published_at(value: Any) -> Optional[str]:
+    """Normalize Google date strings, Yahoo epoch seconds and datetimes to ISO UTC"""
+    if value is None or value == "":
+        return None
+    if isinstance(value, datetime):
+        parsed = value
+    elif isinstance(value, (int, float)):
+        parsed = datetime.utcfromtimestamp(value)
+    else:
+        parsed = parse_published(str(value))
+    return parsed.isoformat(timespec="seconds") if parsed else None
+
+
+def _bound(value: TimeBound) -> Optional[str]:
+    return value.isoformat(timespec="seconds") if isinstance(value, datetime) else value
+
+
+def _match_expression(text: str) -> Optional[str]:
+    """Quote every word so user text cannot inject FTS5 query syntax (words are ANDed)"""
+    words = _WORD.findall(text)
+    return " ".join(f'"{word}"' for word in words) if words else None
+
+
+class NewsArchive:
+    """SQLite FTS5 archive of news articles, searchable by text, ticker, origin and time range"""
+
+    def __init__(self, db_path: str = "data/news_archive.db"):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.executescript(_SCHEMA)
+            self._migrate(conn)
+
+    @staticmethod
+    def _migrate(conn: sqlite3.Connection) -> None:
+        """Upgrade an archive created by an older version of the schema"""
+        if conn.execute("PRAGMA user_version").fetchone()[0] >= _SCHEMA_VERSION:
+            return
+        with conn:
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(articles)")}
+            if "query" in columns:
+                conn.execute(
+                    "INSERT OR IGNORE INTO article_queries (query, origin, article_id, fetched_at) "
+                    "SELECT query, origin, id, fetched_at FROM articles WHERE query IS NOT NULL"
+                )
+                conn.execute("DROP INDEX IF EXISTS idx_articles_query")
+            # Empty fetches used to be recorded and would be served as fresh
+            conn.execute("DELETE FROM fetches WHERE articles = 0")
+            conn.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(str(self.db_path), timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def ingest(
+        self,
+        articles: ArticleBatch,
+        origin: str,
+        ticker: Optional[str] = None,
+        query: Optional[str] = None
+    ) -> int:
+        """
+        Upsert a batch of fetched articles and record the fetch
+
+        Articles are keyed by link. Re-ingesting one refreshes ``fetched_at`` and fills a
+        missing score, ticker or publish time; ``query`` is added to the queries the
+        article was found for. An empty batch is not recorded as a fetch, so it is never
+        served as fresh. Returns the number of articles written.
+        """
+        fetched_at = datetime.utcnow().isoformat(timespec="seconds")
+        rows = [
+            (
+                article["link"], article["title"], article["snippet"], article["source"], article["kind"],
+                origin, ticker, _published_at(article["published"]), fetched_at, article["sentiment_score"]
+            )
+            for article in articles
+        ]
+        if not rows:
+            return 0
+        with closing(self._connect()) as conn, conn:
+            conn.executemany(_UPSERT, rows)
+            if query is not None:
+                conn.executemany(_LINK_QUERY, [(query, origin, fetched_at, row[0]) for row in rows])
+            key = query if query is not None else ticker
+            if key is not None:
+                conn.execute(
+                    "INSERT OR REPLACE INTO fetches (origin, key, fetched_at, articles) VALUES (?, ?, ?, ?)",
+                    (origin, key, fetched_at, len(rows))
+                )
+        return len(rows)
+
+    def last_fetched(self, origin: str, key: str) -> Optional[datetime]:
+        """When articles for a query (or ticker) were last fetched from the network"""
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT fetched_at FROM fetches WHERE origin = ? AND key = ?", (origin, key)
+            ).fetchone()
+        return datetime.fromisoformat(row["fetched_at"]) if row else None
+
+    def is_fresh(self, origin: str, key: str, max_age_minutes: float) -> bool:
+        """Whether a fetch for this query (or ticker) is recent enough to serve from the archive"""
+        if max_age_minutes <= 0:
+            return False
+        fetched = self.last_fetched(origin, key)
+        return fetched is not None and datetime.utcnow() - fetched <= timedelta(minutes=max_age_minutes)
+
+    def search(
+        self,
+        text: Optional[str] = None,
+        ticker: Optional[str] = None,
+        origin: Optional[str] = None,
+        query: Optional[str] = None,
+        since: TimeBound = None,
+        until: TimeBound = None,
+        limit: int = 100
+    ) -> ArticleBatch:
+        """
+        Archived articles matching all given filters
+
+        ``text`` is a full-text match on title and snippet (results ranked by BM25);
+        otherwise the newest articles come first. ``query`` matches any search query
+        the articles were fetched for; ``since``/``until`` bound the publish time.
+        """
+        sql, params = self._select("a.link, a.title, a.snippet, a.source, a.kind, a.published_at, a.sentiment_score",
+                                   text, ticker, origin, query, since, until)
+        sql += " ORDER BY bm25(articles_fts)" if text and _match_expression(text) else " ORDER BY a.published_at DESC"
+        sql += " LIMIT ?"
+        params.append(limit)
+
+        batch = ArticleBatch()
+        with closing(self._connect()) as conn:
+            for row in conn.execute(sql, params):
+                batch.append(
+                    title=row["title"],
+                    source=row["source"],
+                    published=row["published_at"],
+                    snippet=row["snippet"],
+                    link=row["link"],
+                    sentiment_score=row["sentiment_score"],
+                    kind=row["kind"]
+                )
+        return batch
+
+    def sentiment_summary(
+        self,
+        text: Optional[str] = None,
+        ticker: Optional[str] = None,
+        origin: Optional[str] = None,
+        since: TimeBound = None,
+        until: TimeBound = None,
+        by_day: bool = False
+    ) -> Union[Dict[str, Any], List[Dict[str, Any]]]:
+        """Article count and sentiment of matching articles, overall or per publish day"""
+        columns = ("COUNT(*) AS articles, AVG(a.sentiment_score) AS average_score, "
+                   "SUM(a.sentiment_score > 0) AS positive, SUM(a.sentiment_score < 0) AS negative")
+        if by_day:
+            columns = "substr(a.published_at, 1, 10) AS date, " + columns
+        sql, params = self._select(columns, text, ticker, origin, None, since, until)
+        if by_day:
+            sql += " AND a.published_at IS NOT NULL GROUP BY date ORDER BY date"
+
+        with closing(self._connect()) as conn:
+            rows = [dict(row) for row in conn.execute(sql, params)]
+        return rows if by_day else rows[0]
+
+    def count(self) -> int:
+        with closing(self._connect()) as conn:
+            return conn.execute("SELECT COUNT(*) FROM articles").fetchone()[0]
+
+    @staticmethod
+    def _select(columns: str, text, ticker, origin, query, since, until):
+        match = _match_expression(text) if text else None
+        if match:
+            sql = f"SELECT {columns} FROM articles_fts JOIN articles a ON a.id = articles_fts.rowid WHERE articles_fts MATCH ?"
+            params: List[Any] = [match]
+        else:
+            sql = f"SELECT {columns} FROM articles a WHERE 1 = 1"
+            params = []
+        for clause, value in (
+            ("a.ticker = ?", ticker),
+            ("a.origin = ?", origin),
+            ("a.id IN (SELECT article_id FROM article_queries WHERE query = ?)", query),
+            ("a.published_at >= ?", _bound(since)),
+            ("a.published_at <= ?", _bound(until))
+        ):
+            if value is not None:
+                sql += f" AND {clause}"
+                params.append(value)
+        return sql, params
@@ -2,83 +2,314 @@
 News processing and sentiment analysis service.
 """
 import os
-from typing import Dict, Any, List
+import re
+import math
+import asyncio
+from typing import Dict, Any, List, Optional, Union, TYPE_CHECKING
 import logging
-from datetime import datetime
-from serpapi.google_search import GoogleSearch
-from textblob import TextBlob
+from datetime import datetime, timedelta, timezone
+from . import deadline
+from .article_batch import ArticleBatch
+from .event_detector import EventDetector
+from .topic_extractor import extract_topics
+
+if TYPE_CHECKING:
+    import aiohttp
 
 logger = logging.getLogger(__name__)
 
+SERPAPI_ENDPOINT = "https://serpapi.com/search.json"
+GOOGLE_NEWS_PAGE_SIZE = 10
+# Timeout of one SerpAPI request (seconds), shortened to the analysis deadline
+REQUEST_TIMEOUT = 30
+
+_RELATIVE_DATE = re.compile(r"(\d+)\s+(minute|min|hour|day|week|month|year)s?\s+ago", re.IGNORECASE)
+_RELATIVE_UNITS = {
+    "minute": timedelta(minutes=1),
+    "min": timedelta(minutes=1),
+    "hour": timedelta(hours=1),
+    "day": timedelta(days=1),
+    "week": timedelta(weeks=1),
+    "month": timedelta(days=30),
+    "year": timedelta(days=365)
+}
+
+
+def parse_published(value: Optional[str]) -> Optional[datetime]:
+    """Parse Google News dates ("3 hours ago", "Jan 5, 2024") into naive UTC datetimes"""
+    if not value:
+        return None
+    match = _RELATIVE_DATE.search(value)
+    if match:
+        return datetime.utcnow() - int(match.group(1)) * _RELATIVE_UNITS[match.group(2).lower()]
+    if value.strip().lower() == "yesterday":
+        return datetime.utcnow() - timedelta(days=1)
+    try:
+        from dateutil import parser as date_parser
+
+        parsed = date_parser.parse(value)
+    except (ValueError, OverflowError, ImportError):
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+class _GoogleNewsCollector:
+    """Accumulates scored articles from one or more pages of Google News results"""
+
+    def __init__(
+        self,
+        known_articles: Optional[Dict[str, Dict[str, Any]]] = None,
+        window_start: Optional[datetime] = None,
+        limit: Optional[int] = None
+    ):
+        self.known_articles = known_articles or {}
+        self.window_start = window_start
+        self.limit = limit
+        self.articles = ArticleBatch()
+        self.new_links: List[str] = []
+        self.sentiments: List[float] = []
+        self.events: List[Dict[str, Any]] = []
+        self._seen_links: set = set()
+
+    @property
+    def full(self) -> bool:
+        return self.limit is not None and len(self.articles) >= self.limit
+
+    def add_page(self, news_results: List[Dict[str, Any]]) -> int:
+        """Score and append one page; returns how many articles were new to this fetch and in the window"""
+        from textblob import TextBlob
+
+        usable = 0
+        for article in news_results:
+            if self.full:
+                break
+            link = article.get("link")
+            if link in self._seen_links:
+                continue
+            self._seen_links.add(link)
+            if self.window_start is not None:
+                published = parse_published(article.get("date"))
+                if published is not None and published < self.window_start:
+                    continue
+            usable += 1
+
+            if link in self.known_articles:
+                # Seen in a previous run, reuse the stored score
+                sentiment_score = self.known_articles[link]["sentiment_score"]
+            else:
+                # Analyze sentiment
+                sentiment = TextBlob(article.get("title", "") + " " + article.get("snippet", ""))
+                sentiment_score = sentiment.sentiment.polarity
+                self.new_links.append(link)
+
+            # Process article
+            self.articles.append(
+                title=article.get("title"),
+                source=article.get("source"),
+                published=article.get("date"),
+                snippet=article.get("snippet"),
+                link=link,
+                sentiment_score=sentiment_score
+            )
+            self.sentiments.append(sentiment_score)
+
+            # Identify significant events
+            if abs(sentiment_score) > 0.5:
+                self.events.append({
+                    "type": "Significant News",
+                    "title": article.get("title"),
+                    "sentiment": "Positive" if sentiment_score > 0 else "Negative",
+                    "score": sentiment_score
+                })
+        return usable
+
+    def result(self) -> Dict[str, Any]:
+        # Calculate overall sentiment
+        avg_sentiment = sum(self.sentiments) / len(self.sentiments) if self.sentiments else 0
+        return {
+            "news_articles": self.articles,
+            "new_links": self.new_links,
+            "sentiment": {
+                "average_score": avg_sentiment,
+                "overall_sentiment": "Positive" if avg_sentiment > 0 else "Negative" if avg_sentiment < 0 else "Neutral",
+                "confidence": abs(avg_sentiment)
+            },
+            "events": self.events
+        }
+
 class NewsService:
     """Service for processing news and analyzing sentiment"""
     
+    # Average sentiment beyond which reports emit a "Market Sentiment" recommendation
+    SIGNAL_THRESHOLD = 0.3
+    
+    _session: Optional['aiohttp.ClientSession'] = None
+    _session_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @staticmethod
+    def _recency_filter(since: datetime) -> str:
+        """Build a Google ``tbs`` recency filter covering everything published since ``since``"""
+        elapsed_hours = max(1, math.ceil((datetime.utcnow() - since).total_seconds() / 3600))
+        if elapsed_hours < 24:
+            return f"qdr:h{elapsed_hours}"
+        return f"qdr:d{math.ceil(elapsed_hours / 24)}"
+
     @staticmethod
-    def get_google_news(query: str) -> Dict[str, Any]:
-        """Get and analyze news from Google"""
+    def get_google_news(
+        query: str,
+        known_articles: Optional[Dict[str, Dict[str, Any]]] = None,
+        since: Optional[datetime] = None
+    ) -> Dict[str, Any]:
+        """
+        Get and analyze the first page of news from Google
+
+        When ``known_articles`` (articles from a previous run keyed by link) is given,
+        only articles not seen before are sentiment-scored; known articles reuse their
+        stored score. ``since`` restricts the search to articles published after the
+        previous run.
+        """
         try:
+            from serpapi.google_search import GoogleSearch
+
             # Use SerpAPI to get news
-            search = GoogleSearch({
-                "q": query,
-                "tbm": "nws",
-                "api_key": os.getenv("SERPAPI_API_KEY")
-            })
+            search = GoogleSearch(NewsService._search_params(query, since))
+            search.timeout = deadline.timeout(REQUEST_TIMEOUT)
             results = search.get_dict()
             
             # Process news articles and analyze sentiment
-            news_articles = []
-            sentiments = []
-            events = []
-            
-            if "news_results" in results:
-                for article in results["news_results"]:
-                    # Analyze sentiment
-                    sentiment = TextBlob(article.get("title", "") + " " + article.get("snippet", ""))
-                    sentiment_score = sentiment.sentiment.polarity
-                    
-                    # Process article
-                    news_articles.append({
-                        "title": article.get("title"),
-                        "source": article.get("source"),
-                        "published": article.get("date"),
-                        "snippet": article.get("snippet"),
-                        "link": article.get("link"),
-                        "sentiment_score": sentiment_score
-                    })
-                    
-                    sentiments.append(sentiment_score)
-                    
-                    # Identify significant events
-                    if abs(sentiment_score) > 0.5:
-                        events.append({
-                            "type": "Significant News",
-                            "title": article.get("title"),
-                            "sentiment": "Positive" if sentiment_score > 0 else "Negative",
-                            "score": sentiment_score
-                        })
-            
-            # Calculate overall sentiment
-            avg_sentiment = sum(sentiments) / len(sentiments) if sentiments else 0
-            sentiment_analysis = {
-                "average_score": avg_sentiment,
-                "overall_sentiment": "Positive" if avg_sentiment > 0 else "Negative" if avg_sentiment < 0 else "Neutral",
-                "confidence": abs(avg_sentiment)
-            }
-            
-            return {
-                "news_articles": news_articles,
-                "sentiment": sentiment_analysis,
-                "events": events
-            }
+            collector = _GoogleNewsCollector(known_articles)
+            collector.add_page(results.get("news_results", []))
+            return collector.result()
             
         except Exception as e:
             logger.error(f"Error processing Google news: {str(e)}")
             raise
 
+    @staticmethod
+    async def fetch_google_news(
+        query: str,
+        max_articles: int = 100,
+        known_articles: Optional[Dict[str, Dict[str, Any]]] = None,
+        since: Optional[datetime] = None,
+        fan_out: int = 4,
+        date_window_days: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """
+        Fetch up to ``max_articles`` Google News results by paging concurrently
+
+        Pages are requested by ``start`` offset in waves of at most ``fan_out``
+        concurrent requests. Each page is sentiment-scored as soon as it arrives.
+        Paging stops early at the last page, or when a whole wave only returned
+        duplicates or articles older than the date window (``since`` and/or
+        ``date_window_days`` before now). Failed pages are skipped; the error of the
+        last failed page is raised when no page succeeded.
+        """
+        try:
+            window_start = None
+            if date_window_days:
+                window_start = datetime.utcnow() - timedelta(days=date_window_days)
+            if since is not None:
+                window_start = max(window_start, since) if window_start else since
+
+            params = NewsService._search_params(query, since)
+            collector = _GoogleNewsCollector(known_articles, window_start, limit=max_articles)
+            session = await NewsService.get_session()
+            offsets = list(range(0, max_articles, GOOGLE_NEWS_PAGE_SIZE))
+            next_page = 0
+            exhausted = False
+            succeeded = 0
+            last_error: Optional[Exception] = None
+
+            while next_page < len(offsets) and not exhausted:
+                wave = offsets[next_page:next_page + max(1, fan_out)]
+                next_page += len(wave)
+                pending = [
+                    asyncio.ensure_future(NewsService._fetch_page(session, params, offset))
+                    for offset in wave
+                ]
+
+                usable = 0
+                for page in asyncio.as_completed(pending):
+                    try:
+                        results = await page
+                    except Exception as e:
+                        logger.warning(f"Google News page request failed: {str(e)}")
+                        last_error = e
+                        continue
+                    succeeded += 1
+                    news_results = results.get("news_results", [])
+                    if len(news_results) < GOOGLE_NEWS_PAGE_SIZE:
+                        exhausted = True
+                    usable += collector.add_page(news_results)
+                    if collector.full:
+                        exhausted = True
+
+                if succeeded == 0:
+                    raise last_error
+                if usable == 0:
+                    logger.info(f"Stopping pagination for '{query}': no new in-window articles at offset {wave[0]}")
+                    break
+
+            logger.info(f"Fetched {len(collector.articles)} Google News articles for '{query}' "
+                        f"from {next_page} page(s)")
+            return collector.result()
+
+        except Exception as e:
+            logger.error(f"Error processing Google news: {str(e)}")
+            raise
+
+    @staticmethod
+    def _search_params(query: str, since: Optional[datetime] = None) -> Dict[str, str]:
+        """SerpAPI parameters for a Google News search"""
+        params = {
+            "q": query,
+            "tbm": "nws",
+            "api_key": os.getenv("SERPAPI_API_KEY")
+        }
+        if since is not None:
+            params["tbs"] = NewsService._recency_filter(since)
+        return params
+
+    @staticmethod
+    async def _fetch_page(session: 'aiohttp.ClientSession', params: Dict[str, str], offset: int) -> Dict[str, Any]:
+        """Fetch one page of SerpAPI results"""
+        import aiohttp
+
+        async with session.get(
+            SERPAPI_ENDPOINT,
+            params={**params, "start": str(offset)},
+            timeout=aiohttp.ClientTimeout(total=deadline.timeout(REQUEST_TIMEOUT))
+        ) as response:
+            response.raise_for_status()
+            return await response.json()
+
+    @staticmethod
+    async def get_session() -> 'aiohttp.ClientSession':
+        """Shared aiohttp session for the running event loop (kept warm across analyses)"""
+        import aiohttp
+
+        loop = asyncio.get_running_loop()
+        if NewsService._session is None or NewsService._session.closed or NewsService._session_loop is not loop:
+            NewsService._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT))
+            NewsService._session_loop = loop
+        return NewsService._session
+
+    @staticmethod
+    async def close_session() -> None:
+        """Close the shared aiohttp session"""
+        if NewsService._session is not None and not NewsService._session.closed:
+            await NewsService._session.close()
+        NewsService._session = None
+        NewsService._session_loop = None
+
     @staticmethod
     def analyze_sentiment(text: str) -> Dict[str, Any]:
         """Analyze sentiment of a text"""
         try:
+            from textblob import TextBlob
+
             sentiment = TextBlob(text)
             score = sentiment.sentiment.polarity
             
@@ -90,4 +321,63 @@ class NewsService:
             
         except Exception as e:
             logger.error(f"Error analyzing sentiment: {str(e)}")
-            raise
\ No newline at end of file
+            raise
+
+    @staticmethod
+    def aggregate_sentiment(articles: Union[ArticleBatch, List[Dict[str, Any]]]) -> Dict[str, Any]:
+        """Aggregate the per-article sentiment scores computed at fetch time"""
+        if isinstance(articles, ArticleBatch):
+            scores = articles.scored()
+        else:
+            scores = [article.get("sentiment_score") or 0.0 for article in articles]
+
+        breakdown = {"Positive": 0, "Negative": 0, "Neutral": 0}
+        for score in scores:
+            breakdown["Positive" if score > 0 else "Negative" if score < 0 else "Neutral"] += 1
+
+        average = sum(scores) / len(scores) if scores else 0.0
+        return {
+            "overall": {
+                "average_score": average,
+                "overall_sentiment": "Positive" if average > 0 else "Negative" if average < 0 else "Neutral",
+                "confidence": abs(average)
+            },
+            "breakdown": breakdown
+        }
+
+    @staticmethod
+    def extract_events(
+        articles: Union[ArticleBatch, List[Dict[str, Any]]],
+        threshold: float = 0.3,
+        min_size: int = 2,
+        limit: Optional[int] = 20
+    ) -> List[Dict[str, Any]]:
+        """
+        Cluster articles into distinct events
+
+        Returns one entry per event (largest first) with a representative title, size,
+        related titles, sources, keywords and aggregate sentiment. See EventDetector.
+        """
+        detector = EventDetector(threshold=threshold)
+        detector.add_batch(articles)
+        logger.info(f"Clustered {len(articles)} articles into {len(detector.clusters)} events "
+                    f"({detector.comparisons} centroid comparisons)")
+        return detector.events(min_size=min_size, limit=limit)
+
+    @staticmethod
+    def extract_main_topics(
+        articles: Union[ArticleBatch, List[Dict[str, Any]]],
+        top_n: int = 10,
+        corpus_path: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Ranked main topics (keywords and two-word phrases) of an article batch
+
+        ``corpus_path`` persists document frequencies across runs so common words in
+        every day's news rank below what is specific to this batch.
+        """
+        try:
+            return extract_topics(articles, top_n=top_n, corpus_path=corpus_path)
+        except Exception as e:
+            logger.error(f"Error extracting main topics: {str(e)}")
+            raise
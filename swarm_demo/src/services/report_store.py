@@ -0,0 +1,231 @@
+"""
+Typed analytical store for completed analysis reports.
+"""
+import logging
+import sqlite3
+from contextlib import closing
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# Numeric/text columns that may be selected or aggregated by the query helpers
+METRIC_COLUMNS = {
+    "price": "REAL",
+    "volume": "REAL",
+    "market_cap": "REAL",
+    "pe_ratio": "REAL",
+    "dividend_yield": "REAL",
+    "sma20": "REAL",
+    "sma50": "REAL",
+    "price_change_pct": "REAL",
+    "price_trend": "TEXT",
+    "sma_signal": "TEXT",
+    "sentiment_score": "REAL",
+    "sentiment_label": "TEXT",
+    "sentiment_confidence": "REAL",
+    "positive_articles": "INTEGER",
+    "negative_articles": "INTEGER",
+    "neutral_articles": "INTEGER",
+    "google_articles": "INTEGER",
+    "yahoo_articles": "INTEGER",
+    "event_count": "INTEGER",
+    "recommendation_count": "INTEGER",
+    "completeness": "TEXT"
+}
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS reports (
+    analysis_id TEXT PRIMARY KEY,
+    topic TEXT NOT NULL,
+    ticker TEXT,
+    report_date TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    {", ".join(f"{name} {kind}" for name, kind in METRIC_COLUMNS.items())}
+);
+CREATE INDEX IF NOT EXISTS idx_reports_ticker_date ON reports (ticker, report_date);
+CREATE INDEX IF NOT EXISTS idx_reports_topic_date ON reports (topic, report_date);
+CREATE TABLE IF NOT EXISTS recommendations (
+    analysis_id TEXT NOT NULL REFERENCES reports (analysis_id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    PRIMARY KEY (analysis_id, position)
+);
+"""
+
+_GROUP_COLUMNS = ("ticker", "topic", "report_date", "sentiment_label", "completeness")
+_AGGREGATES = ("AVG", "MIN", "MAX", "SUM", "COUNT")
+
+
+def _to_float(value: Any) -> Optional[float]:
+    if value is None:
+        return None
+    try:
+        result = float(str(value).rstrip("%")) if isinstance(value, str) else float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if result != result else result  # NaN -> NULL
+
+
+class ReportStore:
+    """Persist one typed row per completed analysis and query them without re-parsing JSON"""
+
+    def __init__(self, db_path: str = "data/reports.db"):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(str(self.db_path), timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        return conn
+
+    @staticmethod
+    def extract_row(context_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Flatten the agent outputs recorded in an AnalysisContext into one typed row"""
+        agents = context_data.get("agents", {})
+        yahoo = agents.get("Yahoo_Analyst", {}).get("data", {}).get("data", {})
+        google = agents.get("Google_Analyst", {}).get("data", {}).get("data", {})
+        writer = agents.get("Report_Writer", {}).get("data", {})
+
+        market = yahoo.get("market_data", {})
+        indicators = yahoo.get("technical_indicators", {})
+        trends = {trend.get("indicator"): trend for trend in yahoo.get("trends", [])}
+        sentiment = google.get("sentiment_analysis", {})
+        overall = sentiment.get("overall_sentiment", {})
+        breakdown = sentiment.get("sentiment_breakdown", {})
+        recommendations = writer.get("content", {}).get("recommendations", [])
+
+        created_at = context_data.get("start_time") or datetime.utcnow().isoformat()
+        return {
+            "analysis_id": context_data.get("analysis_id"),
+            "topic": context_data.get("topic"),
+            "ticker": yahoo.get("ticker"),
+            "report_date": created_at[:10],
+            "created_at": created_at,
+            "price": _to_float(market.get("current_price")),
+            "volume": _to_float(market.get("volume")),
+            "market_cap": _to_float(market.get("market_cap")),
+            "pe_ratio": _to_float(market.get("pe_ratio")),
+            "dividend_yield": _to_float(market.get("dividend_yield")),
+            "sma20": _to_float(indicators.get("sma20")),
+            "sma50": _to_float(indicators.get("sma50")),
+            "price_change_pct": _to_float(trends.get("Price Trend", {}).get("change")),
+            "price_trend": trends.get("Price Trend", {}).get("value"),
+            "sma_signal": trends.get("SMA Crossover", {}).get("value"),
+            "sentiment_score": _to_float(overall.get("average_score")),
+            "sentiment_label": overall.get("overall_sentiment"),
+            "sentiment_confidence": _to_float(overall.get("confidence")),
+            "positive_articles": breakdown.get("Positive"),
+            "negative_articles": breakdown.get("Negative"),
+            "neutral_articles": breakdown.get("Neutral"),
+            "google_articles": len(google.get("news_articles", [])) if google else None,
+            "yahoo_articles": len(yahoo.get("news", [])) if yahoo else None,
+            "event_count": len(google.get("events", [])) if google else None,
+            "recommendation_count": len(recommendations) if writer else None,
+            "completeness": writer.get("completeness"),
+            "recommendations": [str(r) for r in recommendations]
+        }
+
+    def save(self, context_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Persist a completed analysis (the dict returned by AnalysisContext.get_context)"""
+        row = self.extract_row(context_data)
+        recommendations = row.pop("recommendations")
+        columns = list(row)
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                f"INSERT OR REPLACE INTO reports ({', '.join(columns)}) "
+                f"VALUES ({', '.join('?' for _ in columns)})",
+                [row[c] for c in columns]
+            )
+            conn.execute("DELETE FROM recommendations WHERE analysis_id = ?", (row["analysis_id"],))
+            conn.executemany(
+                "INSERT INTO recommendations (analysis_id, position, text) VALUES (?, ?, ?)",
+                [(row["analysis_id"], i, text) for i, text in enumerate(recommendations)]
+            )
+        return row
+
+    def time_series(
+        self,
+        ticker: Optional[str] = None,
+        topic: Optional[str] = None,
+        metrics: Sequence[str] = ("price", "sentiment_score"),
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+        as_frame: bool = False
+    ):
+        """Metrics over time for a ticker and/or topic, ordered by creation time"""
+        selected = self._validate_metrics(metrics)
+        where, params = self._filters(ticker=ticker, topic=topic, start=start, end=end)
+        sql = (f"SELECT created_at, topic, ticker, {', '.join(selected)} FROM reports"
+               f"{where} ORDER BY created_at")
+        return self._query(sql, params, as_frame)
+
+    def latest(self, metrics: Sequence[str] = ("price", "sentiment_score", "completeness"), as_frame: bool = False):
+        """Most recent report per ticker"""
+        selected = self._validate_metrics(metrics)
+        sql = (f"SELECT ticker, topic, created_at, {', '.join(selected)} FROM ("
+               f"SELECT *, ROW_NUMBER() OVER (PARTITION BY ticker ORDER BY created_at DESC) AS rn "
+               f"FROM reports WHERE ticker IS NOT NULL) WHERE rn = 1 ORDER BY ticker")
+        return self._query(sql, [], as_frame)
+
+    def aggregate(
+        self,
+        metric: str,
+        group_by: str = "ticker",
+        functions: Sequence[str] = ("AVG", "MIN", "MAX", "COUNT"),
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+        as_frame: bool = False
+    ):
+        """Cross-topic aggregates of one metric, grouped by ticker, topic, date or label"""
+        (metric,) = self._validate_metrics([metric])
+        if group_by not in _GROUP_COLUMNS:
+            raise ValueError(f"Unsupported group_by column: {group_by}")
+        functions = [f.upper() for f in functions]
+        unknown = [f for f in functions if f not in _AGGREGATES]
+        if unknown:
+            raise ValueError(f"Unsupported aggregate functions: {', '.join(unknown)}")
+
+        where, params = self._filters(start=start, end=end)
+        selected = ", ".join(f"{f}({metric}) AS {f.lower()}_{metric}" for f in functions)
+        sql = f"SELECT {group_by}, {selected} FROM reports{where} GROUP BY {group_by} ORDER BY {group_by}"
+        return self._query(sql, params, as_frame)
+
+    def recommendations(self, analysis_id: str) -> List[str]:
+        with closing(self._connect()) as conn:
+            return [row["text"] for row in conn.execute(
+                "SELECT text FROM recommendations WHERE analysis_id = ? ORDER BY position", (analysis_id,)
+            )]
+
+    def _validate_metrics(self, metrics: Sequence[str]) -> List[str]:
+        unknown = [m for m in metrics if m not in METRIC_COLUMNS]
+        if unknown:
+            raise ValueError(f"Unknown metrics: {', '.join(unknown)}")
+        return list(metrics)
+
+    @staticmethod
+    def _filters(**filters: Optional[str]):
+        clauses, params = [], []
+        for name, value in filters.items():
+            if value is None:
+                continue
+            if name == "start":
+                clauses.append("report_date >= ?")
+            elif name == "end":
+                clauses.append("report_date <= ?")
+            else:
+                clauses.append(f"{name} = ?")
+            params.append(value)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def _query(self, sql: str, params: List[Any], as_frame: bool):
+        with closing(self._connect()) as conn:
+            if as_frame:
+                import pandas as pd
+                return pd.read_sql_query(sql, conn, params=params)
+            return [dict(row) for row in conn.execute(sql, params)]
@@ -0,0 +1,56 @@
+"""
+Tokenization and feature hashing shared by the news text analytics.
+"""
+import re
+import zlib
+from typing import List
+
+_WORD = re.compile(r"[a-z][a-z0-9&\-]*[a-z0-9]|[a-z]")
+# Words plus the punctuation that ends a phrase
+_WORD_OR_BREAK = re.compile(r"[a-z][a-z0-9&\-]*[a-z0-9]|[a-z]|[.,;:!?()\"|\-\u2013\u2014]")
+
+STOPWORDS = frozenset("""
+a about above after again against all also am an and any are as at be because been before being below between
+both but by can could did do does doing down during each few for from further had has have having he her here
+hers him his how i if in into is it its itself just me more most my new news no nor not now of off on once only
+or other our out over own said same says she should so some such than that the their them then there these they
+this those through to too under until up us very was we were what when where which while who whom why will with
+would you your report reports reported today week year years amid via per
+""".split())
+
+# Stable feature hashing space (2**18 buckets keeps collisions rare for news-sized vocabularies)
+HASH_DIMENSIONS = 1 << 18
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens with stopwords, bare numbers and single letters removed"""
+    return [
+        token for token in _WORD.findall(text.lower())
+        if len(token) > 1 and token not in STOPWORDS
+    ]
+
+
+def phrase_runs(text: str) -> List[List[str]]:
+    """Runs of consecutive content words; stopwords and punctuation end a run (candidate noun phrases)"""
+    runs, current = [], []
+    for token in _WORD_OR_BREAK.findall(text.lower()):
+        if len(token) == 1 or token in STOPWORDS:
+            if current:
+                runs.append(current)
+                current = []
+        else:
+            current.append(token)
+    if current:
+        runs.append(current)
+    return runs
+
+
+def article_text(article) -> str:
+    """Title and snippet of an article (ArticleView or dict)"""
+    return f"{article.get('title') or ''} {article.get('snippet') or ''}"
+
+
+def feature_index(token: str) -> int:
+    """Process-independent hash of a token into the feature space"""
+    return zlib.crc32(token.encode("utf-8")) & (HASH_DIMENSIONS - 1)
+
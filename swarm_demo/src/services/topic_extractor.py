@@ -0,0 +1,181 @@
+"""
+Keyword and topic extraction over a batch of news articles.
+"""
+import json
+import logging
+import math
+import threading
+import zlib
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Set
+
+from .text_utils import phrase_runs
+
+logger = logging.getLogger(__name__)
+
+# Finance vocabulary (unigrams and bigrams) boosted when ranking topics
+FINANCE_TERMS = frozenset("""
+earnings|revenue|profit|loss|guidance|outlook|forecast|eps|margin|margins|dividend|buyback|ipo|merger|acquisition
+|takeover|layoffs|restructuring|bankruptcy|lawsuit|settlement|investigation|recall|downgrade|upgrade|rating|valuation
+|deliveries|production|sales|demand|supply|tariffs|inflation|recession|regulation|antitrust|sec|fed|rates|debt|bonds
+|price target|interest rates|rate cut|rate hike|stock split|share buyback|free cash|cash flow|gross margin
+|operating margin|market share|quarterly results|earnings call|annual revenue|record revenue|profit warning
+|supply chain|trade war|short sellers|analyst rating|credit rating|federal reserve|stock price
+""".replace("\n", "").split("|"))
+FINANCE_BOOST = 1.5
+BIGRAM_BOOST = 1.2
+
+# Bound on the persisted corpus statistics
+MAX_CORPUS_TERMS = 50000
+MAX_SEEN_ARTICLES = 20000
+
+
+class CorpusIDF:
+    """Document frequencies accumulated across runs and persisted as JSON"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = Path(path) if path else None
+        self.documents = 0
+        self.document_frequency: Counter = Counter()
+        # Insertion-ordered so the oldest entries are dropped first when capped
+        self.seen: Dict[int, None] = {}
+        self.lock = threading.Lock()
+        if self.path and self.path.exists():
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                self.documents = data["documents"]
+                self.document_frequency = Counter(data["document_frequency"])
+                self.seen = dict.fromkeys(data["seen"])
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"Ignoring unreadable topic corpus {self.path}: {str(e)}")
+
+    def idf(self, term: str, batch_df: int, batch_documents: int) -> float:
+        """Smoothed IDF over the stored corpus plus the batch articles it does not contain yet"""
+        documents = self.documents + batch_documents
+        frequency = self.document_frequency.get(term, 0) + batch_df
+        return math.log((1 + documents) / (1 + frequency)) + 1.0
+
+    def update(self, article_terms: List[Set[str]], keys: List[int]) -> bool:
+        """Add articles not seen in a previous run; returns whether anything changed"""
+        changed = False
+        for key, terms in zip(keys, article_terms):
+            if key in self.seen:
+                continue
+            self.seen[key] = None
+            self.documents += 1
+            self.document_frequency.update(terms)
+            changed = True
+        return changed
+
+    def save(self) -> None:
+        if not self.path:
+            return
+        if len(self.document_frequency) > MAX_CORPUS_TERMS:
+            self.document_frequency = Counter(dict(self.document_frequency.most_common(MAX_CORPUS_TERMS)))
+        seen = list(self.seen)[-MAX_SEEN_ARTICLES:]
+        self.seen = dict.fromkeys(seen)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                "documents": self.documents,
+                "document_frequency": self.document_frequency,
+                "seen": seen
+            }, f)
+        tmp_path.replace(self.path)
+
+
+_corpora: Dict[Optional[str], CorpusIDF] = {}
+_corpora_lock = threading.Lock()
+
+
+def get_corpus(path: Optional[str] = None) -> CorpusIDF:
+    """Corpus statistics for a path, loaded once per process"""
+    with _corpora_lock:
+        if path not in _corpora:
+            _corpora[path] = CorpusIDF(path)
+        return _corpora[path]
+
+
+def _terms(text: str) -> Set[str]:
+    """Candidate unigrams and bigrams of a text"""
+    terms = set()
+    for run in phrase_runs(text):
+        terms.update(run)
+        terms.update(f"{a} {b}" for a, b in zip(run, run[1:]))
+    return terms
+
+
+def extract_topics(
+    articles,
+    top_n: int = 10,
+    corpus_path: Optional[str] = None,
+    update_corpus: bool = True
+) -> List[Dict[str, Any]]:
+    """
+    Rank the main topics of an article batch
+
+    One pass collects candidate unigrams and bigrams from every title and snippet.
+    Candidates are runs of words between stopwords and punctuation. Each term is
+    scored by the number of articles that mention it (titles count double), times
+    its IDF over the stored corpus plus this batch, times a boost for finance
+    vocabulary and for bigrams. A unigram already covered by a higher-ranked
+    bigram is skipped.
+    """
+    corpus = get_corpus(corpus_path)
+    article_terms: List[Set[str]] = []
+    keys: List[int] = []
+    weights: Counter = Counter()
+    for article in articles:
+        title_terms = _terms(article.get("title") or "")
+        terms = title_terms | _terms(article.get("snippet") or "")
+        article_terms.append(terms)
+        keys.append(zlib.crc32((article.get("link") or article.get("title") or "").encode("utf-8")))
+        weights.update(terms)
+        weights.update(title_terms)  # a mention in the title counts twice
+
+    if not article_terms:
+        return []
+
+    batch_df = Counter()
+    for terms in article_terms:
+        batch_df.update(terms)
+    min_articles = 2 if len(article_terms) >= 5 else 1
+
+    with corpus.lock:
+        # Articles from earlier runs are already counted in the corpus
+        unseen_df = Counter()
+        unseen = 0
+        for key, terms in zip(keys, article_terms):
+            if key not in corpus.seen:
+                unseen_df.update(terms)
+                unseen += 1
+
+        scored = []
+        for term, weight in weights.items():
+            if batch_df[term] < min_articles:
+                continue
+            score = weight * corpus.idf(term, unseen_df[term], unseen)
+            if term in FINANCE_TERMS:
+                score *= FINANCE_BOOST
+            if " " in term:
+                score *= BIGRAM_BOOST
+            scored.append((score, term))
+        if update_corpus and corpus.update(article_terms, keys):
+            try:
+                corpus.save()
+            except OSError as e:
+                logger.warning(f"Failed to persist topic corpus: {str(e)}")
+
+    scored.sort(reverse=True)
+    topics, covered = [], set()
+    for score, term in scored:
+        if term in covered:
+            continue
+        topics.append({"topic": term, "score": round(score, 3), "articles": batch_df[term]})
+        covered.update(term.split())
+        if len(topics) >= top_n:
+            break
+    return topics
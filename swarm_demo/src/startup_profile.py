@@ -0,0 +1,101 @@
+"""
+Startup import-time profiling for the analysis entry points.
+
+Runs ``python -X importtime`` on an entry module in a fresh interpreter,
+reports the import cost per module and exits non-zero when the total exceeds
+the configured budget, so it can be used as a CI gate:
+
+    python startup_profile.py main --budget-ms 300
+    python startup_profile.py main --path ../../autogen_agent/src
+"""
+import argparse
+import os
+import subprocess
+import sys
+from typing import Dict, Any, List, Optional
+
+DEFAULT_BUDGET_MS = 300.0
+
+
+def measure_import_time(module: str, path: str = ".") -> List[Dict[str, Any]]:
+    """在新的解释器中导入模块，返回 -X importtime 的逐模块记录（单位：微秒）"""
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [os.path.abspath(path), env.get("PYTHONPATH")]))
+
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=path,
+        env=env,
+        capture_output=True,
+        text=True
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{completed.stderr.strip()}")
+
+    records = []
+    for line in completed.stderr.splitlines():
+        # 格式: "import time:      self [us] |  cumulative | imported package"
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue
+        name = fields[2].rstrip()
+        records.append({
+            "module": name.strip(),
+            "depth": (len(name) - len(name.lstrip())) // 2,
+            "self_us": int(fields[0]),
+            "cumulative_us": int(fields[1])
+        })
+    return records
+
+
+def summarize(records: List[Dict[str, Any]], top: int = 15) -> Dict[str, Any]:
+    """汇总总耗时、按顶层包聚合的耗时以及最慢的模块"""
+    by_package: Dict[str, int] = {}
+    for record in records:
+        package = record["module"].split(".")[0]
+        by_package[package] = by_package.get(package, 0) + record["self_us"]
+
+    return {
+        "total_ms": sum(r["self_us"] for r in records) / 1000,
+        "by_package_ms": {
+            name: us / 1000
+            for name, us in sorted(by_package.items(), key=lambda item: item[1], reverse=True)[:top]
+        },
+        "slowest_modules_ms": {
+            r["module"]: r["cumulative_us"] / 1000
+            for r in sorted(records, key=lambda r: r["cumulative_us"], reverse=True)[:top]
+        }
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Report import cost of an entry module and enforce a startup budget")
+    parser.add_argument("module", nargs="?", default="main", help="Module to import (default: main)")
+    parser.add_argument("--path", default=".", help="Directory containing the module")
+    parser.add_argument("--budget-ms", type=float,
+                        default=float(os.getenv("STARTUP_BUDGET_MS", DEFAULT_BUDGET_MS)),
+                        help="Maximum total import time in milliseconds")
+    parser.add_argument("--top", type=int, default=15, help="Number of packages/modules to report")
+    args = parser.parse_args(argv)
+
+    summary = summarize(measure_import_time(args.module, args.path), top=args.top)
+
+    print(f"Import cost per package (self time, top {args.top}):")
+    for name, ms in summary["by_package_ms"].items():
+        print(f"  {ms:9.2f} ms  {name}")
+    print(f"\nSlowest modules (cumulative, top {args.top}):")
+    for name, ms in summary["slowest_modules_ms"].items():
+        print(f"  {ms:9.2f} ms  {name}")
+    print(f"\nTotal import time for '{args.module}': {summary['total_ms']:.2f} ms (budget {args.budget_ms:.0f} ms)")
+
+    if summary["total_ms"] > args.budget_ms:
+        print("FAIL: startup budget exceeded")
+        return 1
+    print("OK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,95 @@
+"""
+Per-topic state persisted between runs for incremental re-analysis.
+"""
+import hashlib
+import json
+import logging
+import re
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any
+
+logger = logging.getLogger(__name__)
+
+MAX_TRACKED_ARTICLES = 1000
+
+
+def stable_hash(data: Any) -> str:
+    """计算数据的稳定哈希（忽略timestamp字段，使仅时间戳不同的输入视为相同）"""
+    def strip(value: Any) -> Any:
+        if hasattr(value, "to_dicts"):
+            value = value.to_dicts()
+        if isinstance(value, dict):
+            return {k: strip(v) for k, v in value.items() if k != "timestamp"}
+        if isinstance(value, (list, tuple)):
+            return [strip(v) for v in value]
+        return value
+
+    payload = json.dumps(strip(data), sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def new_topic_state(topic: str) -> Dict[str, Any]:
+    """创建空的主题状态"""
+    return {
+        "topic": topic,
+        "last_run": None,
+        "articles": {},
+        "yahoo_news": {},
+        "bars": {},
+        "sections": {}
+    }
+
+
+class TopicStateStore:
+    """主题状态存储：每个主题一个JSON文件"""
+
+    def __init__(self, state_dir: str = "state"):
+        """
+        初始化主题状态存储
+
+        Args:
+            state_dir: 状态文件存储目录
+        """
+        self.state_dir = Path(state_dir)
+        self.state_dir.mkdir(parents=True, exist_ok=True)
+
+    def _get_state_path(self, topic: str) -> Path:
+        """获取状态文件路径"""
+        slug = re.sub(r"[^0-9A-Za-z_-]+", "_", topic.strip()).strip("_") or "topic"
+        digest = hashlib.sha1(topic.encode("utf-8")).hexdigest()[:8]
+        return self.state_dir / f"{slug}_{digest}.json"
+
+    def load(self, topic: str) -> Dict[str, Any]:
+        """读取主题状态，不存在时返回空状态"""
+        state_path = self._get_state_path(topic)
+        if not state_path.exists():
+            return new_topic_state(topic)
+        try:
+            with open(state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            return {**new_topic_state(topic), **state}
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable topic state {state_path}: {str(e)}")
+            return new_topic_state(topic)
+
+    def save(self, topic: str, state: Dict[str, Any]) -> None:
+        """保存主题状态（先写临时文件再替换，避免中断时留下损坏的文件）"""
+        for key in ("articles", "yahoo_news"):
+            tracked = state.get(key, {})
+            if len(tracked) > MAX_TRACKED_ARTICLES:
+                # dict保持插入顺序，丢弃最早记录的文章
+                state[key] = dict(list(tracked.items())[-MAX_TRACKED_ARTICLES:])
+
+        state["last_run"] = datetime.utcnow().isoformat()
+        state_path = self._get_state_path(topic)
+        tmp_path = state_path.with_suffix(".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, indent=2, ensure_ascii=False, default=str)
+        tmp_path.replace(state_path)
+
+    def clear(self, topic: str) -> None:
+        """删除主题状态"""
+        state_path = self._get_state_path(topic)
+        if state_path.exists():
+            state_path.unlink()
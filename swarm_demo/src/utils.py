@@ -3,11 +3,31 @@ Utility functions for the financial news analysis system.
 """
 import os
 import json
+import asyncio
 import logging
+import uuid
 from datetime import datetime
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Callable, Awaitable, Tuple
 from pathlib import Path
 
+from context_store import ContextBackend, MemoryContextBackend
+from services.deadline import DeadlineExceeded
+from topic_state import stable_hash
+
+# 公司名到股票代码的映射
+COMPANY_TO_TICKER = {
+    "Tesla": "TSLA",
+    "Apple": "AAPL",
+    "Microsoft": "MSFT",
+    "Google": "GOOGL",
+    "Amazon": "AMZN"
+}
+
+def resolve_ticker(topic: str) -> str:
+    """从分析主题中解析股票代码（主题的第一个词为公司名或股票代码）"""
+    company = topic.split()[0]
+    return COMPANY_TO_TICKER.get(company, company)
+
 class ThoughtLogger:
     """Agent思维链记录器"""
     
@@ -113,27 +133,52 @@ class ThoughtLogger:
 class AnalysisContext:
     """分析上下文管理器"""
     
-    def __init__(self, topic: str):
+    def __init__(self, topic: str, topic_state: Optional[Dict[str, Any]] = None,
+                 backend: Optional[ContextBackend] = None, analysis_id: Optional[str] = None):
         """
         初始化分析上下文
         
         Args:
             topic: 分析主题
+            topic_state: 该主题上一次运行保存的状态（增量分析时提供）
+            backend: Agent数据的存储（默认为进程内存储；多进程运行时使用共享的SQLite存储）
+            analysis_id: 已有分析的ID（在其他进程中接入同一次分析时提供）
         """
         self.topic = topic
-        self.analysis_id = self._generate_analysis_id()
+        self.backend = backend or MemoryContextBackend()
+        self.analysis_id = analysis_id or self._generate_analysis_id()
+        # 本上下文最近一次写入的各Agent数据版本，用于检测丢失更新
+        self.versions: Dict[str, int] = {}
         self.thought_logger = ThoughtLogger()
+        self.topic_state = topic_state
+        self.changes: Dict[str, Any] = {}
+        # 工具调用结果：对话中只传递句柄和摘要，完整数据保存在这里
+        self.results: Dict[str, Any] = {}
+        self._tool_calls: Dict[str, asyncio.Future] = {}
+        self.tool_stats = {"calls": 0, "cache_hits": 0}
+        # 因截止时间或取消而未完成的工具调用
+        self.interrupted_tools: List[str] = []
+        meta = self.backend.meta(self.analysis_id) if analysis_id else None
         self.context = {
             "analysis_id": self.analysis_id,
             "topic": topic,
-            "start_time": datetime.utcnow().isoformat(),
-            "agents": {}
+            "start_time": meta["start_time"] if meta else datetime.utcnow().isoformat()
         }
+        if meta is None:
+            self.backend.create(self.analysis_id, topic, self.context["start_time"])
+    
+    @classmethod
+    def attach(cls, analysis_id: str, backend: ContextBackend) -> 'AnalysisContext':
+        """接入另一个进程创建的分析（例如在单独的进程中运行报告Agent）"""
+        meta = backend.meta(analysis_id)
+        if meta is None:
+            raise KeyError(f"Unknown analysis: {analysis_id}")
+        return cls(meta["topic"], backend=backend, analysis_id=analysis_id)
     
     def _generate_analysis_id(self) -> str:
-        """生成分析任务ID"""
+        """生成分析任务ID（带随机后缀，多个Worker同时分析同一主题时不会冲突）"""
         timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-        return f"{timestamp}_{self.topic.replace(' ', '_')}"
+        return f"{timestamp}_{self.topic.replace(' ', '_')}_{uuid.uuid4().hex[:6]}"
     
     def log_agent_thought(
         self,
@@ -156,13 +201,91 @@ class AnalysisContext:
             analysis_id=self.analysis_id
         )
     
-    def update_context(self, agent_name: str, data: Dict[str, Any]) -> None:
-        """更新上下文数据"""
-        self.context["agents"][agent_name] = {
-            "last_update": datetime.utcnow().isoformat(),
-            "data": data
-        }
+    def update_context(self, agent_name: str, data: Dict[str, Any],
+                       expected_version: Optional[int] = None) -> int:
+        """
+        原子更新Agent数据
+        
+        Args:
+            agent_name: Agent名称
+            data: Agent结果
+            expected_version: 期望的当前版本（默认为本上下文最近一次写入的版本）
+        
+        Returns:
+            写入后的版本号
+        
+        Raises:
+            VersionConflict: 数据在此期间已被其他写入者更新
+        """
+        if expected_version is None:
+            expected_version = self.versions.get(agent_name, 0)
+        version = self.backend.put(self.analysis_id, agent_name, data, expected_version=expected_version)
+        self.versions[agent_name] = version
+        return version
+    
+    def get_agent_data(self, agent_name: str) -> Optional[Dict[str, Any]]:
+        """读取单个Agent的条目（version、last_update、data）"""
+        return self.backend.get(self.analysis_id, agent_name)
+    
+    def record_change(self, key: str, value: Any) -> None:
+        """记录相对上一次运行的变化（用于报告中的“新增内容”部分）"""
+        self.changes[key] = value
+    
+    def store_result(self, tool: str, value: Any) -> str:
+        """保存工具结果并返回其句柄"""
+        handle = f"{tool}#{len(self.results) + 1}"
+        self.results[handle] = value
+        return handle
+    
+    def get_result(self, handle: str) -> Any:
+        """按句柄读取工具结果"""
+        if handle not in self.results:
+            raise KeyError(f"Unknown result handle: {handle}")
+        return self.results[handle]
+    
+    async def memoize(self, tool: str, args: Dict[str, Any],
+                      run: Callable[[], Awaitable[Any]]) -> Tuple[str, bool]:
+        """
+        在本次分析内对工具调用去重：相同工具和参数只执行一次
+        
+        Args:
+            tool: 工具名称
+            args: 调用参数
+            run: 实际执行调用的协程函数
+        
+        Returns:
+            (结果句柄, 是否命中缓存)
+        """
+        key = f"{tool}:{stable_hash(args)}"
+        self.tool_stats["calls"] += 1
+        pending = self._tool_calls.get(key)
+        if pending is not None:
+            self.tool_stats["cache_hits"] += 1
+            return await asyncio.shield(pending), True
+        
+        future = asyncio.get_running_loop().create_future()
+        self._tool_calls[key] = future
+        try:
+            handle = self.store_result(tool, await run())
+        except BaseException as e:
+            # 失败的调用不缓存，允许重试
+            del self._tool_calls[key]
+            if isinstance(e, (asyncio.CancelledError, DeadlineExceeded)):
+                self.interrupted_tools.append(tool)
+            future.set_exception(e)
+            future.exception()  # 已由调用方处理，避免未取回异常的警告
+            raise
+        future.set_result(handle)
+        return handle, False
+    
+    def evict(self) -> int:
+        """释放本次分析在进程内保存的工具结果和Agent数据，返回释放的工具结果数"""
+        released = len(self.results)
+        self.results.clear()
+        self._tool_calls.clear()
+        self.backend.evict(self.analysis_id)
+        return released
     
     def get_context(self) -> Dict[str, Any]:
-        """获取完整上下文"""
-        return self.context
\ No newline at end of file
+        """获取完整上下文（包括存储中所有Agent的最新数据）"""
+        return {**self.context, "agents": self.backend.agents(self.analysis_id)}
\ No newline at end of file
@@ -0,0 +1,175 @@
+"""
+Multi-process worker pool and CLI for analysis jobs on the durable job queue.
+
+    python worker.py submit "Tesla Q4 2024 Earnings" "Apple Q1 2025 Earnings"
+    python worker.py work --processes 4
+    python worker.py list --status running
+    python worker.py status <job_id> --result
+    python worker.py monitor
+"""
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import socket
+import sys
+import time
+from typing import Any, List, Optional
+
+from config import Config, setup_logging
+from job_queue import JobQueue
+
+logger = logging.getLogger(__name__)
+
+
+def create_queue() -> JobQueue:
+    """根据配置创建任务队列"""
+    queue_config = Config.get_queue_config()
+    return JobQueue(
+        db_path=queue_config["db_path"],
+        visibility_timeout=queue_config["visibility_timeout"],
+        max_attempts=queue_config["max_attempts"],
+        retry_backoff=queue_config["retry_backoff"],
+        journal_mode=queue_config["journal_mode"]
+    )
+
+
+async def _keep_lease(queue: JobQueue, job_id: str, worker_id: str) -> None:
+    """在任务执行期间定期续约租约"""
+    interval = max(1.0, queue.visibility_timeout / 3)
+    while True:
+        await asyncio.sleep(interval)
+        if not await asyncio.get_running_loop().run_in_executor(None, queue.heartbeat, job_id, worker_id):
+            logger.warning(f"Lease lost for job {job_id}")
+            return
+
+
+async def worker_loop(worker_id: str, poll_interval: float, max_jobs: Optional[int] = None) -> None:
+    """Worker主循环：预热一次Agent系统，然后持续领取并执行任务"""
+    from main import initialize_system, run_analysis
+
+    queue = create_queue()
+    system = await initialize_system()
+    loop = asyncio.get_running_loop()
+    processed = 0
+    logger.info(f"Worker {worker_id} ready")
+
+    while max_jobs is None or processed < max_jobs:
+        job = await loop.run_in_executor(None, queue.claim, worker_id)
+        if job is None:
+            await asyncio.sleep(poll_interval)
+            continue
+
+        logger.info(f"Worker {worker_id} claimed job {job['job_id']} "
+                    f"(attempt {job['attempts']}/{job['max_attempts']}): {job['topic']}")
+        lease_task = asyncio.create_task(_keep_lease(queue, job["job_id"], worker_id))
+        try:
+            system["group_chat"].reset()
+            report = await run_analysis(
+                topic=job["topic"],
+                agents=system["agents"],
+                group_chat=system["group_chat"],
+                manager=system["manager"]
+            )
+            await loop.run_in_executor(None, queue.complete, job["job_id"], worker_id, report)
+        except Exception as e:
+            logger.error(f"Job {job['job_id']} failed: {str(e)}")
+            await loop.run_in_executor(None, queue.fail, job["job_id"], worker_id, str(e))
+        finally:
+            lease_task.cancel()
+            processed += 1
+
+
+def run_worker(index: int, poll_interval: float, max_jobs: Optional[int] = None) -> None:
+    """单个Worker进程的入口"""
+    setup_logging()
+    worker_id = f"{socket.gethostname()}:{os.getpid()}:{index}"
+    try:
+        asyncio.run(worker_loop(worker_id, poll_interval, max_jobs))
+    except KeyboardInterrupt:
+        pass
+
+
+def start_pool(processes: int, poll_interval: float, max_jobs: Optional[int] = None) -> None:
+    """启动多个Worker进程并等待其退出"""
+    workers = [
+        multiprocessing.Process(target=run_worker, args=(index, poll_interval, max_jobs), daemon=False)
+        for index in range(processes)
+    ]
+    for process in workers:
+        process.start()
+    logger.info(f"Started {processes} worker process(es) on {socket.gethostname()}")
+
+    try:
+        for process in workers:
+            process.join()
+    except KeyboardInterrupt:
+        for process in workers:
+            process.terminate()
+        for process in workers:
+            process.join()
+
+
+def _print_json(data: Any) -> None:
+    print(json.dumps(data, indent=2, default=str, ensure_ascii=False))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    queue_config = Config.get_queue_config()
+
+    parser = argparse.ArgumentParser(description="Analysis job queue and worker pool")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    submit_parser = subparsers.add_parser("submit", help="Submit analysis jobs")
+    submit_parser.add_argument("topics", nargs="+", help="Topics to analyze")
+    submit_parser.add_argument("--max-attempts", type=int, default=None)
+
+    work_parser = subparsers.add_parser("work", help="Run a pool of worker processes")
+    work_parser.add_argument("--processes", type=int, default=queue_config["processes"])
+    work_parser.add_argument("--poll-interval", type=float, default=queue_config["poll_interval"])
+    work_parser.add_argument("--max-jobs", type=int, default=None, help="Exit each worker after N jobs")
+
+    status_parser = subparsers.add_parser("status", help="Show a job")
+    status_parser.add_argument("job_id")
+    status_parser.add_argument("--result", action="store_true", help="Include the final report")
+
+    list_parser = subparsers.add_parser("list", help="List recent jobs")
+    list_parser.add_argument("--status", default=None)
+    list_parser.add_argument("--limit", type=int, default=50)
+
+    monitor_parser = subparsers.add_parser("monitor", help="Print queue statistics periodically")
+    monitor_parser.add_argument("--interval", type=float, default=5.0)
+
+    args = parser.parse_args(argv)
+    setup_logging()
+
+    if args.command == "work":
+        start_pool(args.processes, args.poll_interval, args.max_jobs)
+        return 0
+
+    queue = create_queue()
+    if args.command == "submit":
+        for topic in args.topics:
+            print(queue.submit(topic, max_attempts=args.max_attempts))
+    elif args.command == "status":
+        job = queue.get(args.job_id, include_result=args.result)
+        if job is None:
+            print(f"Unknown job: {args.job_id}", file=sys.stderr)
+            return 1
+        _print_json(job)
+    elif args.command == "list":
+        _print_json(queue.list_jobs(status=args.status, limit=args.limit))
+    elif args.command == "monitor":
+        try:
+            while True:
+                print(f"{time.strftime('%H:%M:%S')} {json.dumps(queue.stats())}", flush=True)
+                time.sleep(args.interval)
+        except KeyboardInterrupt:
+            pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())